@@ -32,7 +32,46 @@ echo "Starting FastAPI Backend..."
 # Run from Project Root to ensure imports like 'src.backend.main' work and paths in .env are consistent
 cd $PROJECT_ROOT
 
-echo "Generating/Refreshing Data..."
-python src/backend/scripts/generate_data.py
+# WORKERS > 1 (or "auto", one per core): production mode, N uvicorn worker processes and no --reload.
+# Each worker opens its own clients; the topology snapshot, retrieval results, LLM responses, chat
+# sessions and batch job status are kept once per host in the SHARED_CACHE_PATH SQLite file.
+# Exported before data generation, which clears the LLM responses cached there
+WORKERS=${WORKERS:-1}
+if [ "$WORKERS" = "auto" ]; then
+    WORKERS=$(nproc)
+fi
+if [ "$WORKERS" -gt 1 ]; then
+    export SHARED_CACHE_PATH=${SHARED_CACHE_PATH:-./shared_cache.db}
+fi
+
+# Demo data replaces the topology and every stored metric (ingested points, rollup history), so it
+# is only generated in development mode unless GENERATE_DEMO_DATA=true asks for it
+if [ "$WORKERS" -gt 1 ]; then
+    GENERATE_DEMO_DATA=${GENERATE_DEMO_DATA:-false}
+else
+    GENERATE_DEMO_DATA=${GENERATE_DEMO_DATA:-true}
+fi
+
+if [ "$GENERATE_DEMO_DATA" = "true" ]; then
+    echo "Generating/Refreshing Data..."
+    python src/backend/scripts/generate_data.py --targets neo4j,topology,sqlite
+
+    # Generating the runbooks rebuilds the collection from scratch, so it only runs on the first
+    # start (or with REGENERATE_DATA=true); the runbooks directory is then synced incrementally
+    if [ "$REGENERATE_DATA" = "true" ] || [ ! -f "src/backend/data_generated.flag" ]; then
+        echo "Generating demo runbooks..."
+        python src/backend/scripts/generate_data.py --targets chroma && touch src/backend/data_generated.flag
+    fi
+fi
+
+if [ -d "${RUNBOOKS_DIR:-runbooks}" ]; then
+    echo "Ingesting changed runbooks..."
+    python -m src.backend.scripts.ingest_runbooks --dir "${RUNBOOKS_DIR:-runbooks}"
+fi
+
+if [ "$WORKERS" -gt 1 ]; then
+    echo "Starting $WORKERS workers (shared cache: $SHARED_CACHE_PATH)..."
+    exec uvicorn src.backend.main:app --host 0.0.0.0 --port 8000 --workers "$WORKERS"
+fi
 
 uvicorn src.backend.main:app --reload --host 0.0.0.0 --port 8000
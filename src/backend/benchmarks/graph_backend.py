@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from src.backend.services.embedded_graph import EmbeddedGraphBackend, write_topology_file
+from src.backend.services.graph_backend import UPSTREAM, DOWNSTREAM
+
+# Graph read latency per backend on the same topology: details, fan-out, fan-in,
+# 3-hop traversals and the full topology load. The embedded backend serves a
+# generated topology file. With --neo4j the graph is read from NEO4J_URI instead
+# (load one with generate_data.py first) and written to the file, so both backends
+# answer the same lookups.
+# Usage (from the project root):
+#   python -m src.backend.benchmarks.graph_backend --services 2000 [--neo4j]
+
+OPERATIONS = {
+    "details": lambda b, name: b.get_service_details(name),
+    "fan_out": lambda b, name: b.get_dependencies(name),
+    "fan_in": lambda b, name: b.get_upstream_dependencies(name),
+    "traverse_down": lambda b, name: b.traverse(name, DOWNSTREAM, 3),
+    "traverse_up": lambda b, name: b.traverse(name, UPSTREAM, 3),
+}
+
+
+def _generated_topology(services: int, mean_fanout: float, seed: int):
+    from src.backend.scripts.generate_data import build_topology, dependency_rows
+    nodes, edges = build_topology(services, mean_fanout, seed=seed)
+    return nodes, dependency_rows(nodes, edges)
+
+
+def measure(backend, names, requests: int):
+    results = {}
+    for op, call in OPERATIONS.items():
+        samples = []
+        for name in names[:requests]:
+            start = time.perf_counter()
+            call(backend, name)
+            samples.append((time.perf_counter() - start) * 1e6)
+        results[op] = (statistics.median(samples), statistics.quantiles(samples, n=20)[-1])
+    start = time.perf_counter()
+    backend.get_topology()
+    results["topology"] = ((time.perf_counter() - start) * 1e6,) * 2
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark graph reads on the embedded and Neo4j backends.")
+    parser.add_argument("--services", type=int, default=2000)
+    parser.add_argument("--mean-fanout", type=float, default=2.0)
+    parser.add_argument("--requests", type=int, default=500, help="Lookups per operation")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--neo4j", action="store_true", help="Also measure Neo4j, on the topology it holds")
+    args = parser.parse_args()
+
+    backends = {}
+    if args.neo4j:
+        from src.backend.services.neo4j_service import Neo4jService
+        backends["neo4j"] = Neo4jService()
+        nodes, edges = backends["neo4j"].get_topology()
+    else:
+        nodes, edges = _generated_topology(args.services, args.mean_fanout, args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "topology.json")
+        write_topology_file(path, nodes, edges)
+        start = time.perf_counter()
+        backends["embedded"] = EmbeddedGraphBackend(path)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        names = [n["name"] for n in nodes]
+        random.Random(args.seed).shuffle(names)
+        names = (names * (args.requests // max(len(names), 1) + 1))[:args.requests]
+        results = {name: measure(backend, names, args.requests) for name, backend in backends.items()}
+
+    print(f"{len(nodes)} services, {len(edges)} dependencies; embedded backend loaded the file in {load_ms:.1f} ms")
+    print(f"{'operation':>14} | " + " | ".join(f"{name + ' p50/p95 (us)':>28}" for name in results))
+    for op in (*OPERATIONS, "topology"):
+        print(f"{op:>14} | " + " | ".join(f"{r[op][0]:>13,.1f} / {r[op][1]:>12,.1f}" for r in results.values()))
+    if "neo4j" in results:
+        speedups = [results["neo4j"][op][0] / max(results["embedded"][op][0], 1e-3) for op in OPERATIONS]
+        print(f"\nembedded is {min(speedups):,.0f}x to {max(speedups):,.0f}x faster at p50")
+        asyncio.run(backends["neo4j"].aclose())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+# End-to-end load test of src.backend.main:app, run in-process over ASGI with local
+# stand-ins: the embedded graph backend on a generated topology file, a temporary
+# Chroma directory (hashing embeddings), a generated SQLite file and a stub Ollama
+# with simulated token latency.
+# Usage (from the project root):
+#   python -m src.backend.benchmarks.load_test --services 200 --concurrency 1 8 32 --output results.json
+#   python -m src.backend.benchmarks.load_test ... --compare results.json
+
+ENDPOINTS = ("recommend", "chat", "graph", "vectors", "metrics_all")
+
+
+def _prepare_environment(tmp: str, args):
+    # Settings are read at import time, so this has to run before any src.backend import
+    os.environ["SQLITE_DB_PATH"] = os.path.join(tmp, "metrics.db")
+    os.environ["CHROMADB_PATH"] = os.path.join(tmp, "chroma")
+    os.environ["LLM_CACHE_DB_PATH"] = ""
+    os.environ["LLM_CACHE_MAX_ENTRIES"] = "512" if args.llm_cache else "0"
+    os.environ["TOPOLOGY_REFRESH_SECONDS"] = "3600"
+    os.environ["GRAPH_BACKEND"] = "embedded"
+    os.environ["TOPOLOGY_FILE"] = os.path.join(tmp, "topology.json")
+
+
+def _build_data(args):
+    import chromadb
+    from src.backend.config import settings
+    from src.backend.scripts import generate_data
+    from src.backend.benchmarks.stubs import HashEmbedding
+
+    nodes, edges = generate_data.build_topology(args.services, args.mean_fanout, args.fanout_dist, seed=args.seed)
+    generate_data.generate_topology_file(nodes, edges, settings.TOPOLOGY_FILE)
+    generate_data.generate_sqlite_data(nodes, args.days, args.interval, args.seed, db_path=settings.SQLITE_DB_PATH)
+
+    docs = generate_data.build_runbooks(nodes, edges, args.runbooks, seed=args.seed)
+    collection = chromadb.PersistentClient(path=settings.CHROMADB_PATH).get_or_create_collection(
+        "runbooks", embedding_function=HashEmbedding()
+    )
+    for start in range(0, len(docs), 1000):
+        batch = docs[start:start + 1000]
+        collection.add(
+            ids=[d["id"] for d in batch],
+            documents=[d["text"] for d in batch],
+            metadatas=[{**d["metadata"], "seq": start + i} for i, d in enumerate(batch)],
+        )
+    return nodes, edges, collection
+
+
+def _install_stubs(collection, args):
+    from src.backend.services.topology_cache import topology_cache
+    from src.backend.services.rag_service import rag_service
+    from src.backend.services.llm_service import llm_service
+    from src.backend.benchmarks.stubs import StubOllama
+
+    topology_cache.refresh()
+    rag_service.collection = collection
+    llm_service.async_client = StubOllama(args.tokens, args.first_token_ms, args.token_ms, args.llm_parallel)
+    return llm_service.async_client
+
+
+def _request_factory(endpoint: str, service_names, rng: random.Random, args):
+    if endpoint == "recommend":
+        return lambda: ("GET", f"/api/v1/recommend/{rng.choice(service_names)}", None)
+    if endpoint == "chat":
+        return lambda: ("POST", "/api/v1/chat", {
+            "service_name": rng.choice(service_names),
+            "messages": [{"role": "user", "content": "Why is latency high and what breaks if this service fails?"}],
+        })
+    if endpoint == "graph":
+        return lambda: ("GET", "/api/v1/graph", None)
+    if endpoint == "vectors":
+        return lambda: ("GET", f"/api/v1/vectors?limit={args.page_size}", None)
+    if endpoint == "metrics_all":
+        return lambda: ("GET", f"/api/v1/metrics/all?limit={args.page_size}", None)
+    raise ValueError(f"Unknown endpoint {endpoint}")
+
+
+async def _run_scenario(client, make_request, requests: int, concurrency: int):
+    latencies = []
+    errors = 0
+    issued = 0
+
+    async def worker():
+        nonlocal issued, errors
+        while issued < requests:
+            issued += 1
+            method, url, body = make_request()
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, json=body)
+                failed = response.status_code >= 400
+            except Exception:
+                failed = True
+            latencies.append((time.perf_counter() - start) * 1000)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    samples = np.array(latencies)
+    return {
+        "requests": len(samples),
+        "concurrency": concurrency,
+        "errors": errors,
+        "wall_seconds": round(wall, 4),
+        "throughput_rps": round(len(samples) / wall, 2),
+        "latency_ms": {
+            "mean": round(float(samples.mean()), 3),
+            "p50": round(float(np.percentile(samples, 50)), 3),
+            "p95": round(float(np.percentile(samples, 95)), 3),
+            "p99": round(float(np.percentile(samples, 99)), 3),
+            "max": round(float(samples.max()), 3),
+        },
+    }
+
+
+async def _run(args, service_names):
+    import httpx
+    from src.backend.main import app
+
+    rng = random.Random(args.seed)
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        for endpoint in args.endpoints:
+            make_request = _request_factory(endpoint, service_names, rng, args)
+            # Warm-up: first topology/statement/page-cache hits are not what we want to measure
+            await _run_scenario(client, make_request, args.warmup, 1)
+            for concurrency in args.concurrency:
+                key = f"{endpoint}@c{concurrency}"
+                results[key] = await _run_scenario(client, make_request, args.requests, concurrency)
+                print(_format_row(key, results[key]), file=sys.stderr)
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def _format_row(key, r):
+    lat = r["latency_ms"]
+    return (f"{key:<24} {r['throughput_rps']:>9.1f} rps  p50 {lat['p50']:>9.2f}  p95 {lat['p95']:>9.2f}  "
+            f"p99 {lat['p99']:>9.2f} ms  errors {r['errors']}")
+
+
+def compare(baseline: dict, current: dict, threshold: float):
+    """Print p95/throughput deltas per scenario; returns the scenarios whose p95 regressed beyond `threshold`."""
+    regressions = []
+    for key, now in current["results"].items():
+        before = baseline.get("results", {}).get(key)
+        if before is None:
+            continue
+        p95_before, p95_now = before["latency_ms"]["p95"], now["latency_ms"]["p95"]
+        p95_delta = (p95_now - p95_before) / p95_before if p95_before else 0.0
+        rps_delta = (now["throughput_rps"] - before["throughput_rps"]) / before["throughput_rps"] if before["throughput_rps"] else 0.0
+        flag = "REGRESSION" if p95_delta > threshold else ""
+        print(f"{key:<24} p95 {p95_before:>9.2f} -> {p95_now:>9.2f} ms ({p95_delta:+.1%})  "
+              f"rps {rps_delta:+.1%}  {flag}", file=sys.stderr)
+        if flag:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process load test of the FastAPI backend against local stand-ins.")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint and concurrency level")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--page-size", type=int, default=100, help="limit= for /vectors and /metrics/all")
+    # Data size
+    parser.add_argument("--services", type=int, default=200)
+    parser.add_argument("--mean-fanout", type=float, default=2.0)
+    parser.add_argument("--fanout-dist", default="poisson")
+    parser.add_argument("--days", type=float, default=1)
+    parser.add_argument("--interval", type=int, default=300, help="Scrape interval in seconds")
+    parser.add_argument("--runbooks", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    # Stub Ollama
+    parser.add_argument("--tokens", type=int, default=64)
+    parser.add_argument("--first-token-ms", type=float, default=200.0)
+    parser.add_argument("--token-ms", type=float, default=5.0)
+    parser.add_argument("--llm-parallel", type=int, default=4, help="Concurrent generations the stub serves (OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--llm-cache", action="store_true", help="Keep the LLM response cache enabled")
+    # Results
+    parser.add_argument("--output", help="Write JSON results here (default: stdout)")
+    parser.add_argument("--compare", help="Baseline JSON from a previous run")
+    parser.add_argument("--threshold", type=float, default=0.2, help="p95 increase counted as a regression (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _prepare_environment(tmp, args)
+        setup_started = time.perf_counter()
+        nodes, edges, collection = _build_data(args)
+        stub_ollama = _install_stubs(collection, args)
+        setup_seconds = time.perf_counter() - setup_started
+
+        results = asyncio.run(_run(args, [n["name"] for n in nodes]))
+
+        from src.backend.services.sqlite_service import sqlite_service
+        sqlite_service.close()
+
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "setup_seconds": round(setup_seconds, 2),
+            "llm_calls": stub_ollama.calls,
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(payload)
+    else:
+        print(payload)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(baseline, report, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
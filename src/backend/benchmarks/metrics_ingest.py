@@ -0,0 +1,98 @@
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from src.backend.config import settings
+from src.backend.services.metrics_ingest import MetricsWriter, Points, encode_binary, parse_binary, parse_json, parse_ndjson
+from src.backend.services.sqlite_service import SQLiteService
+from src.backend.benchmarks.schema_latency import _points
+
+# Ingest throughput: payload parsing per format, then the writer (raw points plus
+# rollups) on binary batches, with a reader polling rollups the whole time to show
+# what the writes do to read latency.
+# Usage (from the project root):
+#   python -m src.backend.benchmarks.metrics_ingest --points 2000000 --services 200 --batch-points 500000
+
+
+def _parse_rates(points: Points):
+    rows = list(points.rows())
+    payloads = {
+        "json": (parse_json, json.dumps([list(r) for r in rows]).encode()),
+        "ndjson": (parse_ndjson, "\n".join(
+            json.dumps({"ts": t, "service_name": s, "metric_name": m, "value": v}) for t, s, m, v in rows
+        ).encode()),
+        "binary": (parse_binary, encode_binary(points)),
+    }
+    rates = {}
+    for name, (parse, body) in payloads.items():
+        start = time.perf_counter()
+        parse(body)
+        rates[name] = (len(rows) / (time.perf_counter() - start), len(body) / len(rows))
+    return rates
+
+
+def _reader(service: SQLiteService, names, stop: threading.Event, samples: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        service.get_metric_rollups(names, hours=24)
+        samples.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.02)
+
+
+def run(total, services, interval, request_points, batch_points, capacity):
+    points = Points.from_rows(_points(total, services, interval))
+    requests = [parse_binary(encode_binary(points.slice(i, i + request_points))) for i in range(0, total, request_points)]
+    rates = _parse_rates(points.slice(0, min(total, 100000)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.SQLITE_DB_PATH = os.path.join(tmp, "metrics.db")
+        writer = MetricsWriter(settings.SQLITE_DB_PATH, capacity=capacity, batch_points=batch_points, flush_seconds=0.2)
+        reader = SQLiteService()
+        idle, busy = [], []
+        stop = threading.Event()
+        for _ in range(20):
+            start = time.perf_counter()
+            reader.get_metric_rollups(points.services[:5], hours=24)
+            idle.append((time.perf_counter() - start) * 1000)
+        thread = threading.Thread(target=_reader, args=(reader, points.services[:5], stop, busy), daemon=True)
+        thread.start()
+        start = time.perf_counter()
+        for batch in requests:
+            writer.submit(batch, timeout=3600)
+        writer.flush()
+        elapsed = time.perf_counter() - start
+        stop.set()
+        thread.join()
+        writer.close()
+        reader.close()
+    return rates, total / elapsed, idle, busy
+
+
+def _p95(samples):
+    return statistics.quantiles(samples, n=20)[-1] if len(samples) > 1 else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark metric ingestion: payload parsing and buffered SQLite writes.")
+    parser.add_argument("--points", type=int, default=2000000)
+    parser.add_argument("--services", type=int, default=200)
+    parser.add_argument("--interval", type=int, default=15, help="Scrape interval in seconds")
+    parser.add_argument("--request-points", type=int, default=100000, help="Points per submitted batch (one API request)")
+    parser.add_argument("--batch-points", type=int, default=settings.METRICS_INGEST_BATCH_POINTS, help="Points per write transaction")
+    parser.add_argument("--capacity", type=int, default=settings.METRICS_INGEST_BUFFER_POINTS, help="Buffer size in points")
+    args = parser.parse_args()
+
+    rates, write_rate, idle, busy = run(args.points, args.services, args.interval, args.request_points,
+                                        args.batch_points, args.capacity)
+    print(f"{'format':>8} | {'parse (points/s)':>16} | {'bytes/point':>11}")
+    for name, (rate, size) in rates.items():
+        print(f"{name:>8} | {rate:>16,.0f} | {size:>11.1f}")
+    print(f"\nwrite + rollups: {write_rate:,.0f} points/s ({args.points} points, {args.batch_points} per transaction)")
+    print(f"rollup reads p95: {_p95(idle):.1f} ms idle, {_p95(busy):.1f} ms while ingesting ({len(busy)} reads)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+import pandas as pd
+from src.backend.config import settings
+from src.backend.models import MetricsResponse, MetricPoint
+from src.backend.services import metrics_schema
+from src.backend.services.sqlite_service import SQLiteService
+from src.backend.benchmarks.schema_latency import _points
+
+# End-to-end cost of a /metrics/all pull (query + objects + JSON) for the original
+# pandas/pydantic path, the current row format and the columnar format.
+# Usage (from the project root):
+#   python -m src.backend.benchmarks.metrics_serialization --rows 1000 100000 1000000
+
+LATEST_QUERY = """
+    SELECT datetime(p.ts, 'unixepoch', 'localtime') AS timestamp,
+           s.name AS service_name, m.name AS metric_name, p.value AS value
+    FROM metric_points p
+    JOIN services s ON s.id = p.service_id
+    JOIN metric_names m ON m.id = p.metric_id
+    ORDER BY p.ts DESC
+    LIMIT ?
+"""
+
+
+def _build(path, rows, services, interval):
+    conn = sqlite3.connect(path)
+    metrics_schema.ensure_schema(conn)
+    batch = []
+    for point in _points(rows, services, interval):
+        batch.append(point)
+        if len(batch) == 100000:
+            metrics_schema.insert_points(conn, batch)
+            batch = []
+    metrics_schema.insert_points(conn, batch)
+    conn.commit()
+    conn.close()
+
+
+def _pandas_rows(path, limit):
+    # The original endpoint: read_sql_query -> to_dict -> one MetricPoint per row
+    conn = sqlite3.connect(path)
+    df = pd.read_sql_query(LATEST_QUERY, conn, params=[limit])
+    conn.close()
+    metrics = [
+        MetricPoint(timestamp=str(row["timestamp"]), service_name=row["service_name"],
+                    metric_name=row["metric_name"], value=float(row["value"]))
+        for row in df.to_dict(orient="records")
+    ]
+    return MetricsResponse(metrics=metrics).model_dump_json()
+
+
+def _cursor_rows(service, limit):
+    metrics = [
+        MetricPoint(timestamp=str(row["timestamp"]), service_name=row["service_name"],
+                    metric_name=row["metric_name"], value=float(row["value"]))
+        for row in service.get_latest_metrics(limit)
+    ]
+    return MetricsResponse(metrics=metrics).model_dump_json()
+
+
+def _columnar(service, limit):
+    return json.dumps(service.get_metrics_page_columnar(limit))
+
+
+def _time(fn, repeat):
+    samples = []
+    payload = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        payload = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), len(payload)
+
+
+def run(rows, services, interval, repeat):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "metrics.db")
+        _build(path, rows, services, interval)
+        settings.SQLITE_DB_PATH = path
+        service = SQLiteService()
+        try:
+            pandas_ms, pandas_bytes = _time(lambda: _pandas_rows(path, rows), repeat)
+            rows_ms, rows_bytes = _time(lambda: _cursor_rows(service, rows), repeat)
+            columnar_ms, columnar_bytes = _time(lambda: _columnar(service, rows), repeat)
+        finally:
+            service.close()
+    return {
+        "rows": rows,
+        "pandas_rows_ms": pandas_ms, "pandas_rows_bytes": pandas_bytes,
+        "cursor_rows_ms": rows_ms, "cursor_rows_bytes": rows_bytes,
+        "columnar_ms": columnar_ms, "columnar_bytes": columnar_bytes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /metrics/all row vs. columnar serialization.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 100000, 1000000])
+    parser.add_argument("--services", type=int, default=1000)
+    parser.add_argument("--interval", type=int, default=15, help="Scrape interval in seconds")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} | {'pandas rows (ms)':>16} | {'cursor rows (ms)':>16} | {'columnar (ms)':>13} | {'rows MB':>8} | {'columnar MB':>11}")
+    for rows in args.rows:
+        r = run(rows, args.services, args.interval, args.repeat)
+        print(f"{rows:>10} | {r['pandas_rows_ms']:>16.1f} | {r['cursor_rows_ms']:>16.1f} | {r['columnar_ms']:>13.1f} | "
+              f"{r['cursor_rows_bytes'] / 1e6:>8.2f} | {r['columnar_bytes'] / 1e6:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
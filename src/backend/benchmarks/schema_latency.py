@@ -0,0 +1,123 @@
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from src.backend.services import metrics_schema
+
+# Query latency vs. row count for the legacy `metrics` table and the indexed v2 schema.
+# Usage (from the project root):
+#   python -m src.backend.benchmarks.schema_latency --rows 10000 100000 1000000
+
+METRICS = ["latency_p95", "error_rate", "throughput"]
+
+
+def _points(rows: int, services: int, interval: int):
+    now = int(time.time())
+    per_tick = services * len(METRICS)
+    ticks = rows // per_tick + 1
+    start = now - ticks * interval
+    emitted = 0
+    for tick in range(ticks):
+        ts = start + tick * interval
+        for s in range(services):
+            for metric in METRICS:
+                if emitted == rows:
+                    return
+                yield ts, f"Service{s:04d}", metric, random.random() * 100
+                emitted += 1
+
+
+def _build_legacy(path, rows, services, interval):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE metrics (timestamp DATETIME, service_name TEXT, metric_name TEXT, value REAL)")
+    conn.executemany(
+        "INSERT INTO metrics VALUES (?, ?, ?, ?)",
+        ((datetime.fromtimestamp(ts), s, m, v) for ts, s, m, v in _points(rows, services, interval))
+    )
+    conn.commit()
+    return conn
+
+
+def _build_v2(path, rows, services, interval):
+    conn = sqlite3.connect(path)
+    metrics_schema.ensure_schema(conn)
+    batch = []
+    for point in _points(rows, services, interval):
+        batch.append(point)
+        if len(batch) == 100000:
+            metrics_schema.insert_points(conn, batch)
+            batch = []
+    metrics_schema.insert_points(conn, batch)
+    conn.commit()
+    return conn
+
+
+def _time(conn, query, params, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(query, params).fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def run(rows, services, interval, repeat):
+    window_start = int(time.time()) - 3 * 3600
+    targets = [f"Service{s:04d}" for s in range(min(3, services))]
+    placeholders = ", ".join("?" for _ in targets)
+
+    legacy_window = f"""
+        SELECT timestamp, service_name, metric_name, value FROM metrics
+        WHERE service_name IN ({placeholders}) AND timestamp >= ?
+        ORDER BY timestamp ASC
+    """
+    v2_window = f"""
+        SELECT p.ts, s.name, m.name, p.value
+        FROM services s CROSS JOIN metric_names m CROSS JOIN metric_points p
+        WHERE s.name IN ({placeholders}) AND p.service_id = s.id AND p.metric_id = m.id AND p.ts >= ?
+        ORDER BY p.ts ASC
+    """
+    legacy_latest = "SELECT timestamp, service_name, metric_name, value FROM metrics ORDER BY timestamp DESC LIMIT 100"
+    v2_latest = """
+        SELECT p.ts, s.name, m.name, p.value FROM metric_points p
+        JOIN services s ON s.id = p.service_id JOIN metric_names m ON m.id = p.metric_id
+        ORDER BY p.ts DESC LIMIT 100
+    """
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = _build_legacy(os.path.join(tmp, "legacy.db"), rows, services, interval)
+        v2 = _build_v2(os.path.join(tmp, "v2.db"), rows, services, interval)
+        result = {
+            "rows": rows,
+            "legacy_window_ms": _time(legacy, legacy_window, targets + [str(datetime.fromtimestamp(window_start))], repeat),
+            "v2_window_ms": _time(v2, v2_window, targets + [window_start], repeat),
+            "legacy_latest_ms": _time(legacy, legacy_latest, [], repeat),
+            "v2_latest_ms": _time(v2, v2_latest, [], repeat),
+        }
+        legacy.close()
+        v2.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark legacy vs. indexed metrics schema.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--services", type=int, default=1000)
+    parser.add_argument("--interval", type=int, default=15, help="Scrape interval in seconds")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} | {'3 svc / 3h window (ms)':>26} | {'latest 100 (ms)':>22}")
+    print(f"{'':>10} | {'legacy':>12} {'v2':>13} | {'legacy':>10} {'v2':>11}")
+    for rows in args.rows:
+        r = run(rows, args.services, args.interval, args.repeat)
+        print(f"{rows:>10} | {r['legacy_window_ms']:>12.2f} {r['v2_window_ms']:>13.2f} | "
+              f"{r['legacy_latest_ms']:>10.2f} {r['v2_latest_ms']:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import asyncio
+import hashlib
+from typing import Any, Dict, List
+import numpy as np
+from chromadb import Documents, EmbeddingFunction, Embeddings
+
+# In-process stand-ins for the external services, used by the load test.
+
+
+class HashEmbedding(EmbeddingFunction[Documents]):
+    """
+    Deterministic bag-of-words hashing embedding. No model download, so the
+    benchmark runs offline; Chroma's index and query path are still exercised.
+    """
+    def __init__(self, dim: int = 64):
+        self.dim = dim
+
+    def __call__(self, input: Documents) -> Embeddings:
+        vectors = []
+        for text in input:
+            v = np.zeros(self.dim, dtype=np.float32)
+            for token in text.lower().split():
+                h = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+                v[h % self.dim] += 1.0
+            norm = np.linalg.norm(v)
+            vectors.append(v / norm if norm else v)
+        return vectors
+
+    @staticmethod
+    def name() -> str:
+        return "hash-benchmark"
+
+    def get_config(self) -> Dict[str, Any]:
+        return {"dim": self.dim}
+
+    @staticmethod
+    def build_from_config(config: Dict[str, Any]) -> "HashEmbedding":
+        return HashEmbedding(config["dim"])
+
+
+class StubOllama:
+    """
+    Stands in for ollama.AsyncClient.chat(). Each generation waits `first_token_ms`
+    then `token_ms` per token, and at most `parallel` generations run at once
+    (like OLLAMA_NUM_PARALLEL); the rest queue.
+    """
+    def __init__(self, tokens: int = 64, first_token_ms: float = 200.0, token_ms: float = 20.0, parallel: int = 4):
+        self.tokens = tokens
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+        self.parallel = parallel
+        self._semaphore = None
+        self.calls = 0
+
+    def _slot(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.parallel)
+        return self._semaphore
+
+    def _token(self, i: int) -> str:
+        return f"tok{i} "
+
+    async def _stream(self):
+        async with self._slot():
+            await asyncio.sleep(self.first_token_ms / 1000)
+            for i in range(self.tokens):
+                if i:
+                    await asyncio.sleep(self.token_ms / 1000)
+                yield {"message": {"role": "assistant", "content": self._token(i)}, "done": False}
+            yield {"message": {"role": "assistant", "content": ""}, "done": True}
+
+    async def chat(self, model: str, messages: List[Dict[str, str]], stream: bool = False, **kwargs):
+        self.calls += 1
+        if stream:
+            return self._stream()
+        async with self._slot():
+            await asyncio.sleep((self.first_token_ms + self.token_ms * (self.tokens - 1)) / 1000)
+        return {"message": {"role": "assistant", "content": "".join(self._token(i) for i in range(self.tokens))}, "done": True}
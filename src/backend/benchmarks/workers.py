@@ -0,0 +1,189 @@
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# Throughput of the non-LLM endpoints against a real multi-worker server: starts
+# `uvicorn --workers N` (with the shared cache when N > 1) on generated data
+# (embedded graph backend, SQLite metrics), drives it from several client
+# processes over keep-alive connections and reports requests/s per worker count.
+# Scaling is bounded by the cores left over for the clients, run it on a host with
+# more cores than the largest worker count.
+# Usage (from the project root):
+#   python -m src.backend.benchmarks.workers --workers 1 2 4 --clients 4 --seconds 10
+
+ENDPOINTS = ("graph", "blast_radius", "metrics_all")
+
+
+def _path(endpoint: str, service_names, rng: random.Random) -> str:
+    if endpoint == "graph":
+        return "/api/v1/graph"
+    if endpoint == "blast_radius":
+        return f"/api/v1/graph/blast-radius/{rng.choice(service_names)}"
+    if endpoint == "metrics_all":
+        return "/api/v1/metrics/all?limit=100"
+    raise ValueError(f"Unknown endpoint {endpoint}")
+
+
+def _build_data(tmp: str, args):
+    from src.backend.scripts import generate_data
+    nodes, edges = generate_data.build_topology(args.services, args.mean_fanout, seed=args.seed)
+    generate_data.generate_topology_file(nodes, edges, os.path.join(tmp, "topology.json"))
+    generate_data.generate_sqlite_data(nodes, args.days, args.interval, args.seed, db_path=os.path.join(tmp, "metrics.db"))
+    return [n["name"] for n in nodes]
+
+
+def _server_env(tmp: str, workers: int) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "GRAPH_BACKEND": "embedded",
+        "TOPOLOGY_FILE": os.path.join(tmp, "topology.json"),
+        "SQLITE_DB_PATH": os.path.join(tmp, "metrics.db"),
+        "CHROMADB_PATH": os.path.join(tmp, "chroma"),
+        "LLM_CACHE_DB_PATH": "",
+        # Only the dependencies these endpoints use get built
+        "SERVICE_WARMUP": "false",
+        "RUNBOOK_CACHE_WARMUP": "false",
+        "METRICS_RETENTION_INTERVAL_SECONDS": "0",
+        "SHARED_CACHE_PATH": os.path.join(tmp, f"shared-{workers}.db") if workers > 1 else "",
+    })
+    return env
+
+
+def _start_server(tmp: str, workers: int, port: int) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.backend.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        env=_server_env(tmp, workers),
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return server
+        except OSError:
+            pass
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("Server did not come up within 60s")
+
+
+def _client(args) -> dict:
+    # One client process: `concurrency` threads, each on its own keep-alive connection
+    endpoint, port, service_names, seconds, concurrency, seed = args
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def run(thread_seed):
+        nonlocal errors
+        rng = random.Random(thread_seed)
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        local, failed = [], 0
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                conn.request("GET", _path(endpoint, service_names, rng))
+                response = conn.getresponse()
+                response.read()
+                failed += response.status >= 400
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            local.append((time.perf_counter() - start) * 1000)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            errors += failed
+
+    threads = [threading.Thread(target=run, args=(seed * 1000 + i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return {"latencies": latencies, "errors": errors}
+
+
+def measure(endpoint: str, port: int, service_names, args) -> dict:
+    work = [(endpoint, port, service_names, args.seconds, args.concurrency, args.seed + i) for i in range(args.clients)]
+    with multiprocessing.Pool(args.clients) as pool:
+        # Short warm-up so every worker has loaded its snapshot and opened its connections
+        pool.map(_client, [(endpoint, port, service_names, 1.0, args.concurrency, args.seed + i) for i in range(args.clients)])
+        started = time.perf_counter()
+        results = pool.map(_client, work)
+        wall = time.perf_counter() - started
+    latencies = [ms for r in results for ms in r["latencies"]]
+    return {
+        "requests": len(latencies),
+        "errors": sum(r["errors"] for r in results),
+        "throughput_rps": round(len(latencies) / wall, 1),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(statistics.quantiles(latencies, n=20)[-1], 2),
+    }
+
+
+def _shared_stats(port: int):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    conn.request("GET", "/api/v1/cache/stats")
+    return json.loads(conn.getresponse().read()).get("shared")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Non-LLM endpoint throughput per number of uvicorn workers.")
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, os.cpu_count() or 1}))
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--services", type=int, default=500)
+    parser.add_argument("--mean-fanout", type=float, default=2.0)
+    parser.add_argument("--days", type=int, default=1)
+    parser.add_argument("--interval", type=int, default=300, help="Seconds between generated metric points")
+    parser.add_argument("--clients", type=int, default=4, help="Client processes")
+    parser.add_argument("--concurrency", type=int, default=8, help="Connections per client process")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Measured seconds per endpoint")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        service_names = _build_data(tmp, args)
+        for workers in args.workers:
+            server = _start_server(tmp, workers, args.port)
+            try:
+                results[workers] = {endpoint: measure(endpoint, args.port, service_names, args) for endpoint in args.endpoints}
+                shared = _shared_stats(args.port) if workers > 1 else None
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+            if shared:
+                print(f"{workers} workers: shared cache entries {shared['entries']}")
+
+    print(f"\n{os.cpu_count()} cores, {args.clients} client processes x {args.concurrency} connections")
+    print(f"{'endpoint':>14} | {'workers':>7} | {'req/s':>9} | {'vs 1':>5} | {'p50 ms':>8} | {'p95 ms':>8} | {'errors':>6}")
+    for endpoint in args.endpoints:
+        base = results.get(min(args.workers), {}).get(endpoint, {}).get("throughput_rps")
+        for workers, by_endpoint in results.items():
+            r = by_endpoint[endpoint]
+            scale = f"{r['throughput_rps'] / base:.2f}" if base else "-"
+            print(f"{endpoint:>14} | {workers:>7} | {r['throughput_rps']:>9,.1f} | {scale:>5} | "
+                  f"{r['p50_ms']:>8} | {r['p95_ms']:>8} | {r['errors']:>6}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"cores": os.cpu_count(), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
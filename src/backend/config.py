@@ -10,9 +10,106 @@ class Settings:
     NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
     NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
     NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "password")
+
+    # Graph reads: "neo4j", or "embedded" to serve the topology from TOPOLOGY_FILE in memory, no server needed
+    # (write the file with generate_data.py --targets topology, or export Neo4j's with scripts/export_topology.py)
+    GRAPH_BACKEND = os.getenv("GRAPH_BACKEND", "neo4j").lower()
+    TOPOLOGY_FILE = os.getenv("TOPOLOGY_FILE", "./topology.json")
     
     CHROMADB_PATH = os.getenv("CHROMADB_PATH", "./chroma_db")
     OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
     SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", "./metrics.db")
 
+    # Pooled SQLite connections for the metrics read paths (WAL, per-connection page cache and mmap)
+    SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+    SQLITE_MMAP_SIZE_MB = int(os.getenv("SQLITE_MMAP_SIZE_MB", "256"))
+    SQLITE_CACHE_SIZE_MB = int(os.getenv("SQLITE_CACHE_SIZE_MB", "64"))
+
+    # LLM response cache (in-memory LRU, plus an optional on-disk SQLite tier when a path is set)
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+    LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+    LLM_CACHE_DB_PATH = os.getenv("LLM_CACHE_DB_PATH", "")
+
+    # In-process topology snapshot, reloaded from the graph backend on this interval (or on POST /graph/refresh)
+    TOPOLOGY_REFRESH_SECONDS = float(os.getenv("TOPOLOGY_REFRESH_SECONDS", "300"))
+
+    # Blast radius: how many hops to follow, and how many affected services feed the chat context
+    BLAST_RADIUS_MAX_DEPTH = int(os.getenv("BLAST_RADIUS_MAX_DEPTH", "3"))
+    BLAST_RADIUS_MAX_SERVICES = int(os.getenv("BLAST_RADIUS_MAX_SERVICES", "25"))
+
+    # Prompt sizes in estimated tokens: the system context (template + tables + runbooks) and the verbatim chat history
+    PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))
+    CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1000"))
+
+    # Chat sessions: Ollama keeps the model (and its prompt KV cache) loaded this long after a request;
+    # session context is re-fetched after CONTEXT_TTL, idle sessions expire, total session text is capped
+    OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+    CHAT_SESSION_CONTEXT_TTL_SECONDS = float(os.getenv("CHAT_SESSION_CONTEXT_TTL_SECONDS", "300"))
+    CHAT_SESSION_IDLE_SECONDS = float(os.getenv("CHAT_SESSION_IDLE_SECONDS", "1800"))
+    CHAT_SESSION_MAX_MB = int(os.getenv("CHAT_SESSION_MAX_MB", "64"))
+
+    # Runbook retrieval cache: query embeddings and top-k hits per query, dropped when the collection changes
+    RUNBOOK_CACHE_MAX_ENTRIES = int(os.getenv("RUNBOOK_CACHE_MAX_ENTRIES", "10000"))
+    RUNBOOK_CACHE_CHECK_SECONDS = float(os.getenv("RUNBOOK_CACHE_CHECK_SECONDS", "5"))
+    RUNBOOK_CACHE_WARMUP = os.getenv("RUNBOOK_CACHE_WARMUP", "true").lower() == "true"
+
+    # Hybrid runbook search: filtered pools up to POOL_LIMIT chunks are scored exactly, larger ones via the
+    # index (CANDIDATES nearest); NEIGHBOURS is how many graph neighbours' runbooks join the target's
+    HYBRID_POOL_LIMIT = int(os.getenv("HYBRID_POOL_LIMIT", "2000"))
+    HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "50"))
+    HYBRID_MAX_NEIGHBOURS = int(os.getenv("HYBRID_MAX_NEIGHBOURS", "10"))
+
+    # Runbook ingestion (scripts/ingest_runbooks.py, POST /vectors/ingest): Markdown/text files under RUNBOOKS_DIR,
+    # chunks of up to CHUNK_CHARS characters, EMBED_BATCH chunks per embedding call on INGEST_WORKERS threads
+    RUNBOOKS_DIR = os.getenv("RUNBOOKS_DIR", "./runbooks")
+    RUNBOOK_CHUNK_CHARS = int(os.getenv("RUNBOOK_CHUNK_CHARS", "1500"))
+    RUNBOOK_EMBED_BATCH = int(os.getenv("RUNBOOK_EMBED_BATCH", "64"))
+    RUNBOOK_INGEST_WORKERS = int(os.getenv("RUNBOOK_INGEST_WORKERS", "1"))
+
+    # Startup: services are built lazily on first use; SERVICE_WARMUP builds them (and warms the runbook
+    # cache) in a background thread right after startup. /ready probes each dependency with this timeout
+    SERVICE_WARMUP = os.getenv("SERVICE_WARMUP", "true").lower() == "true"
+    READINESS_TIMEOUT_SECONDS = float(os.getenv("READINESS_TIMEOUT_SECONDS", "2"))
+
+    # Multi-worker serving (WORKERS > 1 in run_backend.sh): each worker builds its own clients, and what should
+    # exist once per host (topology snapshot, runbook results and embeddings, LLM responses, chat sessions, batch
+    # job status) goes through the SQLite file at SHARED_CACHE_PATH. Empty = single process, in-memory caches only.
+    # Workers adopt a topology snapshot another worker loaded within TOPOLOGY_SYNC_SECONDS
+    SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "")
+    SHARED_CACHE_MAX_ENTRIES = int(os.getenv("SHARED_CACHE_MAX_ENTRIES", "100000"))
+    SHARED_CACHE_TTL_SECONDS = float(os.getenv("SHARED_CACHE_TTL_SECONDS", "3600"))
+    TOPOLOGY_SYNC_SECONDS = float(os.getenv("TOPOLOGY_SYNC_SECONDS", "5"))
+
+    # Live metrics ingest (POST /metrics/ingest, scripts/ingest_metrics.py): parsed points wait in a buffer of
+    # BUFFER_POINTS, a writer thread commits up to BATCH_POINTS per transaction (or whatever arrived within
+    # FLUSH_MS); a full buffer makes a request wait BLOCK_SECONDS before it gets a 429. MAX_BODY_MB caps a payload
+    METRICS_INGEST_BUFFER_POINTS = int(os.getenv("METRICS_INGEST_BUFFER_POINTS", "1000000"))
+    METRICS_INGEST_BATCH_POINTS = int(os.getenv("METRICS_INGEST_BATCH_POINTS", "500000"))
+    METRICS_INGEST_FLUSH_MS = int(os.getenv("METRICS_INGEST_FLUSH_MS", "200"))
+    METRICS_INGEST_BLOCK_SECONDS = float(os.getenv("METRICS_INGEST_BLOCK_SECONDS", "1.0"))
+    METRICS_INGEST_MAX_BODY_MB = int(os.getenv("METRICS_INGEST_MAX_BODY_MB", "64"))
+
+    # Metrics retention (services/metrics_retention.py): raw points are kept RAW_HOURS, each rollup resolution
+    # its own number of days (0 = forever). A background job deletes what expired every INTERVAL_SECONDS
+    # (0 disables it, POST /metrics/retention still runs it) and gives free pages beyond VACUUM_KEEP_FREE_MB
+    # back to the filesystem; the slack is kept for new points to reuse
+    METRICS_RETENTION_RAW_HOURS = int(os.getenv("METRICS_RETENTION_RAW_HOURS", "48"))
+    METRICS_RETENTION_1M_DAYS = int(os.getenv("METRICS_RETENTION_1M_DAYS", "30"))
+    METRICS_RETENTION_1H_DAYS = int(os.getenv("METRICS_RETENTION_1H_DAYS", "365"))
+    METRICS_RETENTION_1D_DAYS = int(os.getenv("METRICS_RETENTION_1D_DAYS", "0"))
+    METRICS_RETENTION_INTERVAL_SECONDS = float(os.getenv("METRICS_RETENTION_INTERVAL_SECONDS", "3600"))
+    METRICS_VACUUM_KEEP_FREE_MB = int(os.getenv("METRICS_VACUUM_KEEP_FREE_MB", "64"))
+
+    # Metric summaries for the SLO, chat and batch prompts are merged from the rollups; only anomaly detection
+    # reads raw points, over the last ANOMALY_HOURS of the window (0 disables it)
+    METRICS_ANOMALY_HOURS = float(os.getenv("METRICS_ANOMALY_HOURS", "6"))
+
+    # Stage spans and the Prometheus /metrics endpoint; OTEL_ENABLED also mirrors spans to OpenTelemetry
+    TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "true").lower() == "true"
+    OTEL_ENABLED = os.getenv("OTEL_ENABLED", "false").lower() == "true"
+
+    # Batch recommendations: generations in flight against Ollama (match OLLAMA_NUM_PARALLEL)
+    OLLAMA_MAX_CONCURRENCY = int(os.getenv("OLLAMA_MAX_CONCURRENCY", "2"))
+    BATCH_MAX_JOBS = int(os.getenv("BATCH_MAX_JOBS", "20"))
+
 settings = Settings()
@@ -1,12 +1,94 @@
-from fastapi import FastAPI
+import time
+
+# Set before the other imports so the startup report includes them
+_IMPORT_STARTED = time.perf_counter()
+
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from src.backend.services.neo4j_service import neo4j_service
-from src.backend.routers import slo, graph, vectors, metrics, chat
+from fastapi.responses import JSONResponse, PlainTextResponse
+from src.backend.services.topology_cache import topology_cache
+from src.backend.services.metrics_retention import retention_manager
+from src.backend.services.rag_service import rag_service, search_scope
+from src.backend.services.blast_radius import blast_radius_engine
+from src.backend.services.graph_backend import UPSTREAM, DOWNSTREAM
+from src.backend.services.providers import PROVIDERS, DependencyUnavailable, shutdown_all
+from src.backend.config import settings
+from src.backend.services.telemetry import TelemetryMiddleware, registry
+from src.backend.routers import slo, graph, vectors, metrics, chat, cache, batch
+
+logger = logging.getLogger(__name__)
+
+# Seconds per startup phase, reported by GET /ready:
+#   imports - importing the app (client libraries are deferred, see services/providers.py)
+#   lifespan - startup hook until the app accepts requests
+#   warmup - background build of every service; runbook_cache - warming the runbook cache
+startup_timings = {"imports": round(time.perf_counter() - _IMPORT_STARTED, 3)}
+
+def _warm_runbook_cache():
+    try:
+        topology = topology_cache.snapshot()
+        # Same scope the routers search with: the service plus its highest-impact neighbours
+        max_services = settings.BLAST_RADIUS_MAX_SERVICES
+        scopes = {
+            name: search_scope(
+                name,
+                blast_radius_engine.compute(topology, name, DOWNSTREAM)[:max_services],
+                blast_radius_engine.compute(topology, name, UPSTREAM)[:max_services],
+            )
+            for name in topology.names
+        }
+        warmed = rag_service.warm_cache(topology.names, scopes)
+        logger.info("Runbook cache warmed for %d services", warmed)
+    except Exception:
+        logger.warning("Runbook cache warm-up failed, queries will fill it on demand", exc_info=True)
+
+def _warm_up():
+    started = time.perf_counter()
+    if settings.SERVICE_WARMUP:
+        # Connects drivers and opens clients so the first requests don't pay for it
+        for provider in PROVIDERS.values():
+            try:
+                provider.get()
+            except DependencyUnavailable as e:
+                logger.warning("Warm-up: %s, it will be retried on first use", e)
+        startup_timings["warmup"] = round(time.perf_counter() - started, 3)
+        logger.info("Services initialized in %.2fs: %s", startup_timings["warmup"], ", ".join(
+            f"{name} {p.init_seconds:.2f}s" if p.init_seconds is not None else f"{name} failed"
+            for name, p in PROVIDERS.items()
+        ))
+    if settings.RUNBOOK_CACHE_WARMUP:
+        # Embeds and searches once per known service (loading the embedding model on the way)
+        runbooks_started = time.perf_counter()
+        _warm_runbook_cache()
+        startup_timings["runbook_cache"] = round(time.perf_counter() - runbooks_started, 3)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    # Snapshot loads lazily on first use if Neo4j isn't reachable yet
+    topology_cache.start()
+    # First retention run after one METRICS_RETENTION_INTERVAL_SECONDS
+    retention_manager.start()
+    if settings.SERVICE_WARMUP or settings.RUNBOOK_CACHE_WARMUP:
+        # Requests are served while this runs, they build whatever they need first themselves
+        threading.Thread(target=_warm_up, name="service-warmup", daemon=True).start()
+    startup_timings["lifespan"] = round(time.perf_counter() - started, 3)
+    logger.info("Startup: imports %.3fs, lifespan %.3fs", startup_timings["imports"], startup_timings["lifespan"])
+    yield
+    topology_cache.stop()
+    retention_manager.stop()
+    # Only services that were actually built get closed
+    await shutdown_all()
 
 app = FastAPI(
     title="SLO Recommender Agent",
     description="AI-driven SLO recommendations based on Service Topology, Metrics, and Runbooks.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 
@@ -23,23 +105,63 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# Per-route latency and the Server-Timing header (stage breakdown per request)
+app.add_middleware(TelemetryMiddleware)
+
 # Include Routers
 app.include_router(slo.router, prefix="/api/v1", tags=["SLO"])
 app.include_router(graph.router, prefix="/api/v1", tags=["Graph"])
 app.include_router(vectors.router, prefix="/api/v1", tags=["Vectors"])
 app.include_router(metrics.router, prefix="/api/v1", tags=["Metrics"])
 app.include_router(chat.router, prefix="/api/v1", tags=["Chat"])
+app.include_router(cache.router, prefix="/api/v1", tags=["Cache"])
+app.include_router(batch.router, prefix="/api/v1", tags=["Batch"])
 
-@app.on_event("shutdown")
-def shutdown_event():
-    neo4j_service.close()
+@app.exception_handler(DependencyUnavailable)
+async def dependency_unavailable(request: Request, exc: DependencyUnavailable):
+    # A backend that can't be reached fails only the requests that need it
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
 
 @app.get("/health")
 def health_check():
+    # Liveness only: answers as soon as the app is up, without touching any backend
     return {"status": "healthy"}
 
+async def _probe(provider) -> dict:
+    started = time.perf_counter()
+    error = None
+    try:
+        await asyncio.wait_for(asyncio.to_thread(provider.check), settings.READINESS_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        error = f"no answer within {settings.READINESS_TIMEOUT_SECONDS}s"
+    except Exception as e:
+        error = str(e)
+    return {**provider.status(), "ready": error is None, "error": error, "check_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness per dependency (graph backend, ChromaDB, SQLite, Ollama), probed in parallel.
+    503 while a required one is down; Ollama being down only degrades the status.
+    Also reports the startup time breakdown.
+    """
+    results = await asyncio.gather(*(_probe(p) for p in PROVIDERS.values()))
+    dependencies = dict(zip(PROVIDERS, results))
+    ready = all(r["ready"] for name, r in dependencies.items() if PROVIDERS[name].required)
+    status = "unavailable" if not ready else ("ready" if all(r["ready"] for r in results) else "degraded")
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": status, "dependencies": dependencies, "startup": startup_timings},
+    )
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    # Prometheus scrape target: stage latencies, rows/bytes/tokens, cache hit/miss counts
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("src.backend.main:app", host="0.0.0.0", port=8000, reload=True)
@@ -9,13 +9,24 @@ class ServiceNode(BaseModel):
 class Dependency(BaseModel):
     source: str
     target: str
-    criticality: str
+    criticality: Optional[str] = None
 
 class MetricPoint(BaseModel):
-    timestamp: str
-    service_name: str
-    metric_name: str
-    value: float
+    # Fields are optional so `fields=` projections can leave some out
+    timestamp: Optional[str] = None
+    service_name: Optional[str] = None
+    metric_name: Optional[str] = None
+    value: Optional[float] = None
+
+class MetricsColumnarResponse(BaseModel):
+    # Parallel arrays, row i is (timestamps[i], services[service_codes[i]], metrics[metric_codes[i]], values[i])
+    timestamps: Optional[List[int]] = None
+    values: Optional[List[float]] = None
+    service_codes: Optional[List[int]] = None
+    metric_codes: Optional[List[int]] = None
+    services: Optional[List[str]] = None
+    metrics: Optional[List[str]] = None
+    next_cursor: Optional[str] = None
 
 class SLOResponse(BaseModel):
     service_name: str
@@ -28,16 +39,147 @@ class ServiceGraph(BaseModel):
     nodes: List[ServiceNode]
     edges: List[Dependency]
 
+class AffectedService(BaseModel):
+    name: str
+    type: Optional[str] = None
+    tier: Optional[str] = None
+    criticality: Optional[str] = None
+    depth: int
+    impact: float
+    via: List[str]
+
+class BlastRadiusResponse(BaseModel):
+    service_name: str
+    max_depth: int
+    upstream: List[AffectedService]
+    downstream: List[AffectedService]
+
+class TopologyStatus(BaseModel):
+    version: int
+    services: int
+    dependencies: int
+    loaded_at: float
+
 class VectorDocument(BaseModel):
+    id: str
+    text: Optional[str] = None
+    metadata: Optional[Dict[str, Any]] = None
+
+class RunbookHit(BaseModel):
     id: str
     text: str
     metadata: Dict[str, Any]
+    score: Optional[float] = None
+
+class RunbookSearchResponse(BaseModel):
+    query: str
+    services: Optional[List[str]] = None
+    types: Optional[List[str]] = None
+    hits: List[RunbookHit]
+
+class RunbookIngestRequest(BaseModel):
+    # Report what would change without embedding or writing anything
+    dry_run: bool = False
+    # Delete chunks of files that are no longer in the runbooks directory
+    prune: bool = True
+
+class RunbookIngestResponse(BaseModel):
+    files: int
+    unchanged_files: int
+    chunks: int
+    added: int
+    updated: int
+    deleted: int
+    unchanged: int
+    deleted_files: List[str]
+    dry_run: bool
+    seconds: float
 
 class VectorCollectionResponse(BaseModel):
     documents: List[VectorDocument]
+    # Pass back as `cursor` for the next page, None on the last page
+    next_cursor: Optional[str] = None
 
 class MetricsResponse(BaseModel):
     metrics: List[MetricPoint]
+    next_cursor: Optional[str] = None
+
+class MetricRollup(BaseModel):
+    timestamp: str
+    resolution: str
+    service_name: str
+    metric_name: str
+    count: int
+    avg: float
+    stddev: float
+    min: float
+    max: float
+    p50: Optional[float] = None
+    p95: Optional[float] = None
+    p99: Optional[float] = None
+
+class MetricRollupResponse(BaseModel):
+    rollups: List[MetricRollup]
+
+class MetricsIngestResponse(BaseModel):
+    accepted: int
+    # True when the request waited for the points (and their rollups) to be committed
+    written: bool
+    # Points waiting for the writer after this batch was queued
+    buffered: int
+
+class MetricsIngestStats(BaseModel):
+    buffered: int
+    capacity: int
+    written: int
+    batches: int
+    # Points refused with a 429 / lost to a failed write since startup
+    rejected: int
+    dropped: int
+    # Points skipped because their (service, metric, ts) was already stored
+    duplicates: int = 0
+    last_error: Optional[str] = None
+    last_batch_seconds: float
+    points_per_second: float
+
+class MetricsRetentionRequest(BaseModel):
+    # Count what would be deleted without deleting or vacuuming
+    dry_run: bool = False
+
+class MetricsRetentionResponse(BaseModel):
+    cutoffs: Dict[str, int]
+    deleted: Dict[str, int]
+    partitions: int
+    skipped: Optional[str] = None
+    auto_vacuum: str
+    vacuumed_pages: int
+    bytes_before: int
+    bytes_after: int
+    reclaimed_bytes: int
+    free_bytes: int
+    dry_run: bool
+    interrupted: bool
+    started_at: float
+    seconds: float
+
+class MetricsStorageResponse(BaseModel):
+    file_bytes: int
+    wal_bytes: int
+    page_size: int
+    pages: int
+    # Pages inside the file that new points reuse before it grows
+    free_pages: int
+    free_bytes: int
+    # "incremental" when retention can shrink the file
+    auto_vacuum: str
+    # Epoch seconds of the oldest / newest raw point, None when there are none
+    oldest_point: Optional[int] = None
+    newest_point: Optional[int] = None
+    # Bytes per table and index, only with ?tables=true
+    tables: Optional[Dict[str, int]] = None
+    # Seconds each tier ("raw", "1m", "1h", "1d") is kept for, 0 = forever
+    retention: Dict[str, int]
+    last_run: Optional[MetricsRetentionResponse] = None
 
 class ChatMessage(BaseModel):
     role: str
@@ -50,3 +192,40 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     role: str
     content: str
+    session_id: Optional[str] = None
+
+class ChatSessionRequest(BaseModel):
+    service_name: str
+
+class ChatTurnRequest(BaseModel):
+    content: str
+
+class ChatSessionInfo(BaseModel):
+    session_id: str
+    service_name: str
+    turns: int
+    summarized: bool
+    context_rebuilds: int
+    size_bytes: int
+    created_at: float
+    last_used: float
+
+class CacheInvalidationResponse(BaseModel):
+    service_name: Optional[str] = None
+    removed: int
+
+class BatchRecommendRequest(BaseModel):
+    # Either an explicit list of services, or every service in a tier (or all services if neither is set)
+    services: Optional[List[str]] = None
+    tier: Optional[str] = None
+
+class BatchJobStatus(BaseModel):
+    job_id: str
+    status: str
+    total: int
+    completed: int
+    failed: int
+    created_at: float
+    finished_at: Optional[float] = None
+    results: List[SLOResponse]
+    errors: Dict[str, str]
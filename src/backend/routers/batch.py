@@ -0,0 +1,30 @@
+from fastapi import APIRouter, HTTPException
+from src.backend.models import BatchRecommendRequest, BatchJobStatus
+from src.backend.services.batch_service import batch_service
+
+router = APIRouter()
+
+@router.post("/batch/recommend", response_model=BatchJobStatus, status_code=202)
+async def submit_batch(request: BatchRecommendRequest):
+    # Returns right away, poll GET /batch/recommend/{job_id} for progress and partial results
+    services = await batch_service.resolve_services(request.services, request.tier)
+    if not services:
+        raise HTTPException(status_code=400, detail="No services matched the request")
+    job = batch_service.submit(services)
+    return BatchJobStatus(**job.to_dict())
+
+@router.get("/batch/recommend/{job_id}", response_model=BatchJobStatus)
+async def get_batch(job_id: str):
+    # Served by any worker, not just the one running the job
+    status = batch_service.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return BatchJobStatus(**status)
+
+@router.delete("/batch/recommend/{job_id}", response_model=BatchJobStatus)
+async def cancel_batch(job_id: str):
+    # Recommendations that already finished are kept in the job
+    status = batch_service.cancel(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return BatchJobStatus(**status)
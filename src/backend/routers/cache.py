@@ -0,0 +1,32 @@
+from typing import Any, Dict, Optional
+from fastapi import APIRouter
+from src.backend.models import CacheInvalidationResponse
+from src.backend.services.llm_cache import llm_cache
+from src.backend.services.chat_sessions import chat_sessions
+from src.backend.services.rag_service import rag_service
+from src.backend.services.shared_cache import shared_cache
+
+router = APIRouter()
+
+@router.get("/cache/stats", response_model=Dict[str, Dict[str, Any]])
+async def get_cache_stats():
+    stats = {"llm": llm_cache.stats(), "chat_sessions": chat_sessions.stats(), "runbooks": rag_service.cache.stats()}
+    shared = shared_cache()
+    if shared is not None:
+        # Counters are this worker's, entries and file size the host's
+        stats["shared"] = shared.stats()
+    return stats
+
+@router.post("/cache/invalidate", response_model=CacheInvalidationResponse)
+async def invalidate_cache(service_name: Optional[str] = None):
+    # Call this after changing a service's topology, runbooks or metrics out of band.
+    # Without a service name every cached completion is dropped.
+    # Chat sessions for the service re-fetch their context on the next turn
+    chat_sessions.invalidate_service(service_name)
+    # A runbook can rank for any service's query, so cached hits are dropped as a whole (embeddings are kept)
+    rag_service.invalidate()
+    if service_name:
+        removed = llm_cache.invalidate_service(service_name)
+    else:
+        removed = llm_cache.clear()
+    return CacheInvalidationResponse(service_name=service_name, removed=removed)
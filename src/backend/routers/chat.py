@@ -1,66 +1,177 @@
-from fastapi import APIRouter, HTTPException
-from src.backend.models import ChatRequest, ChatResponse
-from src.backend.services.neo4j_service import neo4j_service
-from src.backend.services.rag_service import rag_service
+import asyncio
+from fastapi import APIRouter, HTTPException, Request
+from src.backend.models import ChatRequest, ChatResponse, ChatSessionRequest, ChatTurnRequest, ChatSessionInfo
+from src.backend.services.topology_cache import topology_cache
+from src.backend.services.blast_radius import blast_radius_engine
+from src.backend.services.graph_backend import UPSTREAM, DOWNSTREAM
+from src.backend.config import settings
+from src.backend.services.rag_service import rag_service, runbook_query, search_scope
+from src.backend.services.hybrid_search import infer_failure_types
 from src.backend.services.sqlite_service import sqlite_service
 from src.backend.services.llm_service import llm_service
+from src.backend.services.streaming import stream_tokens
+from src.backend.services.chat_sessions import chat_sessions
+from src.backend.services.telemetry import span, record_cache, record_prompt
 
 router = APIRouter()
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat_slo(request: ChatRequest):
-    service_name = request.service_name
-    
+async def _gather_context(service_name: str, question: str = None):
+    query = runbook_query(service_name)
+
     # 1. Re-fetch Context (To keep the assistant stateless and up-to-date)
-    service_details = neo4j_service.get_service_details(service_name)
+    # Graph context comes from the topology snapshot (refreshed in the background)
+    topology = await topology_cache.snapshot_async()
+    service_details = topology.get_service_details(service_name)
     if not service_details:
         raise HTTPException(status_code=404, detail="Service not found")
-        
-    # Fetch BLAST RADIUS Context (Upstream & Downstream)
-    downstream_deps = neo4j_service.get_dependencies(service_name)
-    upstream_deps = neo4j_service.get_upstream_dependencies(service_name)
-    
+
+    # Fetch BLAST RADIUS Context (transitive Upstream & Downstream, highest impact first)
+    max_services = settings.BLAST_RADIUS_MAX_SERVICES
+    with span("graph.blast_radius") as s:
+        downstream_deps = blast_radius_engine.compute(topology, service_name, DOWNSTREAM)[:max_services]
+        upstream_deps = blast_radius_engine.compute(topology, service_name, UPSTREAM)[:max_services]
+        s.set(rows=len(downstream_deps) + len(upstream_deps))
+
     # Collect all relevant service names for metrics
     related_services = [service_name] + \
                       [d['name'] for d in downstream_deps] + \
                       [u['name'] for u in upstream_deps]
-    
+
     # Deduplicate
     related_services = list(set(related_services))
-    
-    query = f"{service_name} latency error failure"
-    runbook_results = rag_service.query_runbooks(query)
-    runbooks = runbook_results['documents'][0] if runbook_results and runbook_results['documents'] else []
-    
-    # Fetch metrics for ALL related services
+
+    # Fetch runbooks and metrics for ALL related services concurrently
     # We limit to last 3 hours for chat to keep context small but relevant
-    metrics = sqlite_service.get_multi_service_metrics(related_services, hours=3)
-    
-    # Summarize metrics: We can't dump thousands of rows. 
-    # Let's take the last 5 data points per service/metric combo
-    metrics_summary = []
-    # Simple grouping by service+metric
-    from collections import defaultdict
-    grouped = defaultdict(list)
-    for m in metrics:
-        key = f"{m['service_name']}_{m['metric_name']}"
-        grouped[key].append(m)
-    
-    for key, values in grouped.items():
-        # Take last 3 values
-        metrics_summary.extend(values[-3:])
+    # Runbooks of the service and its closest neighbours, narrowed to the failure type the question is about
+    types = infer_failure_types(question) if question else None
+    runbook_hits, metrics_summary = await asyncio.gather(
+        rag_service.hybrid_search_async(query, search_scope(service_name, downstream_deps, upstream_deps), types),
+        # One summary row per service/metric instead of thousands of raw rows
+        sqlite_service.get_metric_stats_async(related_services, hours=3),
+    )
+    runbooks = [hit["text"] for hit in runbook_hits]
+
+    return {
+        "service_data": service_details,
+        "dependencies": downstream_deps,
+        "upstream_dependencies": upstream_deps,
+        "runbooks": runbooks,
+        "metrics": metrics_summary,
+    }
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat_slo(request: ChatRequest):
+    context = await _gather_context(request.service_name, request.messages[-1].content if request.messages else None)
 
     # 2. Convert Pydantic models to dict for LLM service
     messages_dicts = [{"role": m.role, "content": m.content} for m in request.messages]
 
     # 3. Generate Response
-    response_content = llm_service.chat_with_context(
-        service_data=service_details,
-        dependencies=downstream_deps,
-        upstream_dependencies=upstream_deps, # New
-        runbooks=runbooks,
-        metrics=metrics_summary,
-        messages=messages_dicts
-    )
-    
+    response_content = await llm_service.chat_with_context_async(messages=messages_dicts, **context)
+
     return ChatResponse(role="assistant", content=response_content)
+
+@router.post("/chat/stream")
+async def chat_slo_stream(request: ChatRequest, http_request: Request):
+    context = await _gather_context(request.service_name, request.messages[-1].content if request.messages else None)
+    messages_dicts = [{"role": m.role, "content": m.content} for m in request.messages]
+
+    tokens = llm_service.stream_chat_with_context(messages=messages_dicts, **context)
+
+    # Context event lets the UI show the blast radius before the first token arrives
+    return stream_tokens(http_request, {
+        "service_name": request.service_name,
+        "service": context["service_data"],
+        "downstream": context["dependencies"],
+        "upstream": context["upstream_dependencies"],
+        "relevant_runbooks": context["runbooks"],
+        "metrics_count": len(context["metrics"]),
+    }, tokens)
+
+# Session mode: the server keeps the rendered system context and the history, the client
+# only sends the new message. The prefix sent to Ollama stays byte-identical between turns
+# (until the context is refreshed and actually differs), so with keep_alive the model only
+# prefills the new message.
+
+def _get_session(session_id: str):
+    session = chat_sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Chat session not found or expired")
+    return session
+
+# A turn holds session.lock from session.messages() through session.commit(), so concurrent turns
+# on one session run one after the other and each sees the history the previous one committed
+
+async def _refresh_context(session):
+    # Caller holds session.lock
+    topology = await topology_cache.snapshot_async()
+    if session.context_stale(topology.version):
+        # No per-question type filter here: the session's system context must not change with each message
+        context = await _gather_context(session.service_name)
+        system_context, report = llm_service.build_chat_system_context(**context)
+        changed = session.set_context(context, system_context, topology.version)
+        chat_sessions.save(session)
+        record_prompt("chat_session", report)
+        record_cache("chat_prefix", not changed)
+    else:
+        record_cache("chat_prefix", True)
+
+@router.post("/chat/sessions", response_model=ChatSessionInfo, status_code=201)
+async def create_chat_session(request: ChatSessionRequest):
+    topology = await topology_cache.snapshot_async()
+    if not topology.get_service_details(request.service_name):
+        raise HTTPException(status_code=404, detail="Service not found")
+    return chat_sessions.create(request.service_name).info()
+
+@router.get("/chat/sessions/{session_id}", response_model=ChatSessionInfo)
+async def get_chat_session(session_id: str):
+    return _get_session(session_id).info()
+
+@router.delete("/chat/sessions/{session_id}", status_code=204)
+async def delete_chat_session(session_id: str):
+    if not chat_sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Chat session not found or expired")
+
+@router.post("/chat/sessions/{session_id}/messages", response_model=ChatResponse)
+async def chat_session_turn(session_id: str, request: ChatTurnRequest):
+    session = _get_session(session_id)
+    async with session.lock:
+        await _refresh_context(session)
+        messages = session.messages(request.content)
+        try:
+            reply = await llm_service.chat_messages_async(messages)
+        except Exception as e:
+            # Not recorded, so a failed turn doesn't end up in the history
+            return ChatResponse(role="assistant", content=f"Error responding to chat: {str(e)}", session_id=session_id)
+        session.commit(request.content, reply)
+        chat_sessions.save(session)
+    return ChatResponse(role="assistant", content=reply, session_id=session_id)
+
+@router.post("/chat/sessions/{session_id}/messages/stream")
+async def chat_session_turn_stream(session_id: str, request: ChatTurnRequest, http_request: Request):
+    session = _get_session(session_id)
+    async with session.lock:
+        await _refresh_context(session)
+
+    async def tokens():
+        # The lock is taken inside the generator so it is released when the stream is closed
+        # (completion, error or disconnect), and never taken if the stream doesn't start
+        async with session.lock:
+            parts = []
+            async for token in llm_service.stream_chat_messages(session.messages(request.content)):
+                parts.append(token)
+                yield token
+            # Only reached when the stream ran to completion (not on disconnect or error)
+            session.commit(request.content, "".join(parts))
+            chat_sessions.save(session)
+
+    context = session.context
+    return stream_tokens(http_request, {
+        "session_id": session_id,
+        "service_name": session.service_name,
+        "service": context["service_data"],
+        "downstream": context["dependencies"],
+        "upstream": context["upstream_dependencies"],
+        "relevant_runbooks": context["runbooks"],
+        "metrics_count": len(context["metrics"]),
+    }, tokens())
@@ -1,37 +1,46 @@
-from fastapi import APIRouter
-from src.backend.services.neo4j_service import neo4j_service
-from src.backend.models import ServiceGraph, ServiceNode, Dependency
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from src.backend.services.topology_cache import topology_cache
+from src.backend.services.blast_radius import blast_radius_engine
+from src.backend.services.graph_backend import UPSTREAM, DOWNSTREAM
+from src.backend.models import ServiceGraph, ServiceNode, Dependency, TopologyStatus, BlastRadiusResponse
 
 router = APIRouter()
 
 @router.get("/graph", response_model=ServiceGraph)
 async def get_graph():
-    # Fetch all nodes and relationships for visualization
-    query = """
-    MATCH (s:Service)-[r:DEPENDS_ON]->(t:Service)
-    WHERE s.name <> 'Frontend' AND t.name <> 'Frontend'
-    RETURN s.name as source, t.name as target, r.criticality as criticality,
-           s.type as source_type, s.tier as source_tier,
-           t.type as target_type, t.tier as target_tier
-    """
+    # Fetch all nodes and relationships for visualization from the in-process snapshot
+    # (includes nodes without relationships, Frontend is hidden from the view)
+    topology = await topology_cache.snapshot_async()
+    nodes, edges = topology.get_graph(exclude=("Frontend",))
     
-    # We also need to get nodes that might not have relationships (though in our gen data all do)
-    # But for a robust graph, let's just get unique nodes from the rels for now or do two queries.
-    
-    # Let's do two queries to be safe
-    nodes_query = "MATCH (n:Service) WHERE n.name <> 'Frontend' RETURN n.name as name, n.type as type, n.tier as tier"
-    
-    with neo4j_service.driver.session() as session:
-        nodes_result = session.run(nodes_query)
-        nodes = [ServiceNode(**record.data()) for record in nodes_result]
-        
-        rels_result = session.run(query)
-        edges = []
-        for record in rels_result:
-            edges.append(Dependency(
-                source=record["source"], 
-                target=record["target"], 
-                criticality=record["criticality"]
-            ))
-            
-    return ServiceGraph(nodes=nodes, edges=edges)
+    return ServiceGraph(
+        nodes=[ServiceNode(**node) for node in nodes],
+        edges=[Dependency(**edge) for edge in edges]
+    )
+
+@router.post("/graph/refresh", response_model=TopologyStatus)
+async def refresh_graph():
+    # Change signal for when the topology in Neo4j (or the topology file) was updated out of band
+    topology = await asyncio.to_thread(topology_cache.refresh)
+    return TopologyStatus(
+        version=topology.version,
+        services=len(topology.names),
+        dependencies=topology.edge_count,
+        loaded_at=topology.loaded_at
+    )
+
+@router.get("/graph/blast-radius/{service_name}", response_model=BlastRadiusResponse)
+async def get_blast_radius(service_name: str, depth: Optional[int] = Query(None, ge=1, le=10)):
+    # Transitive callers (impacted) and dependencies (candidate root causes) with impact scores
+    topology = await topology_cache.snapshot_async()
+    if service_name not in topology.index:
+        raise HTTPException(status_code=404, detail="Service not found in Graph")
+    max_depth = depth or blast_radius_engine.max_depth
+    return BlastRadiusResponse(
+        service_name=service_name,
+        max_depth=max_depth,
+        upstream=blast_radius_engine.compute(topology, service_name, UPSTREAM, max_depth),
+        downstream=blast_radius_engine.compute(topology, service_name, DOWNSTREAM, max_depth)
+    )
@@ -1,31 +1,141 @@
-from fastapi import APIRouter
-from src.backend.services.sqlite_service import sqlite_service
-from src.backend.models import MetricsResponse, MetricPoint
-import sqlite3
-import pandas as pd
+import asyncio
+import dataclasses
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse
+from typing import List, Optional, Union
+from src.backend.config import settings
+from src.backend.services.sqlite_service import sqlite_service, METRIC_FIELDS
+from src.backend.services.rollups import to_epoch
+from src.backend.services.metrics_ingest import (
+    metrics_writer, parse_payload,
+    IngestFormatError, IngestBackpressure, IngestWriteError, UnsupportedPayload,
+)
+from src.backend.services.metrics_retention import retention_manager, RetentionBusy
+from src.backend.models import (
+    MetricsResponse, MetricPoint, MetricsColumnarResponse, MetricRollupResponse, MetricRollup,
+    MetricsIngestResponse, MetricsIngestStats,
+    MetricsStorageResponse, MetricsRetentionRequest, MetricsRetentionResponse,
+)
 
 router = APIRouter()
 
-@router.get("/metrics/all", response_model=MetricsResponse)
-async def get_all_metrics(limit: int = 100):
-    # Retrieve latest metrics
-    conn = sqlite3.connect(sqlite_service.db_path)
-    query = f"""
-        SELECT timestamp, service_name, metric_name, value 
-        FROM metrics 
-        ORDER BY timestamp DESC 
-        LIMIT {limit}
-    """
-    df = pd.read_sql_query(query, conn)
-    conn.close()
+@router.get("/metrics/all", response_model=Union[MetricsResponse, MetricsColumnarResponse], response_model_exclude_unset=True)
+async def get_all_metrics(
+    limit: int = Query(100, ge=1, le=1000000),
+    format: str = Query("rows", pattern="^(rows|columnar)$"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    service: List[str] = Query(None),
+    metric: List[str] = Query(None),
+    start: Optional[str] = Query(None, description="Epoch seconds or ISO datetime, inclusive"),
+    end: Optional[str] = Query(None, description="Epoch seconds or ISO datetime, exclusive"),
+    fields: Optional[str] = Query(None, description="Comma-separated subset of timestamp,service_name,metric_name,value"),
+):
+    # Newest first, keyset-paginated: follow next_cursor until it is null
+    page = dict(
+        limit=limit, cursor=cursor, services=service, metrics=metric,
+        start=_parse_time(start), end=_parse_time(end), fields=_parse_fields(fields),
+    )
+    try:
+        if format == "columnar":
+            # Parallel arrays built from the cursor, returned as-is (no per-row models to build or validate)
+            columns = await asyncio.to_thread(sqlite_service.get_metrics_page_columnar, **page)
+            return JSONResponse(columns)
+
+        # Retrieve latest metrics
+        result = await asyncio.to_thread(sqlite_service.get_metrics_page, **page)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     metrics = []
-    for _, row in df.iterrows():
-        metrics.append(MetricPoint(
-            timestamp=str(row['timestamp']),
-            service_name=row['service_name'],
-            metric_name=row['metric_name'],
-            value=float(row['value'])
-        ))
+    for row in result["metrics"]:
+        metrics.append(MetricPoint(**row))
         
-    return MetricsResponse(metrics=metrics)
+    return MetricsResponse(metrics=metrics, next_cursor=result["next_cursor"])
+
+def _parse_time(value: Optional[str]):
+    if value is None:
+        return None
+    try:
+        return int(to_epoch(float(value) if value.replace(".", "", 1).isdigit() else value))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid time: {value}")
+
+def _parse_fields(fields: Optional[str]):
+    if not fields:
+        return None
+    projection = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = set(projection) - set(METRIC_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return projection
+
+@router.get("/metrics/rollups", response_model=MetricRollupResponse)
+async def get_metric_rollups(
+    service: List[str] = Query(...),
+    hours: int = 24,
+    metric_name: Optional[str] = None,
+    resolution: Optional[str] = Query(None, pattern="^(1m|1h|1d)$"),
+):
+    # Resolution defaults to the coarsest one that can answer the window
+    rows = sqlite_service.get_metric_rollups(service, metric_name=metric_name, hours=hours, resolution=resolution)
+    return MetricRollupResponse(rollups=[MetricRollup(**row) for row in rows])
+
+@router.post("/metrics/ingest", response_model=MetricsIngestResponse, status_code=202)
+async def ingest_metrics(
+    request: Request,
+    wait: bool = Query(False, description="Respond once the points and their rollups are committed"),
+):
+    # Body is JSON, NDJSON or the compact binary format, picked by Content-Type (see services/metrics_ingest.py)
+    length = request.headers.get("content-length")
+    max_bytes = settings.METRICS_INGEST_MAX_BODY_MB * 1024 * 1024
+    if length and length.isdigit() and int(length) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Payload over {settings.METRICS_INGEST_MAX_BODY_MB} MB, split it into batches")
+    body = await request.body()
+    if len(body) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Payload over {settings.METRICS_INGEST_MAX_BODY_MB} MB, split it into batches")
+
+    try:
+        points = await asyncio.to_thread(parse_payload, body, request.headers.get("content-type"))
+        ticket = await asyncio.to_thread(metrics_writer.submit, points, settings.METRICS_INGEST_BLOCK_SECONDS)
+    except UnsupportedPayload as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except IngestFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except IngestBackpressure as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(max(1, round(e.retry_after)))})
+
+    written = False
+    if wait:
+        try:
+            written = await asyncio.to_thread(metrics_writer.wait, ticket)
+        except IngestWriteError as e:
+            raise HTTPException(status_code=500, detail=f"Write failed, points dropped: {e}")
+    return JSONResponse(
+        MetricsIngestResponse(accepted=len(points), written=written, buffered=metrics_writer.stats()["buffered"]).model_dump(),
+        status_code=200 if written else 202,
+    )
+
+@router.get("/metrics/ingest/stats", response_model=MetricsIngestStats)
+async def get_ingest_stats():
+    return MetricsIngestStats(**metrics_writer.stats())
+
+@router.get("/metrics/storage", response_model=MetricsStorageResponse)
+async def get_metrics_storage(tables: bool = Query(False, description="Add bytes per table and index (reads every page)")):
+    report = await asyncio.to_thread(retention_manager.storage, tables)
+    last = retention_manager.last_report
+    return MetricsStorageResponse(
+        **report,
+        retention=retention_manager.policies,
+        last_run=MetricsRetentionResponse(**dataclasses.asdict(last)) if last else None,
+    )
+
+@router.post("/metrics/retention", response_model=MetricsRetentionResponse)
+async def run_metrics_retention(request: MetricsRetentionRequest = MetricsRetentionRequest()):
+    """Delete whatever is past its tier's retention window now, instead of waiting for the background job."""
+    if retention_manager.running:
+        raise HTTPException(status_code=409, detail="A retention run is already in progress")
+    try:
+        report = await asyncio.to_thread(retention_manager.run, request.dry_run)
+    except RetentionBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return MetricsRetentionResponse(**dataclasses.asdict(report))
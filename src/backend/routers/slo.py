@@ -1,46 +1,94 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+from fastapi import APIRouter, HTTPException, Request
 from src.backend.models import SLOResponse
-from src.backend.services.neo4j_service import neo4j_service
-from src.backend.services.rag_service import rag_service
+from src.backend.services.topology_cache import topology_cache
+from src.backend.services.blast_radius import blast_radius_engine
+from src.backend.services.graph_backend import UPSTREAM, DOWNSTREAM
+from src.backend.config import settings
+from src.backend.services.rag_service import rag_service, runbook_query, search_scope
 from src.backend.services.sqlite_service import sqlite_service
 from src.backend.services.llm_service import llm_service
+from src.backend.services.streaming import stream_tokens
+from src.backend.services.telemetry import span
 
 router = APIRouter()
 
-@router.get("/recommend/{service_name}", response_model=SLOResponse)
-async def recommend_slo(service_name: str):
-    # 1. Get Service Details & Dependencies (Graph Agent)
-    service_details = neo4j_service.get_service_details(service_name)
+async def _gather_context(service_name: str):
+    # Query runbooks based on service name and common failure modes
+    query = runbook_query(service_name)
+
+    # 1. Graph Agent: served from the in-process topology snapshot, no Neo4j round trip
+    topology = await topology_cache.snapshot_async()
+    service_details = topology.get_service_details(service_name)
     if not service_details:
         raise HTTPException(status_code=404, detail="Service not found in Graph")
-        
-    dependencies = neo4j_service.get_dependencies(service_name)
-    
-    # 2. Get Runbooks (RAG Agent)
-    # Query based on service name and common failure modes
-    query = f"{service_name} latency error failure"
-    runbook_results = rag_service.query_runbooks(query)
-    runbooks = runbook_results['documents'][0] if runbook_results and runbook_results['documents'] else []
-    
-    # 3. Get Metrics (Metric Agent)
-    # Get last 24h summary
-    metrics = sqlite_service.get_metrics(service_name, hours=24)
-    # Simple aggregation for context (in a real app, we'd do smarter aggregation)
-    # Just take a few representative points or calculate stats
-    metrics_summary = metrics if len(metrics) < 10 else metrics[-10:] 
-    
+    # Transitive dependencies and dependents, highest impact first
+    max_services = settings.BLAST_RADIUS_MAX_SERVICES
+    with span("graph.blast_radius") as s:
+        dependencies = blast_radius_engine.compute(topology, service_name, DOWNSTREAM)[:max_services]
+        upstream_dependencies = blast_radius_engine.compute(topology, service_name, UPSTREAM)[:max_services]
+        s.set(rows=len(dependencies) + len(upstream_dependencies))
+
+    # 2-3. RAG and Metric agents are independent, fetch them concurrently.
+    # Metrics are summarized per metric over the 24h window from the rollups (percentiles, availability, trend),
+    # anomalies come from the recent raw points
+    # Runbooks are filtered to the service and its graph neighbours, then ranked by vector + keyword + proximity
+    runbook_hits, metrics = await asyncio.gather(
+        rag_service.hybrid_search_async(query, search_scope(service_name, dependencies, upstream_dependencies)),
+        sqlite_service.get_metric_stats_async([service_name], hours=24),
+    )
+
+    runbooks = [hit["text"] for hit in runbook_hits]
+
+    return {
+        "service_details": service_details,
+        "dependencies": dependencies,
+        "upstream_dependencies": upstream_dependencies,
+        "runbooks": runbooks,
+        "metrics": metrics,
+    }
+
+@router.get("/recommend/{service_name}", response_model=SLOResponse)
+async def recommend_slo(service_name: str):
+    context = await _gather_context(service_name)
+    metrics = context["metrics"]
+
     # 4. Generate Recommendation (LLM Agent)
-    recommendation = llm_service.generate_slo_recommendation(
-        service_data=service_details,
-        dependencies=dependencies,
-        runbooks=runbooks,
-        metrics=metrics_summary
+    recommendation = await llm_service.generate_slo_recommendation_async(
+        service_data=context["service_details"],
+        dependencies=context["dependencies"],
+        runbooks=context["runbooks"],
+        metrics=context["metrics"],
+        upstream_dependencies=context["upstream_dependencies"]
     )
-    
+
     return SLOResponse(
         service_name=service_name,
         recommended_slo="See detailed reasoning", # LLM returns full text, we can parse it or just return it in reasoning
         reasoning=recommendation,
-        relevant_runbooks=runbooks,
-        metrics_context={"count": len(metrics), "latest": metrics[-1] if metrics else None}
+        relevant_runbooks=context["runbooks"],
+        metrics_context={"count": sum(m["n"] for m in metrics), "stats": metrics}
     )
+
+@router.get("/recommend/{service_name}/stream")
+async def recommend_slo_stream(service_name: str, request: Request):
+    # Same pipeline as /recommend, but tokens are forwarded as NDJSON events as Ollama produces them
+    context = await _gather_context(service_name)
+    metrics = context["metrics"]
+
+    tokens = llm_service.stream_slo_recommendation(
+        service_data=context["service_details"],
+        dependencies=context["dependencies"],
+        runbooks=context["runbooks"],
+        metrics=context["metrics"],
+        upstream_dependencies=context["upstream_dependencies"]
+    )
+
+    return stream_tokens(request, {
+        "service_name": service_name,
+        "service": context["service_details"],
+        "dependencies": context["dependencies"],
+        "upstream_dependencies": context["upstream_dependencies"],
+        "relevant_runbooks": context["runbooks"],
+        "metrics_context": {"count": sum(m["n"] for m in metrics), "stats": metrics},
+    }, tokens)
@@ -1,25 +1,105 @@
-from fastapi import APIRouter
-from src.backend.services.rag_service import rag_service
-from src.backend.models import VectorCollectionResponse, VectorDocument
+import asyncio
+import dataclasses
+import os
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query
+from src.backend.services.rag_service import rag_service, runbook_query, metadata_filter, search_scope
+from src.backend.services.topology_cache import topology_cache
+from src.backend.services.shared_cache import host_lock
+from src.backend.services.blast_radius import blast_radius_engine
+from src.backend.services.graph_backend import UPSTREAM, DOWNSTREAM
+from src.backend.services.hybrid_search import infer_failure_types
+from src.backend.config import settings
+from src.backend.models import (
+    VectorCollectionResponse, VectorDocument, RunbookSearchResponse, RunbookIngestRequest, RunbookIngestResponse,
+)
 
 router = APIRouter()
 
-@router.get("/vectors", response_model=VectorCollectionResponse)
-async def get_vectors():
+VECTOR_FIELDS = ("id", "text", "metadata")
+
+# One ingest at a time, also across the workers of a multi-worker server; a second request while one runs gets a 409
+_ingest_lock = asyncio.Lock()
+_INGEST_LOCK_FILE = settings.CHROMADB_PATH.rstrip("/") + "-ingest.lock"
+
+@router.get("/vectors", response_model=VectorCollectionResponse, response_model_exclude_unset=True)
+async def get_vectors(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    service: List[str] = Query(None),
+    type: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated subset of id,text,metadata"),
+):
     if not rag_service.collection:
         return VectorCollectionResponse(documents=[])
-    
-    # Fetch all documents (limit to 100 for performance if needed, but get() returns all by default)
-    # We can use limit/offset if the DB grows, but for now 100 is fine.
-    data = rag_service.collection.get(limit=100)
-    
+
+    # Metadata filters are evaluated inside Chroma, pages are keyset-based (see RAGService.list_documents)
+    where = metadata_filter(service, [type] if type else None)
+
+    projection = _parse_fields(fields)
+    try:
+        docs, next_cursor = await asyncio.to_thread(
+            rag_service.list_documents, limit, cursor, where, "text" in projection
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
     documents = []
-    if data and data['ids']:
-        for i, doc_id in enumerate(data['ids']):
-            documents.append(VectorDocument(
-                id=doc_id,
-                text=data['documents'][i] if data['documents'] else "",
-                metadata=data['metadatas'][i] if data['metadatas'] else {}
-            ))
+    for doc in docs:
+        # Only projected fields are set, unset ones are left out of the response
+        document = {"id": doc["id"]}
+        if "text" in projection:
+            document["text"] = doc["text"] or ""
+        if "metadata" in projection:
+            document["metadata"] = doc["metadata"]
+        documents.append(VectorDocument(**document))
             
-    return VectorCollectionResponse(documents=documents)
+    return VectorCollectionResponse(documents=documents, next_cursor=next_cursor)
+
+@router.get("/vectors/search", response_model=RunbookSearchResponse)
+async def search_runbooks(
+    q: Optional[str] = Query(None, description="Query text; defaults to the service's standard runbook query"),
+    service: Optional[str] = Query(None, description="Target service; its graph neighbours are searched too"),
+    type: List[str] = Query(None, description="Runbook types; inferred from q when omitted"),
+    neighbours: bool = True,
+    n: int = Query(3, ge=1, le=50),
+):
+    """Hybrid runbook search: metadata pre-filter, then vector + BM25 (+ graph proximity) fused by reciprocal rank."""
+    if not q and not service:
+        raise HTTPException(status_code=400, detail="Either q or service is required")
+    query = q or runbook_query(service)
+    services = None
+    if service:
+        services = [service]
+        if neighbours:
+            topology = await topology_cache.snapshot_async()
+            downstream = blast_radius_engine.compute(topology, service, DOWNSTREAM)
+            upstream = blast_radius_engine.compute(topology, service, UPSTREAM)
+            services = search_scope(service, downstream, upstream)
+    types = type or (infer_failure_types(q) if q else None)
+    hits = await rag_service.hybrid_search_async(query, services, types, n)
+    return RunbookSearchResponse(query=query, services=services, types=types, hits=hits)
+
+@router.post("/vectors/ingest", response_model=RunbookIngestResponse)
+async def ingest_runbooks(request: RunbookIngestRequest = RunbookIngestRequest()):
+    """Incremental sync of RUNBOOKS_DIR: only new or edited chunks are embedded, removed ones are deleted."""
+    if not os.path.isdir(settings.RUNBOOKS_DIR):
+        raise HTTPException(status_code=404, detail=f"Runbooks directory {settings.RUNBOOKS_DIR} not found")
+    if _ingest_lock.locked():
+        raise HTTPException(status_code=409, detail="An ingest is already running")
+    async with _ingest_lock:
+        try:
+            with host_lock(_INGEST_LOCK_FILE):
+                report = await asyncio.to_thread(rag_service.ingest, settings.RUNBOOKS_DIR, request.prune, request.dry_run)
+        except BlockingIOError:
+            raise HTTPException(status_code=409, detail="An ingest is already running in another worker")
+    return RunbookIngestResponse(**dataclasses.asdict(report))
+
+def _parse_fields(fields: Optional[str]):
+    if not fields:
+        return VECTOR_FIELDS
+    projection = tuple(f.strip() for f in fields.split(",") if f.strip())
+    unknown = set(projection) - set(VECTOR_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return projection
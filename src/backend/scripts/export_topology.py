@@ -0,0 +1,33 @@
+import argparse
+import asyncio
+import time
+from src.backend.config import settings
+from src.backend.services.embedded_graph import write_topology_file
+
+# Usage (from the project root):
+#   python -m src.backend.scripts.export_topology [--output topology.json]
+#
+# Copies the Service/DEPENDS_ON graph from Neo4j (NEO4J_URI) into a topology file
+# for GRAPH_BACKEND=embedded. A running embedded backend picks the new file up on
+# its next topology refresh (or POST /api/v1/graph/refresh).
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the Neo4j topology to a file for the embedded graph backend.")
+    parser.add_argument("--output", default=settings.TOPOLOGY_FILE, help="Topology file to write")
+    args = parser.parse_args()
+
+    from src.backend.services.neo4j_service import Neo4jService
+    start = time.perf_counter()
+    neo4j = Neo4jService()
+    try:
+        nodes, edges = neo4j.get_topology()
+    finally:
+        asyncio.run(neo4j.aclose())
+    write_topology_file(args.output, nodes, edges)
+    print(f"Exported {len(nodes)} services and {len(edges)} dependencies to {args.output} "
+          f"in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
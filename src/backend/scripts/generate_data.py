@@ -1,12 +1,17 @@
+import argparse
 import os
 import random
 import time
 import sqlite3
-from datetime import datetime, timedelta
+import sys
+import numpy as np
 from dotenv import load_dotenv
 from neo4j import GraphDatabase
 import chromadb
 from chromadb.utils import embedding_functions
+from src.backend.services import metrics_schema, rollups
+from src.backend.services.llm_cache import invalidate_disk
+from src.backend.services.embedded_graph import write_topology_file
 
 # Load environment variables
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -19,6 +24,9 @@ NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "password")
 CHROMADB_PATH = os.getenv("CHROMADB_PATH", "./chroma_db")
 SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", "./metrics.db")
+TOPOLOGY_FILE = os.getenv("TOPOLOGY_FILE", "./topology.json")
+LLM_CACHE_DB_PATH = os.getenv("LLM_CACHE_DB_PATH", "")
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "")
 
 # Neo4j Driver
 driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
@@ -111,143 +119,335 @@ runbooks = [
     }
 ]
 
+# --- Generator Settings ---
+
+TIER_WEIGHTS = {"Tier-1": 0.2, "Tier-2": 0.5, "Tier-3": 0.3}
+FANOUT_DISTRIBUTIONS = ("poisson", "powerlaw", "fixed")
+METRICS = ["latency_p95", "error_rate", "throughput"]
+PEAK_HOURS = (18, 22) # Peak traffic 6PM-10PM, inclusive
+
+# Share of synthetic services that get the demo's anomaly patterns
+LEAK_FRACTION = 0.02
+FLAKY_FRACTION = 0.02
+
+# Roughly this many points are generated, inserted and committed at a time
+POINTS_PER_BLOCK = 2_000_000
+
+RUNBOOK_TEMPLATES = {
+    "latency": "{service} High Latency: If P99 > {threshold}ms for 5m, check downstream dependencies ({deps}). Scale out replicas if CPU > 80%. Roll back the last deploy if latency rose right after it.",
+    "error_rate": "{service} Error Rate > {threshold}%: Check 5xx responses from {deps}. Roll back the recent deployment if errors spiked right after it. Check logs for timeouts and 'Connection Refused'.",
+    "saturation": "{service} Saturation: If memory or connection pool usage > {threshold}%, look for leaks and long-running requests. Add replicas or raise pool limits, then check eviction and GC logs.",
+}
+
 # --- Functions ---
 
-def generate_neo4j_data():
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def build_topology(n_services=None, mean_fanout=2.0, fanout_dist="poisson", tier_weights=None, seed=None):
+    """
+    The demo services and edges, plus synthetic services up to `n_services`.
+    Synthetic edges only point from a lower to a higher index, so the graph is a
+    DAG; the last 10% of synthetic services are databases with no dependencies.
+    """
+    n_services = n_services or len(services)
+    tier_weights = tier_weights or TIER_WEIGHTS
+    rng = np.random.default_rng(seed)
+
+    nodes = [dict(s) for s in services[:n_services]]
+    names = {n["name"] for n in nodes}
+    edges = [(s, t) for s, t in relationships if s in names and t in names]
+
+    extra = n_services - len(nodes)
+    if extra <= 0:
+        return nodes, edges
+
+    tiers = list(tier_weights)
+    p = np.array([tier_weights[t] for t in tiers], dtype=float)
+    tier_codes = rng.choice(len(tiers), size=extra, p=p / p.sum())
+    databases = max(1, extra // 10)
+    offset = len(nodes)
+    for i in range(extra):
+        nodes.append({
+            "name": f"svc-{i:05d}",
+            "type": "Database" if i >= extra - databases else "Microservice",
+            "tier": tiers[tier_codes[i]],
+        })
+
+    if fanout_dist == "poisson":
+        fanouts = rng.poisson(mean_fanout, extra)
+    elif fanout_dist == "powerlaw":
+        # Pareto(2) + 1 has mean 2: most services call a few others, a handful call dozens
+        fanouts = np.floor((rng.pareto(2.0, extra) + 1) * mean_fanout / 2).astype(int)
+    elif fanout_dist == "fixed":
+        fanouts = np.full(extra, int(round(mean_fanout)))
+    else:
+        raise ValueError(f"fanout_dist must be one of {FANOUT_DISTRIBUTIONS}")
+
+    for i in range(extra - databases):
+        remaining = extra - i - 1
+        if remaining <= 0:
+            break
+        targets = set(rng.integers(i + 1, extra, size=min(int(fanouts[i]), remaining)).tolist())
+        edges.extend((nodes[offset + i]["name"], nodes[offset + t]["name"]) for t in sorted(targets))
+    return nodes, edges
+
+def build_runbooks(nodes, edges, n_runbooks=None, seed=None):
+    """The demo runbooks for services that exist, then templated ones up to `n_runbooks`."""
+    n_runbooks = len(runbooks) if n_runbooks is None else n_runbooks
+    rng = random.Random(seed)
+    names = [n["name"] for n in nodes]
+    present = set(names)
+    docs = [rb for rb in runbooks if rb["service"] in present][:n_runbooks]
+
+    dependencies = {}
+    for source, target in edges:
+        dependencies.setdefault(source, []).append(target)
+
+    types = list(RUNBOOK_TEMPLATES)
+    for i in range(n_runbooks - len(docs)):
+        service = rng.choice(names)
+        rb_type = types[i % len(types)]
+        text = RUNBOOK_TEMPLATES[rb_type].format(
+            service=service,
+            threshold=rng.choice([1, 5, 80, 90, 200, 500]),
+            deps=", ".join(dependencies.get(service, [])[:3]) or "its datastore",
+        )
+        docs.append({
+            "id": f"rb_gen_{i:06d}",
+            "service": service,
+            "text": text,
+            "metadata": {"type": rb_type, "service": service},
+        })
+    return docs
+
+def dependency_rows(nodes, edges):
+    # Criticality is based on the target's tier: a dependency on a Tier-1 service is High
+    tier_of = {n["name"]: n["tier"] for n in nodes}
+    return [
+        {"source": source, "target": target, "criticality": "High" if tier_of[target] == "Tier-1" else "Low"}
+        for source, target in edges
+    ]
+
+def generate_neo4j_data(nodes=None, edges=None, batch_size=5000):
     print("Generating Neo4j Data...")
-    try:
-        with driver.session() as session:
-            # Clear existing data
-            session.run("MATCH (n) DETACH DELETE n")
+    nodes = services if nodes is None else nodes
+    edges = relationships if edges is None else edges
+    with driver.session() as session:
+        # Clear existing data
+        session.run("MATCH (n) DETACH DELETE n")
+        # Edge MATCHes below look services up by name
+        session.run("CREATE INDEX service_name IF NOT EXISTS FOR (s:Service) ON (s.name)")
+        
+        # Create Services, one UNWIND per batch instead of one query per node
+        for batch in _chunks(nodes, batch_size):
+            session.run(
+                "UNWIND $rows AS row CREATE (s:Service {name: row.name, type: row.type, tier: row.tier})",
+                rows=batch
+            )
             
-            # Create Services
-            for service in services:
-                session.run(
-                    "CREATE (s:Service {name: $name, type: $type, tier: $tier})",
-                    name=service["name"], type=service["type"], tier=service["tier"]
-                )
-                
-            # Create Relationships
-            for source, target in relationships:
-                # Determine criticality based on Tier
-                # If target is Tier-1, dependency is High criticality
-                target_service = next(s for s in services if s["name"] == target)
-                criticality = "High" if target_service["tier"] == "Tier-1" else "Low"
-                
-                session.run(
-                    """
-                    MATCH (s:Service {name: $source}), (t:Service {name: $target})
-                    CREATE (s)-[:DEPENDS_ON {criticality: $criticality}]->(t)
-                    """,
-                    source=source, target=target, criticality=criticality
-                )
-        print("Neo4j Data Generated.")
-    except Exception as e:
-        print(f"Error generating Neo4j data: {e}")
+        # Create Relationships
+        rows = dependency_rows(nodes, edges)
+        for batch in _chunks(rows, batch_size):
+            session.run(
+                """
+                UNWIND $rows AS row
+                MATCH (s:Service {name: row.source}), (t:Service {name: row.target})
+                CREATE (s)-[:DEPENDS_ON {criticality: row.criticality}]->(t)
+                """,
+                rows=batch
+            )
+    print(f"Neo4j Data Generated: {len(nodes)} services, {len(edges)} dependencies.")
+
+def generate_topology_file(nodes=None, edges=None, path=None):
+    # Source for GRAPH_BACKEND=embedded
+    path = path or TOPOLOGY_FILE
+    nodes = services if nodes is None else nodes
+    edges = relationships if edges is None else edges
+    write_topology_file(path, nodes, dependency_rows(nodes, edges))
+    print(f"Topology file {path} written: {len(nodes)} services, {len(edges)} dependencies.")
 
-def generate_chromadb_data():
+def generate_chromadb_data(docs=None, batch_size=5000):
     print("Generating ChromaDB Data...")
+    docs = runbooks if docs is None else docs
+    client = chromadb.PersistentClient(path=CHROMADB_PATH)
+    collection_name = "runbooks"
+    
     try:
-        client = chromadb.PersistentClient(path=CHROMADB_PATH)
-        collection_name = "runbooks"
-        
-        try:
-            client.delete_collection(name=collection_name)
-        except:
-            pass
-            
-        collection = client.create_collection(name=collection_name)
+        client.delete_collection(name=collection_name)
+    except:
+        pass
         
+    collection = client.create_collection(name=collection_name)
+    batch_size = min(batch_size, client.get_max_batch_size())
+    
+    # `seq` gives /vectors a stable keyset to paginate on
+    for start in range(0, len(docs), batch_size):
+        batch = docs[start:start + batch_size]
         collection.add(
-            documents=[rb["text"] for rb in runbooks],
-            metadatas=[rb["metadata"] for rb in runbooks],
-            ids=[rb["id"] for rb in runbooks]
+            documents=[rb["text"] for rb in batch],
+            metadatas=[{**rb["metadata"], "seq": start + i} for i, rb in enumerate(batch)],
+            ids=[rb["id"] for rb in batch]
         )
-        print("ChromaDB Data Generated.")
-    except Exception as e:
-        print(f"Error generating ChromaDB data: {e}")
+    print(f"ChromaDB Data Generated: {len(docs)} runbooks.")
+
+def _local_hours(ts):
+    return ((ts + time.localtime().tm_gmtoff) // 3600) % 24
+
+def _service_block(block, ts, rng, synthetic_flags):
+    """latency/error/throughput arrays of shape (len(block), len(ts)) for a block of services."""
+    hours = _local_hours(ts)
+    is_peak = (hours >= PEAK_HOURS[0]) & (hours <= PEAK_HOURS[1])
+    elapsed = (ts - ts[0]) / 3600
+    end_hour = hours[-1]
+    shape = (len(block), len(ts))
+
+    # 1. Base Latency
+    base_latency = np.array([
+        5.0 if s["type"] == "Database" else 20.0 if s["tier"] == "Tier-1" else 50.0 for s in block
+    ])[:, None]
+    # Randomized variability
+    latency = rng.normal(base_latency, base_latency * 0.1, shape)
+    # Patterns
+    latency *= np.where(is_peak, 1.5, 1.0)
+
+    # 2. Error Rate
+    err_rate = rng.exponential(1 / 100, shape) # Mostly 0, rare spikes
+
+    # 3. Throughput
+    tput = rng.uniform(100, 1000, shape) * np.where(is_peak, 2.5, 1.0)
 
-def generate_sqlite_data():
+    leaking, flaky = synthetic_flags
+    for row, service in enumerate(block):
+        name = service["name"]
+        # Specific service anomalies
+        # Make PaymentService slow in the last 4 hours for DEMO purposes
+        if name == "PaymentService":
+            latency[row] += np.where((hours >= end_hour - 4) | ((hours >= 14) & (hours <= 15)), 200, 0)
+        if name == "RedisCache":
+            latency[row] += np.where(hours % 6 == 0, 50, 0) # Periodic cache maintenance spike
+        if name == "ProductService" or leaking[row]:
+            latency[row] += elapsed * 2 # Memory leak simulation (latency creeps up over timewindow)
+        if name == "CheckoutService" or flaky[row]:
+            err_rate[row] += np.where(is_peak, rng.uniform(0.1, 0.5, len(ts)), 0) # Flaky during peak
+
+    return {"latency_p95": np.maximum(0, latency), "error_rate": err_rate, "throughput": tput}
+
+def generate_sqlite_data(nodes=None, days=1, interval=3600, seed=None, with_rollups=True, db_path=None):
     print("Generating SQLite Data...")
+    nodes = services if nodes is None else nodes
+    conn = sqlite3.connect(db_path or SQLITE_DB_PATH)
     try:
-        conn = sqlite3.connect(SQLITE_DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS metrics (
-                timestamp DATETIME,
-                service_name TEXT,
-                metric_name TEXT,
-                value REAL
-            )
-        """)
+        # Bulk load: WAL, no fsync per commit, big page cache
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("PRAGMA cache_size = -262144")
         
-        cursor.execute("DELETE FROM metrics")
+        # Create (or upgrade) the indexed schema, then replace all points
+        metrics_schema.migrate(conn, rebuild_rollups=False)
+        metrics_schema.clear_points(conn)
+        # Building the ts index once at the end beats maintaining it row by row
+        conn.execute("DROP INDEX IF EXISTS idx_metric_points_ts")
+        service_ids = metrics_schema.intern_names(conn, "services", [n["name"] for n in nodes])
+        metric_ids = metrics_schema.intern_names(conn, "metric_names", METRICS)
+        conn.commit()
         
         # Generator Settings
-        end_time = datetime.now()
-        start_time = end_time - timedelta(hours=24)
-        current_time = start_time
-        
-        while current_time <= end_time:
-            time_hour = current_time.hour
-            is_peak = 18 <= time_hour <= 22 # Peak traffic 6PM-10PM
-            
-            for service in services:
-                # 1. Base Latency
-                base_latency = 50.0
-                if service["tier"] == "Tier-1": base_latency = 20.0
-                if service["type"] == "Database": base_latency = 5.0
-                
-                # Randomized variability
-                val = random.gauss(base_latency, base_latency * 0.1)
-                
-                # Patterns
-                if is_peak:
-                    val *= 1.5
-                    
-                # Specific service anomalies
-                # Make PaymentService slow in the last 4 hours for DEMO purposes
-                if service["name"] == "PaymentService" and (time_hour >= end_time.hour - 4 or (14 <= time_hour <= 15)):
-                    val += 200 # Latency spike
-                    
-                if service["name"] == "RedisCache" and (time_hour % 6 == 0):
-                    val += 50 # Periodic cache maintenance spike
-                    
-                if service["name"] == "ProductService":
-                     # Memory leak simulation (latency creeps up over timewindow)
-                     elapsed = (current_time - start_time).total_seconds() / 3600
-                     val += elapsed * 2 
-
-                cursor.execute("INSERT INTO metrics VALUES (?, ?, ?, ?)", 
-                               (current_time, service["name"], "latency_p95", max(0, val)))
-                
-                # 2. Error Rate
-                err_rate = random.expovariate(100) # Mostly 0, rare spikes
-                if service["name"] == "CheckoutService" and is_peak:
-                     err_rate += random.uniform(0.1, 0.5) # Flaky during peak
-                
-                cursor.execute("INSERT INTO metrics VALUES (?, ?, ?, ?)", 
-                               (current_time, service["name"], "error_rate", err_rate))
-                
-                # 3. Throughput
-                tput = random.uniform(100, 1000)
-                if is_peak: tput *= 2.5
-                
-                cursor.execute("INSERT INTO metrics VALUES (?, ?, ?, ?)", 
-                               (current_time, service["name"], "throughput", tput))
-                
-            current_time += timedelta(hours=1)
-        
-        conn.commit()
+        rng = np.random.default_rng(seed)
+        ticks = int(days * 86400) // interval + 1
+        end_time = int(time.time())
+        ts = end_time - (ticks - 1) * interval + np.arange(ticks, dtype=np.int64) * interval
+        demo = {s["name"] for s in services}
+        synthetic = np.array([n["name"] not in demo for n in nodes])
+        leaking = synthetic & (rng.random(len(nodes)) < LEAK_FRACTION)
+        flaky = synthetic & (rng.random(len(nodes)) < FLAKY_FRACTION)
+
+        # Rows go in primary key order (service, metric, ts) so the clustered table is appended to
+        metric_order = sorted(METRICS, key=lambda m: metric_ids[m])
+        per_block = max(1, POINTS_PER_BLOCK // (ticks * len(METRICS)))
+        total = 0
+        started = time.perf_counter()
+        for first in range(0, len(nodes), per_block):
+            block = nodes[first:first + per_block]
+            values = _service_block(block, ts, rng, (leaking[first:first + per_block], flaky[first:first + per_block]))
+            rows = []
+            points = []
+            for row, service in enumerate(block):
+                service_id = service_ids[service["name"]]
+                for metric in metric_order:
+                    series = values[metric][row].tolist()
+                    rows.extend(zip([service_id] * ticks, [metric_ids[metric]] * ticks, ts.tolist(), series))
+                    if with_rollups:
+                        points.extend(zip(ts.tolist(), [service["name"]] * ticks, [metric] * ticks, series))
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO metric_points (service_id, metric_id, ts, value) VALUES (?, ?, ?, ?)", rows
+                )
+                # Fold the fresh raw points into the 1m/1h/1d rollup tables
+                if with_rollups:
+                    rollups.apply_points(conn, points)
+            total += len(rows)
+            elapsed = time.perf_counter() - started
+            print(f"  {min(first + per_block, len(nodes))}/{len(nodes)} services, {total} points ({total / elapsed:,.0f} points/s)")
+    finally:
+        # Rebuilt even after a failed load: metric reads expect the index
+        if metrics_schema.get_schema_version(conn) == metrics_schema.SCHEMA_VERSION:
+            conn.execute(metrics_schema.TS_INDEX_DDL)
+            conn.commit()
         conn.close()
-        print("SQLite Data Generated.")
-    except Exception as e:
-        print(f"Error generating SQLite data: {e}")
+    print(f"SQLite Data Generated: {total} points in {time.perf_counter() - started:.1f}s.")
 
-if __name__ == "__main__":
-    generate_neo4j_data()
-    generate_chromadb_data()
-    generate_sqlite_data()
+def _parse_tiers(value):
+    weights = {}
+    for part in value.split(","):
+        tier, _, weight = part.partition("=")
+        weights[tier.strip()] = float(weight)
+    return weights
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate topology, runbooks and metrics (the demo dataset by default).")
+    parser.add_argument("--services", type=int, default=len(services), help="Total services; beyond the 13 demo ones they are synthetic")
+    parser.add_argument("--mean-fanout", type=float, default=2.0, help="Mean dependencies per synthetic service")
+    parser.add_argument("--fanout-dist", choices=FANOUT_DISTRIBUTIONS, default="poisson")
+    parser.add_argument("--tiers", type=_parse_tiers, default=TIER_WEIGHTS, help="Tier weights, e.g. Tier-1=0.2,Tier-2=0.5,Tier-3=0.3")
+    parser.add_argument("--interval", type=int, default=3600, help="Scrape interval in seconds")
+    parser.add_argument("--days", type=float, default=1, help="Days of metric history")
+    parser.add_argument("--runbooks", type=int, default=len(runbooks), help="Total runbooks; beyond the demo ones they are templated")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for a reproducible dataset")
+    parser.add_argument("--targets", default="neo4j,topology,chroma,sqlite", help="Comma-separated subset of neo4j,topology,chroma,sqlite (topology = TOPOLOGY_FILE for GRAPH_BACKEND=embedded)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Nodes/edges per UNWIND and runbooks per collection.add")
+    parser.add_argument("--no-rollups", action="store_true", help="Skip the rollup tables (much faster for large runs)")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    targets = {t.strip() for t in args.targets.split(",")}
+    nodes, edges = build_topology(args.services, args.mean_fanout, args.fanout_dist, args.tiers, args.seed)
+
+    generators = {
+        "neo4j": lambda: generate_neo4j_data(nodes, edges, args.batch_size),
+        "topology": lambda: generate_topology_file(nodes, edges),
+        "chroma": lambda: generate_chromadb_data(build_runbooks(nodes, edges, args.runbooks, args.seed), args.batch_size),
+        "sqlite": lambda: generate_sqlite_data(nodes, args.days, args.interval, args.seed, with_rollups=not args.no_rollups),
+    }
+    # A failed target doesn't stop the others, but the exit status reports it (run_backend.sh
+    # only marks the runbooks as generated on success)
+    failed = []
+    for target, generate in generators.items():
+        if target in targets:
+            try:
+                generate()
+            except Exception as e:
+                print(f"Error generating {target} data: {e}")
+                failed.append(target)
+    # Topology, runbooks and metrics all changed: cached recommendations are stale. Same file
+    # resolution as llm_cache.py: with multiple workers the cache lives in the shared cache file
+    invalidate_disk(LLM_CACHE_DB_PATH or SHARED_CACHE_PATH)
     driver.close()
+    if failed:
+        sys.exit(f"Data generation failed for: {', '.join(failed)}")
     print("All Data Generated Successfully.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import argparse
+import os
+import sys
+import time
+from src.backend.config import settings
+from src.backend.services.metrics_ingest import (
+    BINARY_TYPE, JSON_TYPE, NDJSON_TYPE, IngestFormatError, encode_binary, parse_payload,
+)
+
+# Usage (from the project root):
+#   python -m src.backend.scripts.ingest_metrics points.ndjson [more files ...] [--url http://localhost:8000/api/v1]
+#   producer | python -m src.backend.scripts.ingest_metrics - --format ndjson
+#   python -m src.backend.scripts.ingest_metrics points.json --direct [--db metrics.db]
+#
+# Input files are JSON, NDJSON or the compact binary format (by extension, or
+# --format). Points are re-batched and always sent in the binary format, which is
+# the cheapest one for the server to parse. A 429 (ingest buffer full) is retried
+# after its Retry-After. --direct skips the API and writes into the database file
+# through the same writer the backend uses (don't run it against a database a
+# live backend is ingesting into; both would write rollups for the same buckets).
+
+FORMATS = {"json": JSON_TYPE, "ndjson": NDJSON_TYPE, "jsonl": NDJSON_TYPE, "binary": BINARY_TYPE, "slom": BINARY_TYPE}
+
+
+def read_points(path: str, fmt: str = None):
+    if fmt is None:
+        extension = os.path.splitext(path)[1].lstrip(".").lower()
+        fmt = extension if extension in FORMATS else "ndjson"
+    if path == "-":
+        body = sys.stdin.buffer.read()
+    else:
+        with open(path, "rb") as f:
+            body = f.read()
+    return parse_payload(body, FORMATS[fmt])
+
+
+def batches(points, batch_size: int):
+    for start in range(0, len(points), batch_size):
+        yield points.slice(start, start + batch_size)
+
+
+def post(session, url: str, body: bytes, wait: bool, max_retries: int = 30) -> dict:
+    for _ in range(max_retries):
+        response = session.post(url, data=body, params={"wait": str(wait).lower()}, headers={"Content-Type": BINARY_TYPE})
+        if response.status_code == 429:
+            time.sleep(float(response.headers.get("Retry-After", "1")))
+            continue
+        response.raise_for_status()
+        return response.json()
+    raise RuntimeError(f"Still getting 429 after {max_retries} attempts")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send metric points to the backend's ingest endpoint (or straight into metrics.db).")
+    parser.add_argument("files", nargs="+", help="Input files, - for stdin")
+    parser.add_argument("--format", choices=sorted(FORMATS), help="Input format (default: from the file extension, else ndjson)")
+    parser.add_argument("--url", default="http://localhost:8000/api/v1", help="Backend API base URL")
+    parser.add_argument("--batch-size", type=int, default=50000, help="Points per request")
+    parser.add_argument("--wait", action="store_true", help="Have each request wait until its points are committed")
+    parser.add_argument("--direct", action="store_true", help="Write into --db in-process instead of calling the API")
+    parser.add_argument("--db", default=settings.SQLITE_DB_PATH, help="Database for --direct")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    total = 0
+    if args.direct:
+        from src.backend.services.metrics_ingest import MetricsWriter
+        writer = MetricsWriter(args.db, capacity=settings.METRICS_INGEST_BUFFER_POINTS,
+                               batch_points=settings.METRICS_INGEST_BATCH_POINTS,
+                               flush_seconds=settings.METRICS_INGEST_FLUSH_MS / 1000)
+        send = lambda batch: writer.submit(batch, timeout=3600)
+    else:
+        import requests
+        session = requests.Session()
+        url = args.url.rstrip("/") + "/metrics/ingest"
+        send = lambda batch: post(session, url, encode_binary(batch), args.wait)
+
+    try:
+        for path in args.files:
+            try:
+                points = read_points(path, args.format)
+            except (OSError, IngestFormatError) as e:
+                parser.error(f"{path}: {e}")
+            for batch in batches(points, args.batch_size):
+                send(batch)
+                total += len(batch)
+    finally:
+        if args.direct:
+            writer.close()
+            if writer.dropped:
+                print(f"{writer.dropped} points were dropped: {writer.last_error}", file=sys.stderr)
+
+    elapsed = time.perf_counter() - started
+    print(f"Ingested {total} points from {len(args.files)} file(s) in {elapsed:.2f}s ({total / elapsed:,.0f} points/s)")
+
+
+if __name__ == "__main__":
+    main()
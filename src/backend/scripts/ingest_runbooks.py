@@ -0,0 +1,48 @@
+import argparse
+import os
+import chromadb
+from src.backend.config import settings
+from src.backend.services.runbook_ingest import ingest_directory
+
+# Usage (from the project root):
+#   python -m src.backend.scripts.ingest_runbooks [--dir runbooks/] [--workers 4] [--dry-run]
+#
+# Only new or edited chunks are embedded, so re-running after editing a few files
+# takes seconds regardless of how many runbooks there are. A running backend picks
+# the change up within RUNBOOK_CACHE_CHECK_SECONDS.
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally ingest a directory of Markdown/text runbooks into ChromaDB.")
+    parser.add_argument("--dir", default=settings.RUNBOOKS_DIR, help="Runbooks directory; runbooks/<service>/... sets the service")
+    parser.add_argument("--chroma-path", default=settings.CHROMADB_PATH, help="ChromaDB persistence directory")
+    parser.add_argument("--chunk-chars", type=int, default=settings.RUNBOOK_CHUNK_CHARS, help="Maximum characters per chunk")
+    parser.add_argument("--batch-size", type=int, default=settings.RUNBOOK_EMBED_BATCH, help="Chunks per embedding call")
+    parser.add_argument("--workers", type=int, default=settings.RUNBOOK_INGEST_WORKERS, help="Embedding threads")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without embedding or writing")
+    parser.add_argument("--no-prune", action="store_true", help="Keep chunks of files that were removed from --dir")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.dir):
+        parser.error(f"{args.dir} is not a directory")
+
+    collection = chromadb.PersistentClient(path=args.chroma_path).get_or_create_collection("runbooks")
+    report = ingest_directory(
+        collection, args.dir,
+        chunk_chars=args.chunk_chars,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        prune=not args.no_prune,
+        dry_run=args.dry_run,
+    )
+
+    prefix = "Would ingest" if args.dry_run else "Ingested"
+    print(f"{prefix} {args.dir}: {report.files} files ({report.unchanged_files} unchanged), {report.chunks} chunks; "
+          f"{report.added} added, {report.updated} updated, {report.deleted} deleted, {report.unchanged} unchanged "
+          f"in {report.seconds:.2f}s")
+    for source in report.deleted_files:
+        print(f"  removed: {source}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import os
+import sqlite3
+import time
+from src.backend.config import settings
+from src.backend.services.metrics_retention import (
+    RAW, TIERS, RetentionManager, enable_incremental_vacuum, policies_from_settings, storage_report,
+)
+
+# Usage (from the project root):
+#   python -m src.backend.scripts.metrics_retention [--db path/to/metrics.db] [--dry-run]
+#   python -m src.backend.scripts.metrics_retention --report [--tables]
+#   python -m src.backend.scripts.metrics_retention --enable-incremental-vacuum
+#
+# Runs the same retention pass the backend runs every METRICS_RETENTION_INTERVAL_SECONDS.
+# Windows default to the METRICS_RETENTION_* settings. --enable-incremental-vacuum is
+# needed once for files created before retention existed: it rewrites the whole file
+# (VACUUM), so stop the backend first.
+
+
+def _mb(size: int) -> str:
+    return f"{size / 1e6:.1f}MB"
+
+
+def print_storage(report: dict):
+    print(f"file {_mb(report['file_bytes'])} (+{_mb(report['wal_bytes'])} WAL), "
+          f"{report['free_pages']} free pages ({_mb(report['free_bytes'])}), auto_vacuum={report['auto_vacuum']}")
+    if report["oldest_point"] is not None:
+        fmt = lambda ts: time.strftime("%Y-%m-%d %H:%M", time.localtime(ts))
+        print(f"raw points from {fmt(report['oldest_point'])} to {fmt(report['newest_point'])}")
+    for name, size in (report["tables"] or {}).items():
+        print(f"  {name:<32} {_mb(size):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete metrics past their retention window and give the space back.")
+    parser.add_argument("--db", default=settings.SQLITE_DB_PATH, help="Path to the SQLite metrics database")
+    parser.add_argument("--dry-run", action="store_true", help="Only count what would be deleted")
+    parser.add_argument("--report", action="store_true", help="Only print the storage report")
+    parser.add_argument("--tables", action="store_true", help="Include bytes per table and index in the report")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="Switch the file to auto_vacuum=incremental (rewrites it, stop the backend first)")
+    parser.add_argument("--raw-hours", type=int, default=settings.METRICS_RETENTION_RAW_HOURS)
+    for resolution in TIERS[1:]:
+        parser.add_argument(f"--rollup-{resolution}-days", type=int,
+                            default=policies_from_settings()[resolution] // 86400, help="0 keeps them forever")
+    parser.add_argument("--keep-free-mb", type=int, default=settings.METRICS_VACUUM_KEEP_FREE_MB,
+                        help="Free space left in the file for new points")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} does not exist")
+
+    if args.enable_incremental_vacuum:
+        conn = sqlite3.connect(args.db)
+        size_before = os.path.getsize(args.db)
+        mode = enable_incremental_vacuum(conn)
+        conn.close()
+        print(f"auto_vacuum={mode}, {_mb(size_before)} -> {_mb(os.path.getsize(args.db))}")
+        return
+
+    if args.report:
+        conn = sqlite3.connect(args.db)
+        print_storage(storage_report(conn, args.db, tables=args.tables))
+        conn.close()
+        return
+
+    policies = {RAW: args.raw_hours * 3600}
+    for resolution in TIERS[1:]:
+        policies[resolution] = getattr(args, f"rollup_{resolution}_days") * 86400
+    manager = RetentionManager(args.db, policies, interval_seconds=0, keep_free_bytes=args.keep_free_mb * 1024 * 1024)
+    report = manager.run(dry_run=args.dry_run)
+    print_storage(manager.storage(tables=args.tables))
+    manager.stop()
+
+    verb = "Would delete" if args.dry_run else "Deleted"
+    for tier, rows in report.deleted.items():
+        cutoff = time.strftime("%Y-%m-%d %H:%M", time.localtime(report.cutoffs[tier]))
+        print(f"{verb} {rows} {tier} rows older than {cutoff}")
+    if report.skipped:
+        print(report.skipped)
+    if not args.dry_run:
+        print(f"{report.partitions} transactions, {report.vacuumed_pages} pages vacuumed, "
+              f"{_mb(report.bytes_before)} -> {_mb(report.bytes_after)}, reclaimed {_mb(report.reclaimed_bytes)} "
+              f"in {report.seconds:.2f}s")
+        if report.auto_vacuum != "incremental":
+            print("Freed pages are reused by new points; run with --enable-incremental-vacuum once to let the file shrink.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import argparse
+import os
+import sqlite3
+import time
+from src.backend.config import settings
+from src.backend.services import metrics_schema
+
+# Usage (from the project root):
+#   python -m src.backend.scripts.migrate_metrics [--db path/to/metrics.db]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upgrade a metrics.db file to the current schema in place.")
+    parser.add_argument("--db", default=settings.SQLITE_DB_PATH, help="Path to the SQLite metrics database")
+    parser.add_argument("--no-rollups", action="store_true", help="Skip rebuilding the rollup tables")
+    parser.add_argument("--no-vacuum", action="store_true", help="Skip VACUUM after migrating")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} does not exist")
+
+    conn = sqlite3.connect(args.db)
+    current = metrics_schema.get_schema_version(conn)
+    if current == metrics_schema.SCHEMA_VERSION:
+        print(f"{args.db} is already at schema version {current}.")
+        conn.close()
+        return
+
+    size_before = os.path.getsize(args.db)
+    start = time.perf_counter()
+    from_version, to_version = metrics_schema.migrate(conn, rebuild_rollups=not args.no_rollups)
+    if not args.no_vacuum:
+        # Reclaim the pages of the dropped legacy table; the rewrite also switches on incremental
+        # vacuum, which metrics retention uses to shrink the file
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    points = conn.execute("SELECT COUNT(*) FROM metric_points").fetchone()[0]
+    conn.close()
+
+    print(f"Migrated {args.db} from schema v{from_version} to v{to_version}: "
+          f"{points} points in {time.perf_counter() - start:.2f}s, "
+          f"{size_before / 1e6:.1f}MB -> {os.path.getsize(args.db) / 1e6:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, List, Optional
+from src.backend.config import settings
+from src.backend.services.shared_cache import shared_cache
+from src.backend.services.topology_cache import topology_cache
+from src.backend.services.blast_radius import blast_radius_engine
+from src.backend.services.graph_backend import UPSTREAM, DOWNSTREAM
+from src.backend.services.rag_service import rag_service, runbook_query, search_scope
+from src.backend.services.sqlite_service import sqlite_service
+from src.backend.services.llm_service import llm_service
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+CANCELLED = "cancelled"
+FAILED = "failed"
+DONE = (COMPLETED, CANCELLED, FAILED)
+
+# Shared cache namespaces (multi-worker serving): job status as served by GET, and cancel requests
+SHARED_JOBS = "batch_jobs"
+SHARED_CANCELS = "batch_cancels"
+
+# SQLite's default limit on host parameters is 999, stay well below it per IN list
+_METRICS_CHUNK = 500
+
+
+class BatchJob:
+    def __init__(self, services: List[str]):
+        self.id = uuid.uuid4().hex
+        self.services = services
+        self.status = PENDING
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.errors: Dict[str, str] = {}
+        self.task: Optional[asyncio.Task] = None
+        self.published_at = 0.0
+
+    @property
+    def done(self) -> bool:
+        return self.status in DONE
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "total": len(self.services),
+            "completed": len(self.results),
+            "failed": len(self.errors),
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            # Partial results: whatever finished so far, in submission order
+            "results": [self.results[s] for s in self.services if s in self.results],
+            "errors": self.errors,
+        }
+
+
+class BatchRecommendationService:
+    """
+    Runs /recommend for many services as one job. Context is fetched in bulk
+    (one topology snapshot, one batched Chroma query, one metric stats pass per
+    chunk of services) and the LLM calls are admitted through a semaphore so Ollama
+    never sees more than `max_concurrency` generations at once.
+
+    A job runs in the worker that accepted it. With a shared cache its status is
+    published there (at most every `publish_seconds` while it runs), so a poll
+    or a cancel that lands on another worker still finds it.
+    """
+    def __init__(self, max_concurrency: int, max_jobs: int, shared: Callable[[], Optional[Any]] = lambda: None,
+                 publish_seconds: float = 1.0, ttl_seconds: float = 3600):
+        self.max_concurrency = max_concurrency
+        self.max_jobs = max_jobs
+        self.publish_seconds = publish_seconds
+        self.ttl_seconds = ttl_seconds
+        self._shared = shared
+        self._jobs: "OrderedDict[str, BatchJob]" = OrderedDict()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def resolve_services(self, services: Optional[List[str]] = None, tier: Optional[str] = None) -> List[str]:
+        if services:
+            # Deduplicate, keep request order
+            return list(dict.fromkeys(services))
+        topology = await topology_cache.snapshot_async()
+        return [name for name, t in zip(topology.names, topology.tiers) if tier is None or t == tier]
+
+    def submit(self, services: List[str]) -> BatchJob:
+        job = BatchJob(services)
+        self._jobs[job.id] = job
+        self._prune()
+        job.task = asyncio.create_task(self._run(job))
+        return job
+
+    def get(self, job_id: str) -> Optional[BatchJob]:
+        return self._jobs.get(job_id)
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status of a job run by this worker, or as last published by the worker running it."""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        shared = self._shared()
+        return shared.get(SHARED_JOBS, job_id) if shared is not None else None
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            if not job.done and job.task is not None:
+                job.task.cancel()
+            return job.to_dict()
+        shared = self._shared()
+        status = shared.get(SHARED_JOBS, job_id) if shared is not None else None
+        if status is not None and status["status"] not in DONE:
+            # The owning worker polls for this and cancels the task
+            shared.set(SHARED_CANCELS, job_id, True, ttl=self.ttl_seconds)
+        return status
+
+    async def _publish(self, job: BatchJob, force: bool = False):
+        shared = self._shared()
+        now = time.time()
+        if shared is not None and (force or now - job.published_at >= self.publish_seconds):
+            job.published_at = now
+            # Off the event loop, the write may have to wait for another worker's
+            await asyncio.to_thread(shared.set, SHARED_JOBS, job.id, job.to_dict(), ttl=self.ttl_seconds)
+
+    async def _watch_cancel(self, job: BatchJob, shared):
+        while True:
+            await asyncio.sleep(self.publish_seconds)
+            if await asyncio.to_thread(shared.version, SHARED_CANCELS, job.id) is not None:
+                job.task.cancel()
+                return
+
+    def _prune(self):
+        # Drop the oldest finished jobs once over the limit; running jobs are never dropped
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        while len(self._jobs) > self.max_jobs and finished:
+            del self._jobs[finished.pop(0)]
+
+    async def gather_contexts(self, service_names: List[str]) -> Dict[str, Dict[str, Any]]:
+        topology = await topology_cache.snapshot_async()
+        max_services = settings.BLAST_RADIUS_MAX_SERVICES
+
+        contexts = {}
+        for name in service_names:
+            details = topology.get_service_details(name)
+            if not details:
+                continue
+            contexts[name] = {
+                "service_details": details,
+                "dependencies": blast_radius_engine.compute(topology, name, DOWNSTREAM)[:max_services],
+                "upstream_dependencies": blast_radius_engine.compute(topology, name, UPSTREAM)[:max_services],
+            }
+        names = list(contexts)
+        if not names:
+            return contexts
+
+        # Runbooks are searched like /recommend does (graph scope, hybrid ranking), with one embedding
+        # pass for all queries; one stats pass per chunk of services
+        searches = [
+            (runbook_query(name), search_scope(name, contexts[name]["dependencies"], contexts[name]["upstream_dependencies"]), None)
+            for name in names
+        ]
+        chunks = [names[i:i + _METRICS_CHUNK] for i in range(0, len(names), _METRICS_CHUNK)]
+        runbooks, *stats_chunks = await asyncio.gather(
+            rag_service.hybrid_search_batch_async(searches),
+            *(sqlite_service.get_metric_stats_async(chunk, hours=24) for chunk in chunks),
+        )
+
+        metrics_by_service = defaultdict(list)
+        for rows in stats_chunks:
+            for row in rows:
+                metrics_by_service[row["service_name"]].append(row)
+
+        for name, hits in zip(names, runbooks):
+            contexts[name]["runbooks"] = [hit["text"] for hit in hits]
+            contexts[name]["metrics"] = metrics_by_service.get(name, [])
+        return contexts
+
+    async def _recommend(self, job: BatchJob, service_name: str, context: Dict[str, Any]):
+        metrics = context["metrics"]
+        try:
+            async with self._get_semaphore():
+                recommendation = await llm_service.recommend_slo_async(
+                    service_data=context["service_details"],
+                    dependencies=context["dependencies"],
+                    runbooks=context["runbooks"],
+                    metrics=context["metrics"],
+                    upstream_dependencies=context["upstream_dependencies"]
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job.errors[service_name] = str(e)
+            await self._publish(job)
+            return
+        job.results[service_name] = {
+            "service_name": service_name,
+            "recommended_slo": "See detailed reasoning",
+            "reasoning": recommendation,
+            "relevant_runbooks": context["runbooks"],
+            "metrics_context": {"count": sum(m["n"] for m in metrics), "stats": metrics},
+        }
+        await self._publish(job)
+
+    async def _run(self, job: BatchJob):
+        job.status = RUNNING
+        shared = self._shared()
+        watcher = asyncio.create_task(self._watch_cancel(job, shared)) if shared is not None else None
+        try:
+            await self._publish(job, force=True)
+            contexts = await self.gather_contexts(job.services)
+            for name in job.services:
+                if name not in contexts:
+                    job.errors[name] = "Service not found in Graph"
+            await asyncio.gather(*(self._recommend(job, name, contexts[name]) for name in job.services if name in contexts))
+            job.status = COMPLETED
+        except asyncio.CancelledError:
+            job.status = CANCELLED
+        except Exception as e:
+            logger.exception("Batch job %s failed", job.id)
+            job.errors["_job"] = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            if watcher is not None:
+                watcher.cancel()
+                await self._publish(job, force=True)
+
+
+batch_service = BatchRecommendationService(
+    settings.OLLAMA_MAX_CONCURRENCY, settings.BATCH_MAX_JOBS,
+    shared=shared_cache, ttl_seconds=settings.SHARED_CACHE_TTL_SECONDS,
+)
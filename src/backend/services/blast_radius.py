@@ -0,0 +1,103 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List
+from src.backend.config import settings
+from src.backend.services.graph_backend import UPSTREAM, check_direction
+from src.backend.services.topology_cache import TopologySnapshot
+
+# How much of an incident propagates across one DEPENDS_ON edge
+CRITICALITY_WEIGHTS = {"High": 1.0, "Medium": 0.6, "Low": 0.3}
+DEFAULT_WEIGHT = 0.5
+# Extra damping per hop so far-away services rank below direct neighbours
+HOP_DECAY = 0.8
+
+_CACHE_SIZE = 4096
+
+
+class BlastRadiusEngine:
+    """
+    Transitive fan-in / fan-out closure over a TopologySnapshot, bounded by depth.
+    Each affected service gets an impact score: the best product of edge weights
+    (by criticality) along any path from the origin, damped per hop. Results are
+    memoized per snapshot version, so repeated lookups are a dict hit and the
+    cache resets itself when the topology is reloaded.
+    """
+    def __init__(self, max_depth: int):
+        self.max_depth = max_depth
+        self._results = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def compute(self, snapshot: TopologySnapshot, service_name: str, direction: str = UPSTREAM, max_depth: int = None) -> List[Dict[str, Any]]:
+        check_direction(direction)
+        max_depth = self.max_depth if max_depth is None else max_depth
+        key = (service_name, direction, max_depth)
+
+        with self._lock:
+            if self._version != snapshot.version:
+                self._results.clear()
+                self._version = snapshot.version
+            cached = self._results.get(key)
+            if cached is not None:
+                self._results.move_to_end(key)
+                return cached
+
+        result = self._traverse(snapshot, service_name, direction, max_depth)
+
+        with self._lock:
+            if self._version == snapshot.version:
+                self._results[key] = result
+                if len(self._results) > _CACHE_SIZE:
+                    self._results.popitem(last=False)
+        return result
+
+    def _traverse(self, snapshot: TopologySnapshot, service_name: str, direction: str, max_depth: int):
+        origin = snapshot.index.get(service_name)
+        if origin is None:
+            return []
+        if direction == UPSTREAM:
+            offsets, neighbours, crits = snapshot.in_offsets, snapshot.in_sources, snapshot.in_crit
+        else:
+            offsets, neighbours, crits = snapshot.out_offsets, snapshot.out_targets, snapshot.out_crit
+        weights = [CRITICALITY_WEIGHTS.get(c, DEFAULT_WEIGHT) for c in snapshot.criticalities]
+
+        # Level-synchronous relaxation: a node re-enters the frontier only if its score improved.
+        # Each candidate carries the hops it was reached through, captured when it is relaxed, so
+        # score, path and depth always describe the same path (a later improvement of an
+        # intermediate node can't rewrite the path of a descendant relaxed before it)
+        best = {origin: (1.0, (), None)}  # node -> (score, intermediate hops, criticality of the last edge)
+        frontier = {origin: (1.0, ())}
+        for depth in range(1, max_depth + 1):
+            next_frontier = {}
+            for node, (score, via) in frontier.items():
+                hops = via + (node,) if node != origin else ()
+                for j in range(offsets[node], offsets[node + 1]):
+                    neighbour = neighbours[j]
+                    candidate = score * weights[crits[j]] * (HOP_DECAY if depth > 1 else 1.0)
+                    if candidate > best.get(neighbour, (0.0,))[0]:
+                        best[neighbour] = (candidate, hops, crits[j])
+                        next_frontier[neighbour] = (candidate, hops)
+            if not next_frontier:
+                break
+            frontier = next_frontier
+
+        affected = []
+        for node, (score, via, crit) in best.items():
+            if node == origin:
+                continue
+            affected.append({
+                "name": snapshot.names[node],
+                "type": snapshot.types[node],
+                "tier": snapshot.tiers[node],
+                # Criticality of the last edge on the best path
+                "criticality": snapshot.criticalities[crit] or None,
+                "depth": len(via) + 1,
+                "impact": round(score, 4),
+                # Intermediate hops on the highest-impact path, nearest to the origin first
+                "via": [snapshot.names[hop] for hop in via],
+            })
+        affected.sort(key=lambda a: (-a["impact"], a["depth"], a["name"]))
+        return affected
+
+
+blast_radius_engine = BlastRadiusEngine(max_depth=settings.BLAST_RADIUS_MAX_DEPTH)
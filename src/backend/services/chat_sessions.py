@@ -0,0 +1,230 @@
+import asyncio
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+from src.backend.config import settings
+from src.backend.services.prompt_builder import fold_history
+from src.backend.services.shared_cache import shared_cache
+
+# Shared cache namespace (multi-worker serving); entries are tagged with the service name
+SHARED_NAMESPACE = "chat_sessions"
+
+# Persisted by ChatSessionStore.save(); everything but the lock
+_STATE_FIELDS = (
+    "session_id", "service_name", "system_context", "context", "topology_version", "context_expires_at",
+    "summary", "turns", "created_at", "last_used", "context_rebuilds",
+)
+
+
+class ChatSession:
+    """
+    Server-side state of one chat: the rendered system context and the turns so far.
+    The system context string is only replaced when a refresh produces different
+    text, so consecutive turns send a byte-identical prefix and Ollama can reuse
+    the KV cache of the model slot instead of prefilling it again.
+    """
+    def __init__(self, session_id: str, service_name: str):
+        self.session_id = session_id
+        self.service_name = service_name
+        self.system_context: Optional[str] = None
+        self.context: Optional[dict] = None
+        self.topology_version: Optional[int] = None
+        self.context_expires_at = 0.0
+        # Older turns folded into a summary; frozen between folds so it doesn't move the prefix
+        self.summary: Optional[str] = None
+        self.turns: List[Dict[str, str]] = []
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.context_rebuilds = 0
+        # Shared cache version this copy was loaded from or saved as
+        self.rev: Optional[int] = None
+        # Held for a whole turn (routers/chat.py), so concurrent turns run one after the other
+        self.lock = asyncio.Lock()
+
+    def context_stale(self, topology_version: int) -> bool:
+        return self.system_context is None or topology_version != self.topology_version or time.time() >= self.context_expires_at
+
+    def set_context(self, context: dict, system_context: str, topology_version: int) -> bool:
+        """Returns True if the system prompt text changed (the cached prefix is lost)."""
+        self.context = context
+        self.topology_version = topology_version
+        self.context_expires_at = time.time() + settings.CHAT_SESSION_CONTEXT_TTL_SECONDS
+        if system_context == self.system_context:
+            return False
+        self.system_context = system_context
+        self.context_rebuilds += 1
+        return True
+
+    def messages(self, content: str) -> List[Dict[str, str]]:
+        """Prompt for a new user message: the unchanged prefix plus that message."""
+        messages = [{'role': 'system', 'content': self.system_context}]
+        if self.summary:
+            messages.append({'role': 'system', 'content': self.summary})
+        return messages + self.turns + [{'role': 'user', 'content': content}]
+
+    def commit(self, content: str, reply: str):
+        """Record a completed turn. Failed or abandoned turns are never recorded."""
+        self.turns = self.turns + [{'role': 'user', 'content': content}, {'role': 'assistant', 'content': reply}]
+        self.summary, self.turns = fold_history(self.summary, self.turns, settings.CHAT_HISTORY_TOKEN_BUDGET)
+
+    def size(self) -> int:
+        """Approximate memory held by the session, in bytes of text."""
+        return len(self.system_context or "") + len(self.summary or "") + sum(len(t['content']) for t in self.turns)
+
+    def to_state(self) -> dict:
+        return {field: getattr(self, field) for field in _STATE_FIELDS}
+
+    @classmethod
+    def from_state(cls, state: dict, rev: int = None) -> "ChatSession":
+        session = cls(state["session_id"], state["service_name"])
+        for field in _STATE_FIELDS:
+            setattr(session, field, state[field])
+        session.rev = rev
+        return session
+
+    def info(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "service_name": self.service_name,
+            "turns": len(self.turns),
+            "summarized": self.summary is not None,
+            "context_rebuilds": self.context_rebuilds,
+            "size_bytes": self.size(),
+            "created_at": self.created_at,
+            "last_used": self.last_used,
+        }
+
+
+class ChatSessionStore:
+    """
+    In-memory sessions, least recently used first. Sessions idle for longer than
+    `idle_seconds` are dropped, and the oldest ones are evicted while the total
+    size is over `max_bytes`.
+
+    With a shared cache the sessions live there, so any worker can serve the
+    next turn: `save()` publishes a session after it changed and `get()` reloads
+    it when another worker saved a newer version. The in-memory copies are only
+    a cache of the shared ones.
+    """
+    def __init__(self, max_bytes: int, idle_seconds: float, shared: Callable[[], Optional[Any]] = lambda: None):
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self._shared = shared
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def create(self, service_name: str) -> ChatSession:
+        session = ChatSession(secrets.token_urlsafe(16), service_name)
+        with self._lock:
+            self._sessions[session.session_id] = session
+        self.save(session)
+        self.evict()
+        return session
+
+    def save(self, session: ChatSession):
+        """Publish a changed session to the other workers; a no-op without a shared cache."""
+        shared = self._shared()
+        if shared is not None:
+            session.rev = shared.set(SHARED_NAMESPACE, session.session_id, session.to_state(),
+                                     ttl=self.idle_seconds, tag=session.service_name)
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        self.evict()
+        with self._lock:
+            session = self._sessions.get(session_id)
+        shared = self._shared()
+        if shared is not None:
+            session = self._sync(shared, session_id, session)
+        if session is None:
+            return None
+        with self._lock:
+            session.last_used = time.time()
+            self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def _sync(self, shared, session_id: str, session: Optional[ChatSession]) -> Optional[ChatSession]:
+        current = shared.version(SHARED_NAMESPACE, session_id)
+        if current is None:
+            # Deleted or expired on another worker
+            with self._lock:
+                self._sessions.pop(session_id, None)
+            return None
+        if session is not None and session.rev == current[0]:
+            shared.touch(SHARED_NAMESPACE, session_id, self.idle_seconds)
+            return session
+        entry = shared.get_entry(SHARED_NAMESPACE, session_id)
+        if entry is None:
+            return session
+        state, rev, _ = entry
+        reloaded = ChatSession.from_state(state, rev)
+        if session is not None:
+            # Turns in flight on this worker still serialize on the same lock
+            reloaded.lock = session.lock
+        shared.touch(SHARED_NAMESPACE, session_id, self.idle_seconds)
+        return reloaded
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            deleted = self._sessions.pop(session_id, None) is not None
+        shared = self._shared()
+        if shared is not None:
+            deleted = shared.delete(SHARED_NAMESPACE, session_id) > 0 or deleted
+        return deleted
+
+    def invalidate_service(self, service_name: Optional[str] = None) -> int:
+        """Force a context refresh on the next turn (all sessions when no service is given)."""
+        with self._lock:
+            stale = [s for s in self._sessions.values() if service_name is None or s.service_name == service_name]
+        for session in stale:
+            session.context_expires_at = 0.0
+        invalidated = len(stale)
+        shared = self._shared()
+        if shared is not None:
+            states = dict(shared.items(SHARED_NAMESPACE, tag=service_name))
+            for state in states.values():
+                state["context_expires_at"] = 0.0
+            for tag in {state["service_name"] for state in states.values()}:
+                shared.set_many(SHARED_NAMESPACE, {
+                    session_id: state for session_id, state in states.items() if state["service_name"] == tag
+                }, ttl=self.idle_seconds, tag=tag)
+            invalidated = max(invalidated, len(states))
+        return invalidated
+
+    def evict(self):
+        now = time.time()
+        with self._lock:
+            while self._sessions:
+                session_id, oldest = next(iter(self._sessions.items()))
+                if now - oldest.last_used <= self.idle_seconds:
+                    break
+                del self._sessions[session_id]
+                self.expirations += 1
+            total = sum(s.size() for s in self._sessions.values())
+            # The most recent session always stays, even if it alone is over the cap
+            while total > self.max_bytes and len(self._sessions) > 1:
+                _, oldest = self._sessions.popitem(last=False)
+                total -= oldest.size()
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "size_bytes": sum(s.size() for s in self._sessions.values()),
+                "max_bytes": self.max_bytes,
+                "idle_seconds": self.idle_seconds,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+chat_sessions = ChatSessionStore(
+    max_bytes=settings.CHAT_SESSION_MAX_MB * 1024 * 1024,
+    idle_seconds=settings.CHAT_SESSION_IDLE_SECONDS,
+    shared=shared_cache,
+)
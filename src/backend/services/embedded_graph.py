@@ -0,0 +1,143 @@
+import json
+import os
+import tempfile
+import threading
+from typing import Any, Dict, List, Tuple
+from src.backend.services.graph_backend import GraphBackend, UPSTREAM, DOWNSTREAM, check_direction
+from src.backend.services.telemetry import span
+from src.backend.services.topology_cache import TopologySnapshot
+
+# GRAPH_BACKEND=embedded: the topology lives in a JSON file and is served from
+# memory, so graph reads need no server and no network round trip.
+#
+#   {"services": [{"name": "CartService", "type": "Microservice", "tier": "Tier-1"}, ...],
+#    "dependencies": [{"source": "Frontend", "target": "CartService", "criticality": "High"}, ...]}
+#
+# Write one with `generate_data.py --targets topology` or copy the one in Neo4j
+# with `scripts/export_topology.py`.
+
+FORMAT_VERSION = 1
+
+
+def load_topology_file(path: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    with open(path) as f:
+        data = json.load(f)
+    try:
+        nodes = [{"name": s["name"], "type": s.get("type"), "tier": s.get("tier")} for s in data["services"]]
+        edges = [
+            {"source": d["source"], "target": d["target"], "criticality": d.get("criticality")}
+            for d in data.get("dependencies", [])
+        ]
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"{path} is not a topology file (expected services and dependencies): {e!r}")
+    return nodes, edges
+
+
+def write_topology_file(path: str, nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]):
+    # Written next to the target and renamed over it, so a running backend never reads half a file
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump({
+                "version": FORMAT_VERSION,
+                "services": [{"name": n["name"], "type": n.get("type"), "tier": n.get("tier")} for n in nodes],
+                "dependencies": [
+                    {"source": e["source"], "target": e["target"], "criticality": e.get("criticality")} for e in edges
+                ],
+            }, f, separators=(",", ":"))
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class EmbeddedGraphBackend(GraphBackend):
+    """
+    GraphBackend over a topology file, held as a TopologySnapshot (CSR adjacency
+    arrays): a lookup is a dict hit plus an array slice, a traversal a BFS over
+    the arrays. The file is re-read when its mtime changes, checked on
+    `get_topology()` (each TopologyCache refresh) and on `ping()`.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._loads = 0
+        self._nodes: List[Dict[str, Any]] = []
+        self._edges: List[Dict[str, Any]] = []
+        self._snapshot = None
+        self.reload()
+
+    def reload(self, force: bool = False) -> TopologySnapshot:
+        with self._lock:
+            mtime = os.stat(self.path).st_mtime_ns
+            if force or mtime != self._mtime:
+                with span("graph.load") as s:
+                    nodes, edges = load_topology_file(self.path)
+                    self._loads += 1
+                    self._snapshot = TopologySnapshot(nodes, edges, self._loads)
+                    self._nodes, self._edges, self._mtime = nodes, edges, mtime
+                    s.set(rows=len(nodes) + len(edges))
+            return self._snapshot
+
+    def ping(self):
+        self.reload()
+
+    def get_service_details(self, service_name: str):
+        return self._snapshot.get_service_details(service_name)
+
+    def get_dependencies(self, service_name: str):
+        return self._snapshot.get_dependencies(service_name)
+
+    def get_upstream_dependencies(self, service_name: str):
+        return self._snapshot.get_upstream_dependencies(service_name)
+
+    def get_topology(self):
+        self.reload()
+        return self._nodes, self._edges
+
+    def traverse(self, service_name: str, direction: str = DOWNSTREAM, max_depth: int = 3):
+        check_direction(direction)
+        snapshot = self._snapshot
+        origin = snapshot.index.get(service_name)
+        if origin is None:
+            return []
+        if direction == UPSTREAM:
+            offsets, neighbours = snapshot.in_offsets, snapshot.in_sources
+        else:
+            offsets, neighbours = snapshot.out_offsets, snapshot.out_targets
+
+        # Breadth-first, so the first visit is the shortest hop count
+        depth_of = {origin: 0}
+        frontier = [origin]
+        for depth in range(1, max_depth + 1):
+            next_frontier = []
+            for node in frontier:
+                for j in range(offsets[node], offsets[node + 1]):
+                    neighbour = neighbours[j]
+                    if neighbour not in depth_of:
+                        depth_of[neighbour] = depth
+                        next_frontier.append(neighbour)
+            if not next_frontier:
+                break
+            frontier = next_frontier
+
+        del depth_of[origin]
+        return [
+            {"name": snapshot.names[i], "type": snapshot.types[i], "tier": snapshot.tiers[i], "depth": depth}
+            for i, depth in sorted(depth_of.items(), key=lambda item: (item[1], snapshot.names[item[0]]))
+        ]
+
+    # Lookups take microseconds, a worker thread hop would cost more than the call
+    async def get_service_details_async(self, service_name: str):
+        return self.get_service_details(service_name)
+
+    async def get_dependencies_async(self, service_name: str):
+        return self.get_dependencies(service_name)
+
+    async def get_upstream_dependencies_async(self, service_name: str):
+        return self.get_upstream_dependencies(service_name)
+
+    async def traverse_async(self, service_name: str, direction: str = DOWNSTREAM, max_depth: int = 3):
+        return self.traverse(service_name, direction, max_depth)
@@ -0,0 +1,88 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+from src.backend.config import settings
+from src.backend.services.providers import Provider
+
+# Read interface over the Service/DEPENDS_ON graph, with one implementation per
+# GRAPH_BACKEND: "neo4j" (services/neo4j_service.py) queries the server over
+# Bolt, "embedded" (services/embedded_graph.py) serves TOPOLOGY_FILE from memory.
+# Either one is built lazily by `graph_provider`; the TopologyCache loads its
+# snapshot through it.
+
+UPSTREAM = "upstream"      # callers, i.e. who is impacted when the service fails
+DOWNSTREAM = "downstream"  # dependencies, i.e. candidate root causes
+
+BACKENDS = ("neo4j", "embedded")
+
+
+class GraphBackend(ABC):
+    """
+    Nodes are {"name", "type", "tier"} dicts; a dependency is a node plus the
+    edge's "criticality". The async variants run the sync ones in a worker
+    thread unless a backend has a native async client (or doesn't need one).
+    """
+    @abstractmethod
+    def get_service_details(self, service_name: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def get_dependencies(self, service_name: str) -> List[Dict[str, Any]]:
+        """Fan-out: services this service calls."""
+
+    @abstractmethod
+    def get_upstream_dependencies(self, service_name: str) -> List[Dict[str, Any]]:
+        """Fan-in: services that call this service."""
+
+    @abstractmethod
+    def get_topology(self) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Full graph as (nodes, edges), edges are {"source", "target", "criticality"}."""
+
+    @abstractmethod
+    def traverse(self, service_name: str, direction: str = DOWNSTREAM, max_depth: int = 3) -> List[Dict[str, Any]]:
+        """Every service within `max_depth` hops, each with its shortest hop count as "depth", nearest first."""
+
+    def ping(self):
+        """Raises if the backend can't serve reads."""
+
+    def close(self):
+        pass
+
+    async def aclose(self):
+        self.close()
+
+    async def get_service_details_async(self, service_name: str):
+        return await asyncio.to_thread(self.get_service_details, service_name)
+
+    async def get_dependencies_async(self, service_name: str):
+        return await asyncio.to_thread(self.get_dependencies, service_name)
+
+    async def get_upstream_dependencies_async(self, service_name: str):
+        return await asyncio.to_thread(self.get_upstream_dependencies, service_name)
+
+    async def traverse_async(self, service_name: str, direction: str = DOWNSTREAM, max_depth: int = 3):
+        return await asyncio.to_thread(self.traverse, service_name, direction, max_depth)
+
+
+def check_direction(direction: str):
+    if direction not in (UPSTREAM, DOWNSTREAM):
+        raise ValueError(f"direction must be '{UPSTREAM}' or '{DOWNSTREAM}'")
+
+
+def _create_backend() -> GraphBackend:
+    # Client libraries are imported here, only the selected backend's get loaded
+    if settings.GRAPH_BACKEND == "embedded":
+        from src.backend.services.embedded_graph import EmbeddedGraphBackend
+        return EmbeddedGraphBackend(settings.TOPOLOGY_FILE)
+    if settings.GRAPH_BACKEND == "neo4j":
+        from src.backend.services.neo4j_service import Neo4jService
+        return Neo4jService()
+    raise ValueError(f"GRAPH_BACKEND must be one of {', '.join(BACKENDS)}, got {settings.GRAPH_BACKEND!r}")
+
+
+async def _close_backend(backend: GraphBackend):
+    await backend.aclose()
+
+
+graph_provider = Provider("graph", _create_backend, close=_close_backend, check=lambda backend: backend.ping())
+graph_service = graph_provider.proxy
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
+
+# numpy is imported on the first search rather than with the app
+if TYPE_CHECKING:
+    import numpy as np
+
+# Ranking helpers for hybrid runbook search: BM25 over the metadata-filtered
+# candidate pool, exact vector distances, and reciprocal-rank fusion.
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# RRF damping constant from Cormack et al.; larger values flatten the head of each list
+RRF_K = 60
+
+# Words in a question that point at one runbook `type`
+FAILURE_TYPE_KEYWORDS = {
+    "latency": ("latency", "slow", "p99", "p95", "timeout", "timeouts", "response time"),
+    "error_rate": ("error", "errors", "5xx", "500", "failure", "failures", "failing", "exception"),
+    "saturation": ("saturation", "memory", "cpu", "pool", "leak", "oom", "connections", "gc"),
+}
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def infer_failure_types(text: str) -> Optional[List[str]]:
+    """Runbook types a question is about, or None when it doesn't clearly name one."""
+    lowered = text.lower()
+    tokens = set(tokenize(lowered))
+    found = [
+        rb_type for rb_type, words in FAILURE_TYPE_KEYWORDS.items()
+        if any((w in lowered) if " " in w else (w in tokens) for w in words)
+    ]
+    return found or None
+
+
+def bm25_scores(query: str, documents: Sequence[str]) -> np.ndarray:
+    """Okapi BM25 of `query` against each document; IDF comes from the documents given (the filtered pool)."""
+    import numpy as np
+    terms = set(tokenize(query))
+    docs = [Counter(tokenize(d)) for d in documents]
+    if not docs or not terms:
+        return np.zeros(len(docs))
+    lengths = np.array([sum(d.values()) for d in docs], dtype=float)
+    avg_length = lengths.mean() or 1.0
+    scores = np.zeros(len(docs))
+    for term in terms:
+        tf = np.array([d.get(term, 0) for d in docs], dtype=float)
+        df = np.count_nonzero(tf)
+        if not df:
+            continue
+        idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+        scores += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * lengths / avg_length))
+    return scores
+
+
+def vector_distances(query: Sequence[float], embeddings: Sequence[Sequence[float]], space: str = "l2") -> np.ndarray:
+    """Exact distances in the collection's HNSW space, smaller is closer (same as Chroma reports them)."""
+    import numpy as np
+    q = np.asarray(query, dtype=np.float32)
+    m = np.asarray(embeddings, dtype=np.float32)
+    if space == "cosine":
+        norms = np.linalg.norm(m, axis=1) * (np.linalg.norm(q) or 1.0)
+        return 1.0 - (m @ q) / np.where(norms == 0, 1.0, norms)
+    if space == "ip":
+        return 1.0 - m @ q
+    return ((m - q) ** 2).sum(axis=1)
+
+
+def ranks(keys: Sequence[str], scores: Sequence[float], higher_is_better: bool = True, min_score: float = None) -> Dict[str, int]:
+    """1-based rank per key; keys at or below `min_score` (e.g. no keyword match) are left out."""
+    order = sorted(range(len(keys)), key=lambda i: -scores[i] if higher_is_better else scores[i])
+    return {
+        keys[i]: rank for rank, i in enumerate(
+            (i for i in order if min_score is None or scores[i] > min_score), start=1
+        )
+    }
+
+
+def reciprocal_rank_fusion(rankings: List[Dict[str, int]], k: int = RRF_K) -> Dict[str, float]:
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for key, rank in ranking.items():
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + rank)
+    return fused
@@ -0,0 +1,205 @@
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+from src.backend.config import settings
+from src.backend.services.telemetry import record_cache
+
+# Floats in prompt inputs (metric summaries) are rounded to this many significant
+# digits before hashing, so noise in the last decimals still hits the cache
+_SIGNIFICANT_DIGITS = 4
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, float):
+        if value == 0 or not math.isfinite(value):
+            return value
+        return round(value, _SIGNIFICANT_DIGITS - 1 - int(math.floor(math.log10(abs(value)))))
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [_normalize(v) for v in value]
+        # Graph queries return neighbours in no particular order
+        if items and all(isinstance(v, dict) and "name" in v for v in items):
+            items.sort(key=lambda v: str(v["name"]))
+        return items
+    return value
+
+
+def make_key(model: str, **inputs) -> str:
+    """Content address for a completion: hash of the model name plus the normalized prompt inputs."""
+    payload = json.dumps({"model": model, "inputs": _normalize(inputs)}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Two-tier cache for LLM completions: a bounded in-memory LRU and an optional
+    SQLite file shared across restarts. Entries carry the service they were
+    generated for so topology/runbook/metric changes can invalidate them.
+    With `memory=False` only the SQLite tier is used, e.g. when several worker
+    processes share it and an invalidation in one of them must hold for all.
+    """
+    def __init__(self, max_entries: int, ttl_seconds: float, db_path: str = "", memory: bool = True):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.memory = memory
+        self._entries = OrderedDict()  # key -> (value, expires_at, service_name)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        if self.db_path:
+            conn = self._connect()
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                service_name TEXT,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_service ON llm_cache (service_name)")
+        return conn
+
+    def _remember(self, key: str, value: str, expires_at: float, service_name: Optional[str]):
+        # Caller holds the lock
+        if not self.memory:
+            return
+        self._entries[key] = (value, expires_at, service_name)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at, _ = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    record_cache("llm", True)
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+
+        if self.db_path:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT value, expires_at, service_name FROM llm_cache WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+            finally:
+                conn.close()
+            if row:
+                with self._lock:
+                    self._remember(key, *row)
+                    self.hits += 1
+                    self.disk_hits += 1
+                record_cache("llm_disk", True)
+                return row[0]
+
+        with self._lock:
+            self.misses += 1
+        record_cache("llm", False)
+        return None
+
+    def set(self, key: str, value: str, service_name: Optional[str] = None):
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._remember(key, value, expires_at, service_name)
+        if self.db_path:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO llm_cache (key, service_name, value, expires_at) VALUES (?, ?, ?, ?)",
+                        (key, service_name, value, expires_at)
+                    )
+            finally:
+                conn.close()
+
+    def invalidate_service(self, service_name: str) -> int:
+        """Drop every cached completion generated for `service_name`."""
+        with self._lock:
+            stale = [k for k, (_, _, s) in self._entries.items() if s == service_name]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        removed = len(stale)
+        if self.db_path:
+            removed = max(removed, invalidate_disk(self.db_path, [service_name]))
+        return removed
+
+    def clear(self) -> int:
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            self.invalidations += removed
+        if self.db_path:
+            removed = max(removed, invalidate_disk(self.db_path))
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "memory_tier": self.memory,
+                "disk_tier": bool(self.db_path),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+def invalidate_disk(db_path: str, service_names: list[str] = None) -> int:
+    """
+    Invalidate the on-disk tier without a running server, e.g. from generate_data.py
+    after it rewrites the topology, runbooks or metrics. None clears everything.
+    """
+    if not db_path or not os.path.exists(db_path):
+        return 0
+    conn = sqlite3.connect(db_path, timeout=10)
+    try:
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'llm_cache'").fetchone()
+        if not exists:
+            return 0
+        with conn:
+            if service_names is None:
+                return conn.execute("DELETE FROM llm_cache").rowcount
+            placeholders = ", ".join("?" for _ in service_names)
+            return conn.execute(f"DELETE FROM llm_cache WHERE service_name IN ({placeholders})", service_names).rowcount
+    finally:
+        conn.close()
+
+
+llm_cache = LLMCache(
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+    # Multi-worker serving: one copy of each completion, in the shared file unless a path of its own is set
+    db_path=settings.LLM_CACHE_DB_PATH or settings.SHARED_CACHE_PATH,
+    memory=not settings.SHARED_CACHE_PATH,
+)
@@ -1,99 +1,255 @@
-import ollama
 from src.backend.config import settings
-from typing import Dict, Any, List
+from src.backend.services.llm_cache import llm_cache, make_key
+from src.backend.services import prompt_builder
+from src.backend.services.telemetry import span, record_prompt
+from src.backend.services.providers import Provider
+from typing import Dict, Any, List, AsyncIterator
+
+RECOMMENDATION_TEMPLATE = """You are an expert Site Reliability Engineer (SRE). Your task is to recommend Service Level Objectives (SLOs) for a microservice based on its topology, historical metrics, and operational runbooks.
+
+**Service Context**:
+- Name: {name}
+- Type: {type}
+- Tier: {tier}
+
+**Dependencies (transitive, ranked by impact score)**:
+{dependencies}
+
+**Dependents / Blast Radius (transitive callers, ranked by impact score)**:
+{dependents}
+
+**Historical Metrics (Last 24h Summary)**:
+(error_rate is in %, trend is the least-squares change per hour, anomalies are robust z-score outliers)
+{metrics}
+
+**Relevant Runbooks**:
+{runbooks}
+
+**Task**:
+1. Analyze the service's criticality based on its tier, dependencies, and how many services depend on it (impact 1.0 = direct high-criticality edge; `via` lists intermediate hops).
+2. Evaluate its recent performance (latency, error rates) from the metrics.
+3. Recommend specific SLOs for:
+   - Availability (e.g., 99.9%, 99.99%)
+   - Latency (e.g., P99 < 200ms)
+4. Provide a "Strategy" or "Reasoning" section explaining WHY you chose these targets, citing specific runbooks or metric trends if relevant.
+
+**Output Format**:
+Return the response in Markdown format.
+"""
+
+CHAT_TEMPLATE = """You are an expert SRE assistant helping a user with SLO recommendations and Blast Radius Analysis.
+
+**Target Service Context**:
+- Name: {name}
+- Type: {type}
+- Tier: {tier}
+
+**Downstream Dependencies (Fan-Out/Dependencies)**:
+(Services called by {name}, directly or transitively; `depth` is the hop count, `via` the intermediate services, `impact` 0-1 how strongly a failure propagates)
+{dependencies}
+
+**Upstream Dependencies (Fan-In/Callers)**:
+(Services that call {name}, directly or transitively, ranked by impact)
+{dependents}
+
+**Live Metrics Snapshot (Last 3 hours)**:
+(Includes metrics for Target Service AND its Upstream/Downstream neighbors)
+{metrics}
+
+**Relevant Runbooks**:
+{runbooks}
+
+**Key Instructions for Blast Radius Analysis**:
+1. **Fan-In Analysis**: If the target service is failing, identify which Upstream callers might be impacted, including indirect ones (e.g., "UserDB -> PaymentService -> CheckoutService -> Frontend, so Checkout and Frontend might fail").
+2. **Fan-Out Analysis**: If the target service has high latency, check its Downstream dependencies. Is a database or another service slow?
+3. **Isolate the Fault**: Use the provided metrics to pinpoint the root cause. If `UserDB` latency is normal but `PaymentService` is slow, the issue is likely within `PaymentService` itself.
+4. **Be Precise**: Cite specific metric values (e.g., "UserDB latency is only 5ms, so it's unlikely the bottleneck").
+"""
+
+
+def _record_usage(s, response):
+    # Token counts are only on the final response/chunk; absent on older Ollama versions
+    s.set(prompt_tokens=response.get('prompt_eval_count') or 0, completion_tokens=response.get('eval_count') or 0)
+
 
 class LLMService:
     def __init__(self):
         self.model = "mistral" # Default model, can be configurable
         # Ensure ollama client is configured if needed, usually it connects to localhost:11434 by default
+        # The async client is used by the routers so a slow completion doesn't block the event loop
+        # Deferred with the service: ollama pulls in its HTTP client stack
+        import ollama
+        self.client = ollama.Client(host=settings.OLLAMA_URL)
+        self.async_client = ollama.AsyncClient(host=settings.OLLAMA_URL)
+
+    def ping(self):
+        """Raises if the Ollama server doesn't answer within READINESS_TIMEOUT_SECONDS."""
+        import ollama
+        ollama.Client(host=settings.OLLAMA_URL, timeout=settings.READINESS_TIMEOUT_SECONDS).list()
+
+    def _build_recommendation_prompt(self, service_data: Dict[str, Any], dependencies: List[Dict[str, Any]], runbooks: List[str], metrics: List[Dict[str, Any]], upstream_dependencies: List[Dict[str, Any]] = None) -> str:
+        # Sections are compact tables, ranked and cut to fit PROMPT_TOKEN_BUDGET
+        prompt, report = prompt_builder.fit_sections(
+            RECOMMENDATION_TEMPLATE, settings.PROMPT_TOKEN_BUDGET, [service_data.get('name')],
+            dependencies, upstream_dependencies, runbooks, metrics,
+            name=service_data.get('name'), type=service_data.get('type'), tier=service_data.get('tier'),
+        )
+        record_prompt("recommendation", report)
+        return prompt
+
+    def _recommendation_cache_key(self, service_data: Dict[str, Any], dependencies: List[Dict[str, Any]], runbooks: List[str], metrics: List[Dict[str, Any]], upstream_dependencies: List[Dict[str, Any]] = None) -> str:
+        return make_key(self.model, task="slo_recommendation", service=service_data,
+                        dependencies=dependencies, upstream_dependencies=upstream_dependencies,
+                        runbooks=runbooks, metrics=metrics)
+
+    def generate_slo_recommendation(self, service_data: Dict[str, Any], dependencies: List[Dict[str, Any]], runbooks: List[str], metrics: List[Dict[str, Any]], upstream_dependencies: List[Dict[str, Any]] = None) -> str:
+        cache_key = self._recommendation_cache_key(service_data, dependencies, runbooks, metrics, upstream_dependencies)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        with span("llm.prompt") as s:
+            prompt = self._build_recommendation_prompt(service_data, dependencies, runbooks, metrics, upstream_dependencies)
+            s.set(bytes=len(prompt))
 
-    def generate_slo_recommendation(self, service_data: Dict[str, Any], dependencies: List[Dict[str, Any]], runbooks: List[str], metrics: List[Dict[str, Any]]) -> str:
-        
-        # Construct the prompt
-        prompt = f"""
-        You are an expert Site Reliability Engineer (SRE). Your task is to recommend Service Level Objectives (SLOs) for a microservice based on its topology, historical metrics, and operational runbooks.
-
-        **Service Context**:
-        - Name: {service_data.get('name')}
-        - Type: {service_data.get('type')}
-        - Tier: {service_data.get('tier')}
-
-        **Dependencies**:
-        {dependencies}
-
-        **Historical Metrics (Last 24h Summary)**:
-        {metrics[:5]} ... (truncated for brevity)
-        
-        **Relevant Runbooks**:
-        {self._format_runbooks(runbooks)}
-
-        **Task**:
-        1. Analyze the service's criticality based on its tier and dependencies.
-        2. Evaluate its recent performance (latency, error rates) from the metrics.
-        3. Recommend specific SLOs for:
-           - Availability (e.g., 99.9%, 99.99%)
-           - Latency (e.g., P99 < 200ms)
-        4. Provide a "Strategy" or "Reasoning" section explaining WHY you chose these targets, citing specific runbooks or metric trends if relevant.
-
-        **Output Format**:
-        Return the response in Markdown format.
-        """
+        try:
+            with span("llm.generate") as s:
+                response = self.client.chat(model=self.model, keep_alive=settings.OLLAMA_KEEP_ALIVE, messages=[
+                    {'role': 'user', 'content': prompt},
+                ])
+                _record_usage(s, response)
+            content = response['message']['content']
+            llm_cache.set(cache_key, content, service_data.get('name'))
+            return content
+        except Exception as e:
+            return f"Error generating recommendation: {str(e)}. Ensure Ollama is running."
 
+    async def generate_slo_recommendation_async(self, service_data: Dict[str, Any], dependencies: List[Dict[str, Any]], runbooks: List[str], metrics: List[Dict[str, Any]], upstream_dependencies: List[Dict[str, Any]] = None) -> str:
         try:
-            response = ollama.chat(model=self.model, messages=[
-                {'role': 'user', 'content': prompt},
-            ])
-            return response['message']['content']
+            return await self.recommend_slo_async(service_data, dependencies, runbooks, metrics, upstream_dependencies)
         except Exception as e:
             return f"Error generating recommendation: {str(e)}. Ensure Ollama is running."
 
+    async def recommend_slo_async(self, service_data: Dict[str, Any], dependencies: List[Dict[str, Any]], runbooks: List[str], metrics: List[Dict[str, Any]], upstream_dependencies: List[Dict[str, Any]] = None) -> str:
+        """generate_slo_recommendation_async for batch jobs, which record failures per service. Errors propagate."""
+        cache_key = self._recommendation_cache_key(service_data, dependencies, runbooks, metrics, upstream_dependencies)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        with span("llm.prompt") as s:
+            prompt = self._build_recommendation_prompt(service_data, dependencies, runbooks, metrics, upstream_dependencies)
+            s.set(bytes=len(prompt))
+
+        with span("llm.generate") as s:
+            response = await self.async_client.chat(model=self.model, keep_alive=settings.OLLAMA_KEEP_ALIVE, messages=[
+                {'role': 'user', 'content': prompt},
+            ])
+            _record_usage(s, response)
+        content = response['message']['content']
+        llm_cache.set(cache_key, content, service_data.get('name'))
+        return content
+
+    async def stream_slo_recommendation(self, service_data: Dict[str, Any], dependencies: List[Dict[str, Any]], runbooks: List[str], metrics: List[Dict[str, Any]], upstream_dependencies: List[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        cache_key = self._recommendation_cache_key(service_data, dependencies, runbooks, metrics, upstream_dependencies)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        with span("llm.prompt") as s:
+            prompt = self._build_recommendation_prompt(service_data, dependencies, runbooks, metrics, upstream_dependencies)
+            s.set(bytes=len(prompt))
+        parts = []
+        async for token in self._stream_chat([{'role': 'user', 'content': prompt}]):
+            parts.append(token)
+            yield token
+        # Only reached when the stream ran to completion (not on disconnect)
+        llm_cache.set(cache_key, "".join(parts), service_data.get('name'))
+
+    def build_chat_system_context(self, service_data: Dict[str, Any], dependencies: List[Dict[str, Any]], upstream_dependencies: List[Dict[str, Any]], runbooks: List[str], metrics: List[Dict[str, Any]]):
+        """System prompt for chat and its per-section token report. Same inputs always render the same bytes."""
+        # Metrics rows are ranked target service first, then neighbours in impact order
+        service_order = [service_data.get('name')] + [d['name'] for d in dependencies] + [u['name'] for u in upstream_dependencies]
+        return prompt_builder.fit_sections(
+            CHAT_TEMPLATE, settings.PROMPT_TOKEN_BUDGET, service_order,
+            dependencies, upstream_dependencies, runbooks, metrics,
+            name=service_data.get('name'), type=service_data.get('type'), tier=service_data.get('tier'),
+        )
+
+    def _build_chat_messages(self, service_data: Dict[str, Any], dependencies: List[Dict[str, Any]], upstream_dependencies: List[Dict[str, Any]], runbooks: List[str], metrics: List[Dict[str, Any]], messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        system_context, report = self.build_chat_system_context(service_data, dependencies, upstream_dependencies, runbooks, metrics)
+
+        # Only the latest turns are resent verbatim, older ones go in as a condensed summary
+        summary, recent, history_report = prompt_builder.compress_history(messages, settings.CHAT_HISTORY_TOKEN_BUDGET)
+        report.update(history_report)
+        record_prompt("chat", report)
+
+        ollama_messages = [{'role': 'system', 'content': system_context}]
+        if summary:
+            ollama_messages.append({'role': 'system', 'content': summary})
+        return ollama_messages + recent
+
     def chat_with_context(self, service_data: Dict[str, Any], dependencies: List[Dict[str, Any]], upstream_dependencies: List[Dict[str, Any]], runbooks: List[str], metrics: List[Dict[str, Any]], messages: List[Dict[str, str]]) -> str:
-        
-        # System context
-        system_context = f"""
-        You are an expert SRE assistant helping a user with SLO recommendations and Blast Radius Analysis.
-        
-        **Target Service Context**:
-        - Name: {service_data.get('name')}
-        - Type: {service_data.get('type')}
-        - Tier: {service_data.get('tier')}
-
-        **Downstream Dependencies (Fan-Out/Dependencies)**:
-        (Services called by {service_data.get('name')})
-        {dependencies}
-
-        **Upstream Dependencies (Fan-In/Callers)**:
-        (Services that call {service_data.get('name')})
-        {upstream_dependencies}
-
-        **Live Metrics Snapshot (Last 3 hours)**:
-        (Includes metrics for Target Service AND its Upstream/Downstream neighbors)
-        {metrics}
-        
-        **Relevant Runbooks**:
-        {self._format_runbooks(runbooks)}
-        
-        **Key Instructions for Blast Radius Analysis**:
-        1. **Fan-In Analysis**: If the target service is failing, identify which Upstream callers might be impacted (e.g., "CheckoutService calls PaymentService, so Checkout might fail").
-        2. **Fan-Out Analysis**: If the target service has high latency, check its Downstream dependencies. Is a database or another service slow?
-        3. **Isolate the Fault**: Use the provided metrics to pinpoint the root cause. If `UserDB` latency is normal but `PaymentService` is slow, the issue is likely within `PaymentService` itself.
-        4. **Be Precise**: Cite specific metric values (e.g., "UserDB latency is only 5ms, so it's unlikely the bottleneck").
-        """
-
-        # Construct message history for Ollama
-        # Ollama expects [{'role': 'system', 'content': ...}, {'role': 'user', ...}]
-        # Some models handle system prompt differently, but usually 'system' role works or prepending to first user message.
-        # Let's prepend system context to the message history list or just use it as the first message.
-        
-        ollama_messages = [{'role': 'system', 'content': system_context}] + messages
+        with span("llm.prompt") as s:
+            ollama_messages = self._build_chat_messages(service_data, dependencies, upstream_dependencies, runbooks, metrics, messages)
+            s.set(bytes=sum(len(m['content']) for m in ollama_messages))
 
         try:
-            response = ollama.chat(model=self.model, messages=ollama_messages)
+            with span("llm.chat") as s:
+                response = self.client.chat(model=self.model, keep_alive=settings.OLLAMA_KEEP_ALIVE, messages=ollama_messages)
+                _record_usage(s, response)
             return response['message']['content']
         except Exception as e:
             return f"Error responding to chat: {str(e)}"
 
-    def _format_runbooks(self, runbooks: List[str]) -> str:
-        return "\n".join([f"- {r}" for r in runbooks])
+    async def chat_with_context_async(self, service_data: Dict[str, Any], dependencies: List[Dict[str, Any]], upstream_dependencies: List[Dict[str, Any]], runbooks: List[str], metrics: List[Dict[str, Any]], messages: List[Dict[str, str]]) -> str:
+        with span("llm.prompt") as s:
+            ollama_messages = self._build_chat_messages(service_data, dependencies, upstream_dependencies, runbooks, metrics, messages)
+            s.set(bytes=sum(len(m['content']) for m in ollama_messages))
+
+        try:
+            with span("llm.chat") as s:
+                response = await self.async_client.chat(model=self.model, keep_alive=settings.OLLAMA_KEEP_ALIVE, messages=ollama_messages)
+                _record_usage(s, response)
+            return response['message']['content']
+        except Exception as e:
+            return f"Error responding to chat: {str(e)}"
 
-llm_service = LLMService()
+    async def stream_chat_with_context(self, service_data: Dict[str, Any], dependencies: List[Dict[str, Any]], upstream_dependencies: List[Dict[str, Any]], runbooks: List[str], metrics: List[Dict[str, Any]], messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        with span("llm.prompt") as s:
+            ollama_messages = self._build_chat_messages(service_data, dependencies, upstream_dependencies, runbooks, metrics, messages)
+            s.set(bytes=sum(len(m['content']) for m in ollama_messages))
+        async for token in self._stream_chat(ollama_messages):
+            yield token
+
+    async def chat_messages_async(self, ollama_messages: List[Dict[str, str]]) -> str:
+        """Send already-built messages (chat sessions keep their own system prefix and history). Errors propagate."""
+        with span("llm.chat") as s:
+            response = await self.async_client.chat(model=self.model, keep_alive=settings.OLLAMA_KEEP_ALIVE, messages=ollama_messages)
+            _record_usage(s, response)
+        return response['message']['content']
+
+    async def stream_chat_messages(self, ollama_messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        async for token in self._stream_chat(ollama_messages):
+            yield token
+
+    async def _stream_chat(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        with span("llm.stream") as s:
+            stream = await self.async_client.chat(model=self.model, keep_alive=settings.OLLAMA_KEEP_ALIVE, messages=messages, stream=True)
+            try:
+                async for chunk in stream:
+                    token = chunk['message']['content']
+                    if token:
+                        yield token
+                    if chunk.get('done'):
+                        _record_usage(s, chunk)
+            finally:
+                # Closing the stream closes the HTTP response, which makes Ollama abort the generation
+                await stream.aclose()
+
+async def _close_client(service: LLMService):
+    await service.async_client.close()
+
+llm_provider = Provider("ollama", LLMService, close=_close_client, check=LLMService.ping, required=False)
+llm_service = llm_provider.proxy
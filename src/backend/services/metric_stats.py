@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import math
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from src.backend.services import rollups
+from src.backend.services.rollups import QuantileSketch
+
+# numpy/pandas are imported by the functions that use them: they are most of the
+# app's import time, and only the metric stats requests need them
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+# Local hours (inclusive range 18:00-22:59) treated as peak traffic, same as the data generator
+PEAK_HOURS = tuple(range(18, 23))
+
+ERROR_METRIC = "error_rate"        # percentage of failed requests
+THROUGHPUT_METRIC = "throughput"   # requests per interval, used to weight availability
+
+# Robust z-score (median/MAD) above which a point is anomalous
+ANOMALY_Z = 3.5
+MAX_ANOMALIES = 3
+
+_KEYS = ["service_name", "metric_name"]
+
+
+def _format_ts(ts: int) -> str:
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(int(ts)))
+
+
+def _clean(value) -> Optional[float]:
+    if value is None or math.isnan(value):
+        return None
+    return round(float(value), 4)
+
+
+ROLLUP_COLUMNS = ["bucket", "service_name", "metric_name", "count", "sum", "sum_sq", "min", "max", "sketch"]
+
+
+def rollup_frame(rows) -> pd.DataFrame:
+    """Rollup rows as returned by rollups.fetch_rollup_rows, as a DataFrame."""
+    import pandas as pd
+    return pd.DataFrame(rows, columns=ROLLUP_COLUMNS)
+
+
+def _sketch_quantiles(sketches: pd.Series, gid: np.ndarray, groups: int) -> Dict[str, np.ndarray]:
+    # Merge every row's sketch into its series' sketch and read p50/p95/p99 off the merged counts,
+    # with the same bucket walk as QuantileSketch.quantile: bucket counts are merged by
+    # (series, key) code, and each quantile is one searchsorted over the running counts
+    import numpy as np
+    zero_counts, entries, keys, counts = rollups.sketch_arrays(sketches.tolist())
+    zero = np.bincount(gid, weights=zero_counts, minlength=groups)
+    owner = np.repeat(gid, entries)
+
+    if len(keys):
+        key_min = keys.min()
+        span = int(keys.max() - key_min) + 1
+        codes, inverse = np.unique(owner * span + (keys - key_min), return_inverse=True)
+        merged = np.bincount(inverse, weights=counts)
+        pair_group, pair_key = codes // span, codes % span + key_min
+    else:
+        merged = pair_group = pair_key = np.zeros(0, dtype=np.int64)
+    cum = np.cumsum(merged)
+    first = np.searchsorted(pair_group, np.arange(groups))
+    last = np.searchsorted(pair_group, np.arange(groups), side="right")
+    before = np.r_[0.0, cum][first]
+    total = zero + np.r_[0.0, cum][last] - before
+
+    gamma = QuantileSketch._gamma
+    quantiles = {}
+    for q, column in ((0.5, "p50"), (0.95, "p95"), (0.99, "p99")):
+        rank = q * (total - 1)
+        in_zero = rank < zero
+        # First merged bucket of the series whose running count exceeds the rank
+        index = np.minimum(np.searchsorted(cum, before + rank - zero, side="right"), np.maximum(last - 1, 0))
+        value = 2 * gamma ** pair_key[index].astype(float) / (gamma + 1) if len(pair_key) else np.zeros(groups)
+        quantiles[column] = np.where(in_zero, 0.0, value)
+    return quantiles
+
+
+def rollup_stats(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per (service_name, metric_name) statistics merged from rollup rows (see
+    rollup_frame), as grouped aggregations over the whole frame. n, mean, std, min
+    and max are exact; percentiles come from the merged sketches (within
+    rollups.SKETCH_RELATIVE_ACCURACY). The peak split and the trend place each
+    bucket's points at the bucket start, so use buckets of at most an hour.
+    """
+    import numpy as np
+    grouped = frame.groupby(_KEYS, sort=True)
+    gid = grouped.ngroup().to_numpy()
+    count = frame["count"].to_numpy(dtype=float)
+    value_sum = frame["sum"].to_numpy(dtype=float)
+
+    stats = grouped.agg(n=("count", "sum"), total=("sum", "sum"), sum_sq=("sum_sq", "sum"), min=("min", "min"), max=("max", "max"))
+    groups = len(stats)
+
+    def group_sum(weights):
+        return np.bincount(gid, weights=weights, minlength=groups)
+
+    n = stats["n"].to_numpy(dtype=float)
+    total = stats["total"].to_numpy()
+    stats["mean"] = total / n
+    with np.errstate(divide="ignore", invalid="ignore"):
+        variance = (stats["sum_sq"].to_numpy() - total * total / n) / (n - 1)
+    stats["std"] = np.where(n > 1, np.sqrt(np.maximum(variance, 0.0)), np.nan)
+    for column, values in _sketch_quantiles(frame["sketch"], gid, groups).items():
+        stats[column] = values
+
+    # Peak vs off-peak mean, by the local hour of each bucket
+    bucket = frame["bucket"].to_numpy(dtype=np.int64)
+    peak = np.isin((bucket + time.localtime().tm_gmtoff) // 3600 % 24, PEAK_HOURS)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for mask, column in ((peak, "peak_mean"), (~peak, "offpeak_mean")):
+            stats[column] = group_sum(value_sum * mask) / group_sum(count * mask)
+
+    # Least-squares slope (value per hour) from grouped sums, hours since the series' first bucket
+    t = (bucket - grouped["bucket"].transform("min").to_numpy()) / 3600.0
+    sum_t = group_sum(count * t)
+    denom = n * group_sum(count * t * t) - sum_t ** 2
+    numer = n * group_sum(t * value_sum) - sum_t * total
+    with np.errstate(divide="ignore", invalid="ignore"):
+        stats["trend_per_hour"] = np.where(denom > 0, numer / denom, 0.0)
+    return stats
+
+
+def anomaly_windows(frame: pd.DataFrame, threshold: float = ANOMALY_Z) -> pd.DataFrame:
+    """Runs of consecutive points whose robust z-score exceeds `threshold`, one row per run."""
+    import numpy as np
+    import pandas as pd
+    df = frame.sort_values(_KEYS + ["ts"], kind="stable").reset_index(drop=True)
+    gid = df.groupby(_KEYS, sort=True).ngroup()
+    value = df["value"]
+
+    deviation = value - value.groupby(gid).transform("median")
+    mad = deviation.abs().groupby(gid).transform("median")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (0.6745 * deviation / mad).where(mad > 0, 0.0)
+    flagged = z.abs() > threshold
+
+    # A new run starts whenever the flag flips or the series changes
+    run = ((flagged != flagged.shift()) | (gid != gid.shift())).cumsum()
+    hits = df[flagged].assign(run=run[flagged], z=z[flagged].abs())
+    if hits.empty:
+        return pd.DataFrame(columns=_KEYS + ["start", "end", "points", "peak", "z"])
+
+    peak_rows = hits.loc[hits.groupby("run")["z"].idxmax(), ["run", "value", "z"]].set_index("run")
+    windows = hits.groupby("run").agg(
+        service_name=("service_name", "first"),
+        metric_name=("metric_name", "first"),
+        start=("ts", "min"),
+        end=("ts", "max"),
+        points=("ts", "count"),
+    )
+    windows["peak"] = peak_rows["value"]
+    windows["z"] = peak_rows["z"]
+    return windows.reset_index(drop=True)
+
+
+def rollup_availability(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Availability % per service from error_rate rollup rows, each bucket weighted
+    by the mean throughput of the same bucket when present.
+    """
+    import pandas as pd
+    errors = frame[frame["metric_name"] == ERROR_METRIC][["service_name", "bucket", "count", "sum", "max"]]
+    throughput = frame[frame["metric_name"] == THROUGHPUT_METRIC]
+    weights = pd.DataFrame({
+        "service_name": throughput["service_name"],
+        "bucket": throughput["bucket"],
+        "weight": throughput["sum"] / throughput["count"],
+    })
+    merged = errors.merge(weights, on=["service_name", "bucket"], how="left")
+    weight = merged["weight"].fillna(1.0)
+
+    by_service = pd.DataFrame({
+        "service_name": merged["service_name"],
+        "failed": merged["sum"] * weight,
+        "weight": merged["count"] * weight,
+        "error_rate": merged["max"],
+    }).groupby("service_name")
+    result = by_service[["failed", "weight"]].sum()
+    result["availability"] = 100.0 - result["failed"] / result["weight"]
+    result["availability_min"] = 100.0 - by_service["error_rate"].max()
+    return result[["availability", "availability_min"]]
+
+
+def summarize(rows, frame: pd.DataFrame = None) -> List[Dict[str, Any]]:
+    """
+    Compact per-series summary for the LLM prompt: one dict per service/metric
+    with distribution, peak split and trend from the rollup `rows` (see
+    rollup_stats), plus the strongest anomaly windows found in `frame`, the raw
+    points of the recent part of the window. error_rate rows also carry the
+    service's availability.
+    """
+    if not rows:
+        return []
+    rollup = rollup_frame(rows)
+    stats = rollup_stats(rollup)
+    avail = rollup_availability(rollup)
+
+    anomalies = {}
+    if frame is not None and not frame.empty:
+        for row in anomaly_windows(frame).sort_values("z", ascending=False).itertuples(index=False):
+            found = anomalies.setdefault((row.service_name, row.metric_name), [])
+            if len(found) < MAX_ANOMALIES:
+                found.append({
+                    "start": _format_ts(row.start),
+                    "end": _format_ts(row.end),
+                    "points": int(row.points),
+                    "peak": _clean(row.peak),
+                })
+
+    columns = ("mean", "std", "min", "max", "p50", "p95", "p99", "peak_mean", "offpeak_mean", "trend_per_hour")
+    summary = []
+    for (service_name, metric_name), n, *values in zip(stats.index, stats["n"].tolist(), *(stats[c].tolist() for c in columns)):
+        entry = {"service_name": service_name, "metric_name": metric_name, "n": int(n)}
+        entry.update(zip(columns, map(_clean, values)))
+        entry["anomalies"] = anomalies.get((service_name, metric_name), [])
+        if metric_name == ERROR_METRIC and service_name in avail.index:
+            entry["availability"] = _clean(avail.at[service_name, "availability"])
+            entry["availability_min"] = _clean(avail.at[service_name, "availability_min"])
+        summary.append(entry)
+    return summary
+
+
+def _fmt(value) -> str:
+    return "-" if value is None else f"{value:.4g}"
+
+
+SUMMARY_HEADER = "service | metric | n | mean±std | p50/p95/p99 | peak/off-peak mean | trend per h | anomalies"
+
+
+def summary_row(s: Dict[str, Any]) -> str:
+    anomalies = "; ".join(
+        f"{a['start'][-5:]}-{a['end'][-5:]} x{a['points']} peak {_fmt(a['peak'])}" for a in s["anomalies"]
+    ) or "none"
+    return (
+        f"{s['service_name']} | {s['metric_name']} | {s['n']} | {_fmt(s['mean'])}±{_fmt(s['std'])} | "
+        f"{_fmt(s['p50'])}/{_fmt(s['p95'])}/{_fmt(s['p99'])} | {_fmt(s['peak_mean'])}/{_fmt(s['offpeak_mean'])} | "
+        f"{s['trend_per_hour']:+.4g} | {anomalies}"
+    )
+
+
+def availability_row(s: Dict[str, Any]) -> Optional[str]:
+    if "availability" not in s:
+        return None
+    return f"{s['service_name']} availability {s['availability']:.3f}% (worst point {s['availability_min']:.3f}%)"
+
+
+def format_summary(summary: List[Dict[str, Any]]) -> str:
+    """Render `summarize()` output as a small pipe table, a few tokens per series."""
+    if not summary:
+        return "(no metrics in window)"
+
+    lines = [SUMMARY_HEADER] + [summary_row(s) for s in summary]
+    availability_lines = [line for line in map(availability_row, summary) if line]
+    return "\n".join(lines + availability_lines)
@@ -0,0 +1,531 @@
+import collections
+import json
+import logging
+import struct
+import threading
+import time
+from typing import Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+from src.backend.config import settings
+from src.backend.services import metrics_schema, rollups
+from src.backend.services.sqlite_pool import SQLitePool, DEFAULT_PRAGMAS
+from src.backend.services.telemetry import span
+from src.backend.services.providers import Provider
+
+logger = logging.getLogger(__name__)
+
+# Live metric ingestion. Request handlers only parse payloads and append the
+# points to an in-memory buffer; one writer thread drains it into SQLite in large
+# executemany transactions (WAL, so the read endpoints never wait on it) and folds
+# each batch into the rollup tables with rollups.apply_arrays. When the buffer is
+# full, submit() waits briefly and then refuses the batch: the API answers 429 and
+# clients retry, instead of the server queueing without bound.
+# Accepted points that are still buffered are lost if the process dies.
+
+JSON_TYPE = "application/json"
+NDJSON_TYPE = "application/x-ndjson"
+BINARY_TYPE = "application/x-slo-metrics"
+ARROW_TYPE = "application/vnd.apache.arrow.stream"
+
+# Compact binary payload, little-endian:
+#   b"SLOM", u8 version
+#   u32 name count, then per name: u16 byte length + UTF-8 (service and metric names, one table)
+#   u32 point count, then per point: i64 ts (epoch seconds), u32 service name index, u32 metric name index, f64 value
+BINARY_MAGIC = b"SLOM"
+BINARY_VERSION = 1
+_BINARY_POINT = [("ts", "<i8"), ("service", "<u4"), ("metric", "<u4"), ("value", "<f8")]
+
+
+class IngestFormatError(ValueError):
+    """The payload can't be parsed; maps to a 400."""
+
+
+class UnsupportedPayload(IngestFormatError):
+    """Content type that can't be read here (unknown, or Arrow without pyarrow); maps to a 415."""
+
+
+class IngestBackpressure(RuntimeError):
+    """The buffer stayed full for the whole wait; maps to a 429 with Retry-After."""
+    def __init__(self, buffered: int, capacity: int, retry_after: float):
+        super().__init__(f"Ingest buffer full ({buffered}/{capacity} points), retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class IngestWriteError(RuntimeError):
+    """The transaction holding a waited-for batch failed and its points were dropped; maps to a 500."""
+
+
+class Points:
+    """
+    A parsed batch, in the layout of the columnar /metrics/all response: parallel
+    `ts` (int epoch seconds), `values` (finite floats) and service/metric codes,
+    indexing the `services` / `metrics` name lists. Columns are lists or numpy
+    arrays (the binary parser hands its arrays over without converting them).
+    """
+    __slots__ = ("ts", "values", "service_codes", "metric_codes", "services", "metrics")
+
+    def __init__(self, ts: Sequence[int], values: Sequence[float], service_codes: Sequence[int],
+                 metric_codes: Sequence[int], services: List[str], metrics: List[str]):
+        self.ts = ts
+        self.values = values
+        self.service_codes = service_codes
+        self.metric_codes = metric_codes
+        self.services = services
+        self.metrics = metrics
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def slice(self, start: int, stop: int) -> "Points":
+        """Points [start, stop), with the name lists narrowed to the names that slice uses."""
+        import numpy as np
+        used_services, service_codes = np.unique(np.asarray(self.service_codes[start:stop], dtype=np.int64), return_inverse=True)
+        used_metrics, metric_codes = np.unique(np.asarray(self.metric_codes[start:stop], dtype=np.int64), return_inverse=True)
+        return Points(
+            self.ts[start:stop], self.values[start:stop], service_codes, metric_codes,
+            [self.services[i] for i in used_services.tolist()], [self.metrics[i] for i in used_metrics.tolist()],
+        )
+
+    def rows(self) -> Iterable[Tuple[int, str, str, float]]:
+        """(ts, service_name, metric_name, value) per point."""
+        for t, s, m, v in zip(self.ts, self.service_codes, self.metric_codes, self.values):
+            yield int(t), self.services[s], self.metrics[m], float(v)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[int, str, str, float]]) -> "Points":
+        ts, values, service_codes, metric_codes = [], [], [], []
+        services: Dict[str, int] = {}
+        metrics: Dict[str, int] = {}
+        for t, service, metric, value in rows:
+            ts.append(t)
+            values.append(value)
+            service_codes.append(services.setdefault(service, len(services)))
+            metric_codes.append(metrics.setdefault(metric, len(metrics)))
+        return cls(ts, values, service_codes, metric_codes, list(services), list(metrics))
+
+
+def _timestamp(value) -> int:
+    if isinstance(value, bool):
+        raise IngestFormatError(f"Invalid timestamp: {value!r}")
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        return int(rollups.to_epoch(value))
+    except (TypeError, ValueError):
+        raise IngestFormatError(f"Invalid timestamp: {value!r}")
+
+
+def _validate(points: Points) -> Points:
+    import numpy as np
+    if not np.isfinite(np.asarray(points.values, dtype=np.float64)).all():
+        raise IngestFormatError("Values must be finite numbers")
+    if not all(type(n) is str for n in points.services + points.metrics):
+        raise IngestFormatError("service_name and metric_name must be strings")
+    return points
+
+
+def _from_records(records: Iterable) -> Points:
+    """Points given as [ts, service, metric, value] arrays or {timestamp|ts, service_name, metric_name, value} objects."""
+    ts, values, service_codes, metric_codes = [], [], [], []
+    services: Dict[str, int] = {}
+    metrics: Dict[str, int] = {}
+    try:
+        for record in records:
+            if type(record) is dict:
+                t = record.get("ts", record.get("timestamp"))
+                record = (t, record["service_name"], record["metric_name"], record["value"])
+            t, service, metric, value = record
+            ts.append(t if type(t) is int else _timestamp(t))
+            values.append(float(value))
+            service_codes.append(services.setdefault(service, len(services)))
+            metric_codes.append(metrics.setdefault(metric, len(metrics)))
+    except IngestFormatError:
+        raise
+    except (KeyError, TypeError, ValueError) as e:
+        raise IngestFormatError(f"Invalid point #{len(ts)}: {e!r}")
+    return _validate(Points(ts, values, service_codes, metric_codes, list(services), list(metrics)))
+
+
+def _from_columns(body: dict) -> Points:
+    """Same layout as the columnar /metrics/all response: timestamps, values, service/metric codes and names."""
+    try:
+        services, metrics = list(body["services"]), list(body["metrics"])
+        ts = [t if type(t) is int else _timestamp(t) for t in body["timestamps"]]
+        values = [float(v) for v in body["values"]]
+        service_codes, metric_codes = list(body["service_codes"]), list(body["metric_codes"])
+    except (KeyError, TypeError, ValueError) as e:
+        raise IngestFormatError(f"Invalid columnar payload: {e!r}")
+    if not len(ts) == len(values) == len(service_codes) == len(metric_codes):
+        raise IngestFormatError("Columnar payload arrays differ in length")
+    for codes, names in ((service_codes, services), (metric_codes, metrics)):
+        if not all(type(c) is int and 0 <= c < len(names) for c in codes):
+            raise IngestFormatError("Name codes must be integer indexes into services / metrics")
+    return _validate(Points(ts, values, service_codes, metric_codes, services, metrics))
+
+
+def parse_json(body: bytes) -> Points:
+    """A list of points, {"points": [...]}, or the columnar layout."""
+    try:
+        data = json.loads(body)
+    except ValueError as e:
+        raise IngestFormatError(f"Invalid JSON: {e}")
+    if isinstance(data, dict):
+        if "timestamps" in data:
+            return _from_columns(data)
+        data = data.get("points")
+    if not isinstance(data, list):
+        raise IngestFormatError("Expected a list of points, {\"points\": [...]} or columnar arrays")
+    return _from_records(data)
+
+
+def parse_ndjson(body: bytes) -> Points:
+    def records():
+        for number, line in enumerate(body.splitlines(), start=1):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    raise IngestFormatError(f"Invalid JSON on line {number}: {e}")
+    return _from_records(records())
+
+
+def parse_binary(body: bytes) -> Points:
+    import numpy as np
+    try:
+        if body[:4] != BINARY_MAGIC or body[4] != BINARY_VERSION:
+            raise IngestFormatError(f"Not a version {BINARY_VERSION} SLOM payload")
+        offset = 5
+        (name_count,) = struct.unpack_from("<I", body, offset)
+        offset += 4
+        names = []
+        for _ in range(name_count):
+            (length,) = struct.unpack_from("<H", body, offset)
+            names.append(body[offset + 2:offset + 2 + length].decode("utf-8"))
+            offset += 2 + length
+        (count,) = struct.unpack_from("<I", body, offset)
+        offset += 4
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise IngestFormatError(f"Truncated or invalid binary payload: {e}")
+    dtype = np.dtype(_BINARY_POINT)
+    if len(body) - offset != count * dtype.itemsize:
+        raise IngestFormatError(f"Expected {count} points of {dtype.itemsize} bytes after the name table")
+    records = np.frombuffer(body, dtype=dtype, count=count, offset=offset)
+    if count and max(int(records["service"].max()), int(records["metric"].max())) >= len(names):
+        raise IngestFormatError("Name index out of range")
+    # The name table is shared; split it so only the names used as services get interned as services
+    used_services, service_codes = np.unique(records["service"], return_inverse=True)
+    used_metrics, metric_codes = np.unique(records["metric"], return_inverse=True)
+    return _validate(Points(
+        records["ts"], records["value"], service_codes, metric_codes,
+        [names[i] for i in used_services.tolist()], [names[i] for i in used_metrics.tolist()],
+    ))
+
+
+def encode_binary(points: Points) -> bytes:
+    """Inverse of parse_binary (used by the ingest CLI)."""
+    import numpy as np
+    names = points.services + points.metrics
+    header = [BINARY_MAGIC, bytes([BINARY_VERSION]), struct.pack("<I", len(names))]
+    for name in names:
+        encoded = name.encode("utf-8")
+        header.append(struct.pack("<H", len(encoded)) + encoded)
+    header.append(struct.pack("<I", len(points)))
+    records = np.empty(len(points), dtype=_BINARY_POINT)
+    records["ts"] = points.ts
+    records["service"] = points.service_codes
+    records["metric"] = np.asarray(points.metric_codes, dtype=np.uint32) + len(points.services)
+    records["value"] = points.values
+    return b"".join(header) + records.tobytes()
+
+
+def parse_arrow(body: bytes) -> Points:
+    """Arrow IPC stream with ts|timestamp, service_name, metric_name, value columns. Needs pyarrow."""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise UnsupportedPayload(f"Arrow payloads need pyarrow on the server; send {BINARY_TYPE} instead")
+    try:
+        table = pa.ipc.open_stream(body).read_all()
+        ts = table.column("ts" if "ts" in table.column_names else "timestamp")
+        if pa.types.is_timestamp(ts.type):
+            per_second = {"s": 1, "ms": 10 ** 3, "us": 10 ** 6, "ns": 10 ** 9}[ts.type.unit]
+            ts = ts.cast(pa.int64()).to_numpy() // per_second
+        else:
+            ts = ts.cast(pa.int64()).to_numpy()
+        columns = {}
+        for name in ("service_name", "metric_name"):
+            encoded = table.column(name).combine_chunks().dictionary_encode()
+            columns[name] = (encoded.indices.to_numpy(), encoded.dictionary.to_pylist())
+        values = table.column("value").cast(pa.float64()).to_numpy()
+    except (KeyError, pa.ArrowException) as e:
+        raise IngestFormatError(f"Invalid Arrow payload: {e}")
+    (service_codes, services), (metric_codes, metrics) = columns["service_name"], columns["metric_name"]
+    return _validate(Points(ts, values, service_codes, metric_codes, services, metrics))
+
+
+PARSERS = {
+    JSON_TYPE: parse_json,
+    NDJSON_TYPE: parse_ndjson,
+    "application/jsonl": parse_ndjson,
+    BINARY_TYPE: parse_binary,
+    "application/octet-stream": parse_binary,
+    ARROW_TYPE: parse_arrow,
+}
+
+
+def parse_payload(body: bytes, content_type: str = None) -> Points:
+    parser = PARSERS.get((content_type or JSON_TYPE).split(";")[0].strip().lower())
+    if parser is None:
+        raise UnsupportedPayload(f"Unsupported content type {content_type!r}, use one of {', '.join(PARSERS)}")
+    return parser(body)
+
+
+class MetricsWriter:
+    """
+    Bounded buffer of parsed batches, drained by a single writer thread. A flush
+    starts when `batch_points` are buffered or the oldest point has waited
+    `flush_seconds`, and writes up to `batch_points` in one transaction: raw
+    points in primary key order, then the rollup deltas. Batches grow with the
+    ingest rate, which is what keeps the per-point cost down under load.
+    """
+    def __init__(self, db_path: str, capacity: int, batch_points: int, flush_seconds: float, pragmas: dict = None):
+        self.capacity = capacity
+        self.batch_points = batch_points
+        self.flush_seconds = flush_seconds
+        # A pool of one: connection setup (pragmas, schema check) is the same as SQLiteService's
+        self._pool = SQLitePool(db_path, max_size=1, pragmas=pragmas, on_connect=metrics_schema.ensure_schema)
+        self._buffer: Deque[Points] = collections.deque()
+        self._buffered = 0
+        self._oldest = 0.0
+        self._cond = threading.Condition()
+        self._stopping = False
+        # Points accepted / finished (written, or dropped by a failed write) so far; wait() compares tickets to these
+        self._submitted = 0
+        self._done = 0
+        # (after, through, error) ticket ranges dropped by failed writes, for wait() to report
+        self._failures: Deque[Tuple[int, int, str]] = collections.deque(maxlen=256)
+        # name -> id and id -> name for both name tables, filled as names first show up
+        self._ids: Dict[str, Dict[str, int]] = {"services": {}, "metric_names": {}}
+        self._names: Dict[str, Dict[int, str]] = {"services": {}, "metric_names": {}}
+        # (service_id, metric_id) -> newest stored ts, for the series this writer has seen. Only
+        # points at or below it can be duplicates; valid while no other connection writes points
+        # (checked with PRAGMA data_version before each batch)
+        self._high_water: Dict[Tuple[int, int], int] = {}
+        self._data_version: Optional[int] = None
+        self.written = 0
+        self.batches = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.duplicates = 0
+        self.last_error: Optional[str] = None
+        self.last_batch_seconds = 0.0
+        self.write_seconds = 0.0
+        self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, points: Points, timeout: float = 0.0) -> int:
+        """
+        Queue a batch; returns a ticket for wait(). Waits up to `timeout` seconds for
+        buffer space, then raises IngestBackpressure. A batch larger than the whole
+        buffer is still accepted once the buffer is empty.
+        """
+        n = len(points)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if not n:
+                return self._submitted
+            while self._stopping or (self._buffered and self._buffered + n > self.capacity):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stopping:
+                    self.rejected += n
+                    raise IngestBackpressure(self._buffered, self.capacity, self._drain_estimate())
+                self._cond.wait(remaining)
+            # The writer wakes for the first point (to start the flush timer) and for a full batch
+            wake = not self._buffered or self._buffered + n >= self.batch_points
+            if not self._buffered:
+                self._oldest = time.monotonic()
+            self._buffer.append(points)
+            self._buffered += n
+            self._submitted += n
+            if wake:
+                self._cond.notify_all()
+            return self._submitted
+
+    def wait(self, ticket: int, timeout: float = None) -> bool:
+        """
+        True once the batch behind `ticket` is committed, False on timeout. Raises
+        IngestWriteError if its transaction failed.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._done >= ticket, timeout):
+                return False
+            for after, through, error in self._failures:
+                if after < ticket <= through:
+                    raise IngestWriteError(error)
+            return True
+
+    def flush(self, timeout: float = None) -> bool:
+        """Write everything submitted so far without waiting out the flush interval."""
+        with self._cond:
+            ticket = self._submitted
+            self._oldest = 0.0
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: self._done >= ticket, timeout)
+
+    def close(self):
+        """Write what is buffered, then stop the thread."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._pool.close()
+
+    def ping(self):
+        if not self._thread.is_alive():
+            raise RuntimeError("metrics writer thread is not running")
+
+    def _drain_estimate(self) -> float:
+        # Seconds until the buffered points are written at the recent rate (caller holds the lock)
+        rate = self.written / self.write_seconds if self.write_seconds else 0.0
+        return min(max(self._buffered / rate if rate else 1.0, 0.1), 30.0)
+
+    def _take(self) -> List[Points]:
+        with self._cond:
+            while not (self._buffered >= self.batch_points or self._stopping):
+                if self._buffered:
+                    remaining = self._oldest + self.flush_seconds - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                else:
+                    self._cond.wait()
+            taken = []
+            count = 0
+            while self._buffer and (not taken or count + len(self._buffer[0]) <= self.batch_points):
+                batch = self._buffer.popleft()
+                taken.append(batch)
+                count += len(batch)
+            self._buffered -= count
+            self._oldest = time.monotonic()
+            # Room again for submitters waiting on backpressure
+            self._cond.notify_all()
+            return taken
+
+    def _run(self):
+        with self._pool.connection() as conn:
+            while True:
+                taken = self._take()
+                if not taken:
+                    return  # stopping, and the buffer is drained
+                count = sum(len(b) for b in taken)
+                error = None
+                started = time.perf_counter()
+                try:
+                    with span("metrics.write") as s, conn:
+                        s.set(rows=count, rollup_rows=self._write(conn, taken))
+                    self.written += count
+                    self.batches += 1
+                except Exception as e:
+                    logger.exception("Writing %d metric points failed, dropping them", count)
+                    self.dropped += count
+                    self.last_error = error = f"{type(e).__name__}: {e}"
+                    # Names interned and points written in the rolled back transaction don't exist
+                    for cache in (*self._ids.values(), *self._names.values(), self._high_water):
+                        cache.clear()
+                self.last_batch_seconds = time.perf_counter() - started
+                self.write_seconds += self.last_batch_seconds
+                with self._cond:
+                    if error:
+                        self._failures.append((self._done, self._done + count, error))
+                    self._done += count
+                    self._cond.notify_all()
+
+    def _id_array(self, conn, table: str, names: List[str]):
+        import numpy as np
+        ids = self._ids[table]
+        unseen = [n for n in names if n not in ids]
+        if unseen:
+            interned = metrics_schema.intern_names(conn, table, unseen)
+            ids.update(interned)
+            self._names[table].update((i, n) for n, i in interned.items())
+        return np.array([ids[n] for n in names], dtype=np.int64)
+
+    def _write(self, conn, batches: List[Points]) -> int:
+        import numpy as np
+        sid = np.concatenate([self._id_array(conn, "services", b.services)[np.asarray(b.service_codes, dtype=np.intp)] for b in batches])
+        mid = np.concatenate([self._id_array(conn, "metric_names", b.metrics)[np.asarray(b.metric_codes, dtype=np.intp)] for b in batches])
+        ts = np.concatenate([np.asarray(b.ts, dtype=np.int64) for b in batches])
+        values = np.concatenate([np.asarray(b.values, dtype=np.float64) for b in batches])
+
+        # Primary key order keeps the clustered table's inserts local (the sort is stable, so
+        # points repeated within the batch stay in arrival order)
+        order = np.lexsort((ts, mid, sid))
+        sid, mid, ts, values = sid[order], mid[order], ts[order], values[order]
+
+        # First write wins, like metrics_schema.insert_points: repeats within the batch and points
+        # already stored are dropped before the insert, so the rollups only see new points and an
+        # at-least-once client re-sending a batch changes nothing. Scrapes arrive in time order, so
+        # most series start above their high-water mark and need no range query at all
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._data_version:
+            self._high_water.clear()
+            self._data_version = version
+        high_water = self._high_water
+        new_series = np.r_[True, (sid[1:] != sid[:-1]) | (mid[1:] != mid[:-1])]
+        keep = new_series | np.r_[True, ts[1:] != ts[:-1]]
+        starts = np.flatnonzero(new_series)
+        ends = np.r_[starts[1:], len(ts)]
+        for key, first, last, oldest, newest in zip(zip(sid[starts].tolist(), mid[starts].tolist()), starts.tolist(),
+                                                    ends.tolist(), ts[starts].tolist(), ts[ends - 1].tolist()):
+            if key not in high_water:
+                stored = metrics_schema.latest_timestamp(conn, *key)
+                high_water[key] = oldest - 1 if stored is None else stored
+            if oldest <= high_water[key]:
+                stored = metrics_schema.existing_timestamps(conn, *key, oldest, min(newest, high_water[key]))
+                if stored:
+                    keep[first:last] &= ~np.isin(ts[first:last], stored)
+            high_water[key] = max(high_water[key], newest)
+        if not keep.all():
+            self.duplicates += int(len(keep) - keep.sum())
+            sid, mid, ts, values = sid[keep], mid[keep], ts[keep], values[keep]
+            if not len(ts):
+                return 0
+        conn.executemany(metrics_schema.INSERT_POINT_SQL, zip(sid.tolist(), mid.tolist(), ts.tolist(), values.tolist()))
+
+        # Rollups are keyed by name: number the batch's series (runs of equal sid, mid after the sort)
+        new_series = np.r_[True, (sid[1:] != sid[:-1]) | (mid[1:] != mid[:-1])]
+        starts = np.flatnonzero(new_series)
+        service_names, metric_names = self._names["services"], self._names["metric_names"]
+        series = [(service_names[s], metric_names[m]) for s, m in zip(sid[starts].tolist(), mid[starts].tolist())]
+        return rollups.apply_arrays(conn, series, np.cumsum(new_series) - 1, ts, values)
+
+    def stats(self) -> dict:
+        with self._cond:
+            # Accepted but not committed yet, including the batch being written
+            buffered = self._submitted - self._done
+        return {
+            "buffered": buffered,
+            "capacity": self.capacity,
+            "written": self.written,
+            "batches": self.batches,
+            "rejected": self.rejected,
+            "dropped": self.dropped,
+            "duplicates": self.duplicates,
+            "last_error": self.last_error,
+            "last_batch_seconds": self.last_batch_seconds,
+            "points_per_second": self.written / self.write_seconds if self.write_seconds else 0.0,
+        }
+
+
+def _create_writer() -> MetricsWriter:
+    return MetricsWriter(
+        settings.SQLITE_DB_PATH,
+        capacity=settings.METRICS_INGEST_BUFFER_POINTS,
+        batch_points=settings.METRICS_INGEST_BATCH_POINTS,
+        flush_seconds=settings.METRICS_INGEST_FLUSH_MS / 1000,
+        pragmas={**DEFAULT_PRAGMAS, "cache_size": -settings.SQLITE_CACHE_SIZE_MB * 1024},
+    )
+
+
+metrics_writer_provider = Provider("metrics_writer", _create_writer, close=MetricsWriter.close,
+                                   check=MetricsWriter.ping, required=False)
+metrics_writer = metrics_writer_provider.proxy
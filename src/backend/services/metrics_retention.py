@@ -0,0 +1,315 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+from src.backend.config import settings
+from src.backend.services import metrics_schema, rollups
+from src.backend.services.shared_cache import host_lock
+from src.backend.services.sqlite_pool import SQLitePool, DEFAULT_PRAGMAS
+from src.backend.services.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+# Retention for metrics.db. Raw points and every rollup resolution keep their own
+# window and are deleted from the old end. SQLite has no table partitions, so a
+# partition here is a time range deleted in its own short transaction: raw points
+# a slice of minutes to an hour at a time through the ts index, rollups as one
+# contiguous primary-key range (series, bucket < cutoff) per series. Deleted pages
+# are reused by new points; free pages beyond a slack are handed back to the
+# filesystem with incremental vacuum, so once the windows are full the file (and
+# every scan over it) stops growing.
+
+RAW = "raw"
+TIERS = (RAW, *rollups.RESOLUTIONS)
+
+# Raw slices are between these widths, sized so one transaction deletes about ROWS_PER_TRANSACTION rows
+RAW_PARTITION_SECONDS = 3600
+MIN_PARTITION_SECONDS = 60
+ROWS_PER_TRANSACTION = 100000
+# Rollups are only deleted up to a whole day
+ROLLUP_PARTITION_SECONDS = 86400
+# Free pages handed back per incremental vacuum step (one write transaction each)
+VACUUM_STEP_PAGES = 2048
+# Pause between write transactions. Longer than SQLite's largest busy-handler sleep
+# (100ms), so the ingest writer gets the lock in between instead of timing out
+YIELD_SECONDS = 0.1
+
+AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+
+ENABLE_VACUUM_COMMAND = "python -m src.backend.scripts.metrics_retention --enable-incremental-vacuum"
+
+
+class RetentionBusy(RuntimeError):
+    pass
+
+
+def policies_from_settings() -> Dict[str, int]:
+    """Seconds each tier is kept for, 0 keeps it forever."""
+    return {
+        RAW: settings.METRICS_RETENTION_RAW_HOURS * 3600,
+        "1m": settings.METRICS_RETENTION_1M_DAYS * 86400,
+        "1h": settings.METRICS_RETENTION_1H_DAYS * 86400,
+        "1d": settings.METRICS_RETENTION_1D_DAYS * 86400,
+    }
+
+
+@dataclass
+class RetentionReport:
+    # Epoch seconds per tier: everything older was (or, on a dry run, would be) deleted
+    cutoffs: Dict[str, int] = field(default_factory=dict)
+    deleted: Dict[str, int] = field(default_factory=dict)
+    # Delete transactions committed
+    partitions: int = 0
+    # Raw points are kept while there are no rollups to fall back on (e.g. generate_data.py --no-rollups)
+    skipped: Optional[str] = None
+    auto_vacuum: str = "none"
+    vacuumed_pages: int = 0
+    bytes_before: int = 0
+    bytes_after: int = 0
+    # File bytes given back to the filesystem, plus pages now free for reuse inside the file
+    reclaimed_bytes: int = 0
+    free_bytes: int = 0
+    dry_run: bool = False
+    interrupted: bool = False
+    started_at: float = 0.0
+    seconds: float = 0.0
+
+
+def _pragma(conn, name: str) -> int:
+    return conn.execute(f"PRAGMA {name}").fetchone()[0]
+
+
+def file_sizes(db_path: str) -> Dict[str, int]:
+    def size(path):
+        return os.path.getsize(path) if os.path.exists(path) else 0
+    return {"file_bytes": size(db_path), "wal_bytes": size(db_path + "-wal")}
+
+
+def storage_report(conn, db_path: str, tables: bool = False) -> dict:
+    """On-disk size, free space and the raw time range; `tables` adds bytes per table and index (reads every page)."""
+    page_size = _pragma(conn, "page_size")
+    report = {
+        **file_sizes(db_path),
+        "page_size": page_size,
+        "pages": _pragma(conn, "page_count"),
+        "free_pages": _pragma(conn, "freelist_count"),
+        "auto_vacuum": AUTO_VACUUM_MODES.get(_pragma(conn, "auto_vacuum"), "none"),
+        # Two queries, SQLite only answers a lone MIN or MAX straight from the ts index
+        "oldest_point": conn.execute("SELECT MIN(ts) FROM metric_points").fetchone()[0],
+        "newest_point": conn.execute("SELECT MAX(ts) FROM metric_points").fetchone()[0],
+        "tables": None,
+    }
+    report["free_bytes"] = report["free_pages"] * page_size
+    if tables:
+        try:
+            rows = conn.execute("SELECT name, pgsize FROM dbstat WHERE aggregate = TRUE ORDER BY pgsize DESC").fetchall()
+            report["tables"] = {name: size for name, size in rows}
+        except sqlite3.OperationalError:
+            # SQLite built without SQLITE_ENABLE_DBSTAT_VTAB
+            logger.warning("dbstat is not available, per-table sizes are left out")
+    return report
+
+
+def enable_incremental_vacuum(conn):
+    """Switch an existing file to auto_vacuum=incremental. VACUUM rewrites the whole file once, run it offline."""
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    return AUTO_VACUUM_MODES.get(_pragma(conn, "auto_vacuum"), "none")
+
+
+class RetentionManager:
+    """
+    Applies the per-tier retention windows to metrics.db: `run()` deletes what
+    has expired and gives free space back. A background thread runs it every
+    `interval_seconds` (0 leaves it to POST /metrics/retention and the CLI).
+    One run at a time, per host: the workers of a multi-worker server each have
+    a manager, a lock file next to the database lets only one of them run. A run
+    in progress stops between transactions on `stop()`.
+    """
+    def __init__(self, db_path: str, policies: Dict[str, int], interval_seconds: float,
+                 keep_free_bytes: int = 0, pragmas: Optional[dict] = None):
+        self.db_path = db_path
+        self.policies = dict(policies)
+        self.interval_seconds = interval_seconds
+        self.keep_free_bytes = keep_free_bytes
+        # Own connection: deletes and vacuum steps queue for the write lock behind the ingest writer's batches
+        self._pool = SQLitePool(db_path, max_size=1, pragmas=pragmas, on_connect=metrics_schema.ensure_schema)
+        self._run_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self.last_report: Optional[RetentionReport] = None
+
+    @property
+    def running(self) -> bool:
+        return self._run_lock.locked()
+
+    def storage(self, tables: bool = False) -> dict:
+        with self._pool.connection() as conn:
+            return storage_report(conn, self.db_path, tables=tables)
+
+    def run(self, dry_run: bool = False, now: float = None) -> RetentionReport:
+        if not self._run_lock.acquire(blocking=False):
+            raise RetentionBusy("A retention run is already in progress")
+        try:
+            with host_lock(self.db_path + "-retention.lock"), span("metrics.retention") as s, self._pool.connection() as conn:
+                report = self._run(conn, dry_run, time.time() if now is None else now)
+                s.set(rows=sum(report.deleted.values()), bytes=report.reclaimed_bytes)
+        except BlockingIOError:
+            raise RetentionBusy("A retention run is already in progress in another process")
+        finally:
+            self._run_lock.release()
+        if not dry_run:
+            self.last_report = report
+        return report
+
+    def _run(self, conn, dry_run: bool, now: float) -> RetentionReport:
+        started = time.perf_counter()
+        page_size = _pragma(conn, "page_size")
+        report = RetentionReport(dry_run=dry_run, started_at=now, bytes_before=file_sizes(self.db_path)["file_bytes"],
+                                 auto_vacuum=AUTO_VACUUM_MODES.get(_pragma(conn, "auto_vacuum"), "none"))
+        free_before = _pragma(conn, "freelist_count")
+
+        for tier in TIERS:
+            keep = self.policies.get(tier, 0)
+            if keep <= 0:
+                continue
+            if tier == RAW:
+                cutoff = int(now - keep) // MIN_PARTITION_SECONDS * MIN_PARTITION_SECONDS
+                if not self._has_rollups(conn):
+                    report.skipped = "raw points kept: the rollup tables are empty, rebuild them with migrate_metrics first"
+                    continue
+                deleted = self._count_raw(conn, cutoff) if dry_run else self._delete_raw(conn, cutoff, report)
+            else:
+                cutoff = int(now - keep) // ROLLUP_PARTITION_SECONDS * ROLLUP_PARTITION_SECONDS
+                deleted = self._delete_rollups(conn, tier, cutoff, report, dry_run)
+            report.cutoffs[tier] = cutoff
+            report.deleted[tier] = deleted
+            if self._stopped.is_set():
+                report.interrupted = True
+                break
+
+        if not dry_run:
+            if report.auto_vacuum == "incremental":
+                report.vacuumed_pages = self._vacuum(conn, max(0, self.keep_free_bytes // page_size))
+            # In WAL mode the file is only truncated once the vacuum's pages are checkpointed
+            conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        report.bytes_after = file_sizes(self.db_path)["file_bytes"]
+        free_after = _pragma(conn, "freelist_count")
+        report.free_bytes = free_after * page_size
+        report.reclaimed_bytes = max(0, report.bytes_before - report.bytes_after) + max(0, free_after - free_before) * page_size
+        report.seconds = round(time.perf_counter() - started, 3)
+        return report
+
+    @staticmethod
+    def _has_rollups(conn) -> bool:
+        if conn.execute("SELECT 1 FROM metric_points LIMIT 1").fetchone() is None:
+            return True
+        return conn.execute(f"SELECT 1 FROM {rollups.rollup_table('1m')} LIMIT 1").fetchone() is not None
+
+    @staticmethod
+    def _count_raw(conn, cutoff: int) -> int:
+        return conn.execute("SELECT COUNT(*) FROM metric_points WHERE ts < ?", (cutoff,)).fetchone()[0]
+
+    def _delete_raw(self, conn, cutoff: int, report: RetentionReport) -> int:
+        deleted = 0
+        width = RAW_PARTITION_SECONDS
+        while not self._stopped.is_set():
+            # Restart from the oldest point each time, so gaps in the data cost one index probe
+            oldest = conn.execute("SELECT MIN(ts) FROM metric_points").fetchone()[0]
+            if oldest is None or oldest >= cutoff:
+                break
+            start = oldest // MIN_PARTITION_SECONDS * MIN_PARTITION_SECONDS
+            end = min(start + width, cutoff)
+            with conn:
+                rows = conn.execute("DELETE FROM metric_points WHERE ts >= ? AND ts < ?", (start, end)).rowcount
+            deleted += rows
+            report.partitions += 1
+            # Next slice sized from this one's density
+            width = int(width * ROWS_PER_TRANSACTION / max(rows, 1)) // MIN_PARTITION_SECONDS * MIN_PARTITION_SECONDS
+            width = max(MIN_PARTITION_SECONDS, min(RAW_PARTITION_SECONDS, width))
+            time.sleep(YIELD_SECONDS)
+        return deleted
+
+    def _delete_rollups(self, conn, resolution: str, cutoff: int, report: RetentionReport, dry_run: bool) -> int:
+        table = rollups.rollup_table(resolution)
+        # Every (service, metric) pair that can have rows; the primary key makes each range a seek,
+        # a scan over `bucket` alone would read the whole table
+        series = conn.execute("SELECT s.name, m.name FROM services s CROSS JOIN metric_names m").fetchall()
+        if dry_run:
+            sql = f"SELECT COUNT(*) FROM {table} WHERE service_name = ? AND metric_name = ? AND bucket < ?"
+            return sum(conn.execute(sql, (service, metric, cutoff)).fetchone()[0] for service, metric in series)
+
+        sql = f"DELETE FROM {table} WHERE service_name = ? AND metric_name = ? AND bucket < ?"
+        deleted = pending = 0
+        try:
+            for service, metric in series:
+                pending += conn.execute(sql, (service, metric, cutoff)).rowcount
+                if pending >= ROWS_PER_TRANSACTION:
+                    conn.commit()
+                    deleted += pending
+                    pending = 0
+                    report.partitions += 1
+                    time.sleep(YIELD_SECONDS)
+                    if self._stopped.is_set():
+                        break
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        if pending:
+            report.partitions += 1
+        return deleted + pending
+
+    def _vacuum(self, conn, keep_free_pages: int) -> int:
+        vacuumed = 0
+        while not self._stopped.is_set():
+            excess = _pragma(conn, "freelist_count") - keep_free_pages
+            if excess <= 0:
+                break
+            # executescript: sqlite3's execute() steps this pragma once, which frees a single page
+            conn.executescript(f"PRAGMA incremental_vacuum({min(excess, VACUUM_STEP_PAGES)});")
+            vacuumed += min(excess, VACUUM_STEP_PAGES)
+            time.sleep(YIELD_SECONDS)
+        return vacuumed
+
+    def start(self):
+        if self._thread is not None or self.interval_seconds <= 0:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._loop, name="metrics-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._pool.close()
+
+    def _loop(self):
+        while not self._stopped.wait(timeout=self.interval_seconds):
+            try:
+                report = self.run()
+            except RetentionBusy:
+                continue
+            except Exception as e:
+                logger.warning("Metrics retention run failed: %s", e)
+                continue
+            logger.info("Metrics retention: deleted %s in %.1fs, reclaimed %.1fMB, file %.1fMB",
+                        report.deleted, report.seconds, report.reclaimed_bytes / 1e6, report.bytes_after / 1e6)
+            if report.auto_vacuum != "incremental" and report.reclaimed_bytes:
+                logger.info("Free pages are reused but the file won't shrink, run `%s` once to enable that",
+                            ENABLE_VACUUM_COMMAND)
+
+
+# Nothing is opened until the first run or storage report
+retention_manager = RetentionManager(
+    settings.SQLITE_DB_PATH,
+    policies_from_settings(),
+    interval_seconds=settings.METRICS_RETENTION_INTERVAL_SECONDS,
+    keep_free_bytes=settings.METRICS_VACUUM_KEEP_FREE_MB * 1024 * 1024,
+    pragmas={**DEFAULT_PRAGMAS, "cache_size": -settings.SQLITE_CACHE_SIZE_MB * 1024},
+)
@@ -0,0 +1,241 @@
+from contextlib import contextmanager
+from src.backend.services import rollups
+
+# Bump this and add an entry to MIGRATIONS whenever the metrics schema changes.
+# Version 1 is the original `metrics(timestamp, service_name, metric_name, value)`
+# table created by generate_data.py (stored with user_version = 0).
+SCHEMA_VERSION = 2
+
+LEGACY_VERSION = 1
+
+MIGRATE_COMMAND = "python -m src.backend.scripts.migrate_metrics"
+
+
+TS_INDEX_DDL = "CREATE INDEX IF NOT EXISTS idx_metric_points_ts ON metric_points (ts)"
+
+_V2_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS services (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS metric_names (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE
+    )
+    """,
+    # Clustered on (service_id, metric_id, ts): the primary key is the covering
+    # index for every per-series window query, and ts is integer epoch seconds.
+    """
+    CREATE TABLE IF NOT EXISTS metric_points (
+        service_id INTEGER NOT NULL,
+        metric_id INTEGER NOT NULL,
+        ts INTEGER NOT NULL,
+        value REAL NOT NULL,
+        PRIMARY KEY (service_id, metric_id, ts)
+    ) WITHOUT ROWID
+    """,
+    # Serves "latest N points" without a sort
+    TS_INDEX_DDL,
+    # Read-only view with the old column layout for ad-hoc queries
+    """
+    CREATE VIEW IF NOT EXISTS metrics AS
+        SELECT datetime(p.ts, 'unixepoch', 'localtime') AS timestamp,
+               s.name AS service_name,
+               m.name AS metric_name,
+               p.value AS value
+        FROM metric_points p
+        JOIN services s ON s.id = p.service_id
+        JOIN metric_names m ON m.id = p.metric_id
+    """,
+]
+
+
+def _create_v2(conn):
+    for statement in _V2_STATEMENTS:
+        conn.execute(statement)
+    rollups.ensure_rollup_tables(conn)
+
+
+def _migrate_v1_to_v2(conn):
+    conn.execute("ALTER TABLE metrics RENAME TO metrics_legacy")
+    _create_v2(conn)
+    conn.execute("INSERT OR IGNORE INTO services (name) SELECT DISTINCT service_name FROM metrics_legacy")
+    conn.execute("INSERT OR IGNORE INTO metric_names (name) SELECT DISTINCT metric_name FROM metrics_legacy")
+    # Legacy timestamps are naive local-time strings; the 'utc' modifier converts them
+    # the same way datetime.timestamp() does
+    conn.execute("""
+        INSERT OR REPLACE INTO metric_points (service_id, metric_id, ts, value)
+        SELECT s.id, m.id, CAST(strftime('%s', l.timestamp, 'utc') AS INTEGER), l.value
+        FROM metrics_legacy l
+        JOIN services s ON s.name = l.service_name
+        JOIN metric_names m ON m.name = l.metric_name
+        WHERE l.timestamp IS NOT NULL AND l.value IS NOT NULL
+    """)
+    conn.execute("DROP TABLE metrics_legacy")
+
+
+# from_version -> migration to from_version + 1
+MIGRATIONS = {
+    LEGACY_VERSION: _migrate_v1_to_v2,
+}
+
+
+def get_schema_version(conn) -> int:
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version:
+        return version
+    legacy = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'metrics'"
+    ).fetchone()
+    return LEGACY_VERSION if legacy else 0
+
+
+def _set_version(conn, version: int):
+    conn.execute(f"PRAGMA user_version = {int(version)}")
+
+
+@contextmanager
+def _transaction(conn):
+    # sqlite3 only opens implicit transactions for DML, so DDL steps need an explicit BEGIN
+    # for a failed migration to leave the file untouched
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+def ensure_schema(conn):
+    """Create the current schema on an empty database; refuse to run against an outdated one."""
+    version = get_schema_version(conn)
+    if version == SCHEMA_VERSION:
+        # Bulk loads drop the ts index and build it at the end; an interrupted one leaves it missing
+        conn.execute(TS_INDEX_DDL)
+        return
+    if version == 0:
+        if conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0] == 0:
+            # Lets retention hand deleted pages back to the filesystem (services/metrics_retention.py);
+            # the mode only changes with a VACUUM, which is free on an empty file
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+        with _transaction(conn):
+            _create_v2(conn)
+            _set_version(conn, SCHEMA_VERSION)
+        return
+    raise RuntimeError(
+        f"Metrics database is at schema version {version}, expected {SCHEMA_VERSION}. "
+        f"Run `{MIGRATE_COMMAND}` to upgrade it in place."
+    )
+
+
+def migrate(conn, rebuild_rollups: bool = True):
+    """
+    Upgrade the database in place, one version at a time, each step in its own
+    transaction. Returns (from_version, to_version).
+    """
+    start_version = version = get_schema_version(conn)
+    if version == 0:
+        ensure_schema(conn)
+        return 0, SCHEMA_VERSION
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(f"Metrics database is at schema version {version}, newer than this code ({SCHEMA_VERSION})")
+
+    while version < SCHEMA_VERSION:
+        with _transaction(conn):
+            MIGRATIONS[version](conn)
+            version += 1
+            _set_version(conn, version)
+
+    if rebuild_rollups and start_version < SCHEMA_VERSION:
+        with conn:
+            rollups.rebuild(conn, iter_points(conn))
+    return start_version, version
+
+
+def intern_names(conn, table: str, names) -> dict:
+    """Map names to their interned integer ids in `services` / `metric_names`, adding new ones."""
+    if table not in ("services", "metric_names"):
+        raise ValueError(f"Unknown name table: {table}")
+    names = list(set(names))
+    conn.executemany(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", [(n,) for n in names])
+    ids = {}
+    # Stay under SQLite's bound parameter limit
+    for i in range(0, len(names), 500):
+        chunk = names[i:i + 500]
+        placeholders = ", ".join("?" for _ in chunk)
+        ids.update(conn.execute(f"SELECT name, id FROM {table} WHERE name IN ({placeholders})", chunk))
+    return ids
+
+
+# First write wins: a point whose (service, metric, ts) is already stored is skipped. The rollups
+# are additive, so only points that were actually inserted may be folded into them
+INSERT_POINT_SQL = (
+    "INSERT INTO metric_points (service_id, metric_id, ts, value) VALUES (?, ?, ?, ?) ON CONFLICT DO NOTHING"
+)
+
+
+def existing_timestamps(conn, service_id: int, metric_id: int, first: int, last: int) -> list[int]:
+    """Timestamps already stored for one series between `first` and `last` (a primary key range scan)."""
+    return [row[0] for row in conn.execute(
+        "SELECT ts FROM metric_points WHERE service_id = ? AND metric_id = ? AND ts BETWEEN ? AND ?",
+        (service_id, metric_id, first, last),
+    )]
+
+
+def latest_timestamp(conn, service_id: int, metric_id: int) -> int | None:
+    """Newest stored timestamp of one series, None when it has no points (one primary key seek)."""
+    return conn.execute(
+        "SELECT MAX(ts) FROM metric_points WHERE service_id = ? AND metric_id = ?", (service_id, metric_id)
+    ).fetchone()[0]
+
+
+def insert_points(conn, points) -> list:
+    """
+    Write (ts, service_name, metric_name, value) points and return the ones that
+    were inserted: points already stored, or repeated within `points`, are
+    skipped, so re-sending a batch is a no-op. The caller owns the transaction.
+    """
+    points = list(points)
+    service_ids = intern_names(conn, "services", (p[1] for p in points))
+    metric_ids = intern_names(conn, "metric_names", (p[2] for p in points))
+    by_series = {}
+    for point in points:
+        by_series.setdefault((service_ids[point[1]], metric_ids[point[2]]), []).append((int(rollups.to_epoch(point[0])), point))
+
+    rows, inserted = [], []
+    for (service_id, metric_id), series in by_series.items():
+        timestamps = [ts for ts, _ in series]
+        seen = set(existing_timestamps(conn, service_id, metric_id, min(timestamps), max(timestamps)))
+        for ts, point in series:
+            if ts not in seen:
+                seen.add(ts)
+                rows.append((service_id, metric_id, ts, float(point[3])))
+                inserted.append(point)
+    conn.executemany(INSERT_POINT_SQL, rows)
+    return inserted
+
+
+def iter_points(conn, since: float = None):
+    """Stream raw points as (ts, service_name, metric_name, value)."""
+    query = """
+        SELECT p.ts, s.name, m.name, p.value
+        FROM metric_points p
+        JOIN services s ON s.id = p.service_id
+        JOIN metric_names m ON m.id = p.metric_id
+    """
+    params = []
+    if since is not None:
+        query += " WHERE p.ts >= ?"
+        params.append(int(since))
+    return conn.execute(query, params)
+
+
+def clear_points(conn):
+    conn.execute("DELETE FROM metric_points")
+    for resolution in rollups.RESOLUTIONS:
+        conn.execute(f"DELETE FROM {rollups.rollup_table(resolution)}")
@@ -1,46 +1,144 @@
-from neo4j import GraphDatabase
 from src.backend.config import settings
+from src.backend.services.graph_backend import GraphBackend, UPSTREAM, DOWNSTREAM, check_direction
+from src.backend.services.telemetry import span
 
-class Neo4jService:
+DEPENDENCIES_QUERY = """
+MATCH (s:Service {name: $service_name})-[r:DEPENDS_ON]->(d:Service)
+RETURN d.name as name, d.type as type, d.tier as tier, r.criticality as criticality
+"""
+
+UPSTREAM_DEPENDENCIES_QUERY = """
+MATCH (s:Service)-[r:DEPENDS_ON]->(d:Service {name: $service_name})
+RETURN s.name as name, s.type as type, s.tier as tier, r.criticality as criticality
+"""
+
+SERVICE_DETAILS_QUERY = """
+MATCH (s:Service {name: $service_name})
+RETURN s.name as name, s.type as type, s.tier as tier
+"""
+
+TOPOLOGY_NODES_QUERY = """
+MATCH (s:Service)
+RETURN s.name as name, s.type as type, s.tier as tier
+"""
+
+TOPOLOGY_EDGES_QUERY = """
+MATCH (s:Service)-[r:DEPENDS_ON]->(t:Service)
+RETURN s.name as source, t.name as target, r.criticality as criticality
+"""
+
+# Variable-length patterns can't take the hop limit as a parameter, it is formatted in
+# (always an int). Each service is reported once, at its shortest distance
+TRAVERSAL_QUERIES = {
+    DOWNSTREAM: """
+MATCH p = (s:Service {{name: $service_name}})-[:DEPENDS_ON*1..{max_depth}]->(d:Service)
+WHERE d <> s
+RETURN d.name as name, d.type as type, d.tier as tier, min(length(p)) as depth
+ORDER BY depth, name
+""",
+    UPSTREAM: """
+MATCH p = (d:Service)-[:DEPENDS_ON*1..{max_depth}]->(s:Service {{name: $service_name}})
+WHERE d <> s
+RETURN d.name as name, d.type as type, d.tier as tier, min(length(p)) as depth
+ORDER BY depth, name
+""",
+}
+
+def _traversal_query(direction: str, max_depth: int) -> str:
+    check_direction(direction)
+    return TRAVERSAL_QUERIES[direction].format(max_depth=max(1, int(max_depth)))
+
+class Neo4jService(GraphBackend):
+    """GraphBackend on a Neo4j server (GRAPH_BACKEND=neo4j), every read is a Cypher query over Bolt."""
     def __init__(self):
+        # Imported here: the driver package is a large share of import time and only needed once connected
+        from neo4j import GraphDatabase, AsyncGraphDatabase
         self.driver = GraphDatabase.driver(
             settings.NEO4J_URI, 
             auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD)
         )
+        # Used by the async routers so graph lookups don't block the event loop
+        self.async_driver = AsyncGraphDatabase.driver(
+            settings.NEO4J_URI,
+            auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD)
+        )
 
     def close(self):
         self.driver.close()
 
+    async def aclose(self):
+        self.close()
+        await self.async_driver.close()
+
+    def ping(self):
+        """Raises if Neo4j can't be reached or authentication fails."""
+        self.driver.verify_connectivity()
+
     def get_dependencies(self, service_name: str):
         """Get downstream dependencies (services this service calls)"""
-        query = """
-        MATCH (s:Service {name: $service_name})-[r:DEPENDS_ON]->(d:Service)
-        RETURN d.name as name, d.type as type, d.tier as tier, r.criticality as criticality
-        """
-        with self.driver.session() as session:
-            result = session.run(query, service_name=service_name)
+        with span("neo4j.dependencies") as s, self.driver.session() as session:
+            result = session.run(DEPENDENCIES_QUERY, service_name=service_name)
             dependencies = [record.data() for record in result]
+            s.set(rows=len(dependencies))
         return dependencies
 
     def get_upstream_dependencies(self, service_name: str):
         """Get upstream dependencies (services that call this service)"""
-        query = """
-        MATCH (s:Service)-[r:DEPENDS_ON]->(d:Service {name: $service_name})
-        RETURN s.name as name, s.type as type, s.tier as tier, r.criticality as criticality
-        """
-        with self.driver.session() as session:
-            result = session.run(query, service_name=service_name)
+        with span("neo4j.upstream_dependencies") as s, self.driver.session() as session:
+            result = session.run(UPSTREAM_DEPENDENCIES_QUERY, service_name=service_name)
             dependencies = [record.data() for record in result]
+            s.set(rows=len(dependencies))
         return dependencies
 
     def get_service_details(self, service_name: str):
-        query = """
-        MATCH (s:Service {name: $service_name})
-        RETURN s.name as name, s.type as type, s.tier as tier
-        """
-        with self.driver.session() as session:
-            result = session.run(query, service_name=service_name)
+        with span("neo4j.service_details"), self.driver.session() as session:
+            result = session.run(SERVICE_DETAILS_QUERY, service_name=service_name)
             record = result.single()
             return record.data() if record else None
 
-neo4j_service = Neo4jService()
+    def get_topology(self):
+        """Full Service/DEPENDS_ON graph as (nodes, edges), used to build the TopologyCache snapshot"""
+        with span("neo4j.topology") as s, self.driver.session() as session:
+            nodes = [record.data() for record in session.run(TOPOLOGY_NODES_QUERY)]
+            edges = [record.data() for record in session.run(TOPOLOGY_EDGES_QUERY)]
+            s.set(rows=len(nodes) + len(edges))
+        return nodes, edges
+
+    def traverse(self, service_name: str, direction: str = DOWNSTREAM, max_depth: int = 3):
+        query = _traversal_query(direction, max_depth)
+        with span("neo4j.traverse") as s, self.driver.session() as session:
+            services = [record.data() for record in session.run(query, service_name=service_name)]
+            s.set(rows=len(services))
+        return services
+
+    async def get_dependencies_async(self, service_name: str):
+        with span("neo4j.dependencies") as s:
+            async with self.async_driver.session() as session:
+                result = await session.run(DEPENDENCIES_QUERY, service_name=service_name)
+                dependencies = [record.data() async for record in result]
+            s.set(rows=len(dependencies))
+        return dependencies
+
+    async def get_upstream_dependencies_async(self, service_name: str):
+        with span("neo4j.upstream_dependencies") as s:
+            async with self.async_driver.session() as session:
+                result = await session.run(UPSTREAM_DEPENDENCIES_QUERY, service_name=service_name)
+                dependencies = [record.data() async for record in result]
+            s.set(rows=len(dependencies))
+        return dependencies
+
+    async def get_service_details_async(self, service_name: str):
+        with span("neo4j.service_details"):
+            async with self.async_driver.session() as session:
+                result = await session.run(SERVICE_DETAILS_QUERY, service_name=service_name)
+                record = await result.single()
+                return record.data() if record else None
+
+    async def traverse_async(self, service_name: str, direction: str = DOWNSTREAM, max_depth: int = 3):
+        query = _traversal_query(direction, max_depth)
+        with span("neo4j.traverse") as s:
+            async with self.async_driver.session() as session:
+                result = await session.run(query, service_name=service_name)
+                services = [record.data() async for record in result]
+            s.set(rows=len(services))
+        return services
@@ -0,0 +1,206 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from src.backend.services.metric_stats import SUMMARY_HEADER, summary_row, availability_row
+
+# Prompt sections are fitted to a token budget so prefill time stays flat for
+# highly connected services and long conversations. There is no tokenizer
+# dependency: ~4 characters per token is close enough for Mistral/Llama on
+# English and pipe tables, and the budget only has to be roughly right.
+CHARS_PER_TOKEN = 4
+
+# Share of the budget left after the fixed template text, in allocation order.
+# Whatever a section doesn't use rolls over to the ones after it.
+SECTION_SHARES = (
+    ("dependencies", 0.2),
+    ("dependents", 0.2),
+    ("runbooks", 0.25),
+    ("metrics", 0.35),
+)
+
+# A single runbook never takes more than this many tokens, so one long document can't crowd out the rest
+RUNBOOK_MAX_TOKENS = 200
+
+# Older chat turns are condensed to their first sentence, cut to this many characters
+SUMMARY_TURN_CHARS = 160
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    # Prefer ending on a sentence or word boundary
+    boundary = max(cut.rfind(". "), cut.rfind("\n"))
+    if boundary < max_chars // 2:
+        boundary = cut.rfind(" ")
+    return (cut[:boundary + 1] if boundary > 0 else cut).rstrip() + " …"
+
+
+def _fit_rows(header: Optional[str], rows: List[str], budget: int, noun: str) -> str:
+    """Rows in rank order until the budget is spent, with a note about what was left out."""
+    lines = [header] if header else []
+    used = estimate_tokens(header) if header else 0
+    kept = 0
+    for row in rows:
+        cost = estimate_tokens(row) + 1
+        if used + cost > budget:
+            break
+        lines.append(row)
+        used += cost
+        kept += 1
+    if kept < len(rows):
+        lines.append(f"(+{len(rows) - kept} more {noun} omitted)")
+    return "\n".join(lines) if kept else lines[-1]
+
+
+def dependency_table(services: List[Dict[str, Any]], budget: int) -> str:
+    """Blast radius entries (already ranked by impact) as a pipe table instead of a list of dict reprs."""
+    if not services:
+        return "(none)"
+    rows = [
+        f"{s.get('name')} | {s.get('type') or '-'} | {s.get('tier') or '-'} | {s.get('criticality') or '-'} | "
+        f"{s.get('depth', 1)} | {s.get('impact', 1.0):.2f} | {' > '.join(s.get('via') or []) or '-'}"
+        for s in services
+    ]
+    return _fit_rows("name | type | tier | criticality | depth | impact | via", rows, budget, "services")
+
+
+def rank_runbooks(runbooks: List[str], names: List[str]) -> List[str]:
+    """
+    Runbooks that mention the target (or, next, any related service) first; otherwise
+    the retrieval order, which is nearest-first.
+    """
+    target = names[0].lower() if names else None
+    related = [n.lower() for n in names[1:]]
+
+    def score(item):
+        rank, text = item
+        lowered = text.lower()
+        return (target is None or target not in lowered, not any(n in lowered for n in related), rank)
+
+    return [text for _, text in sorted(enumerate(runbooks), key=score)]
+
+
+def runbook_list(runbooks: List[str], budget: int) -> str:
+    if not runbooks:
+        return "(none)"
+    per_runbook = min(RUNBOOK_MAX_TOKENS, max(budget // len(runbooks), 32))
+    rows = [f"- {_truncate(' '.join(r.split()), per_runbook)}" for r in runbooks]
+    return _fit_rows(None, rows, budget, "runbooks")
+
+
+def metrics_table(summary: List[Dict[str, Any]], service_order: List[str], budget: int) -> str:
+    """
+    Metric summary rows, target service first, then neighbours by impact; within a
+    service, series with anomalies come first. Availability lines stay attached.
+    """
+    if not summary:
+        return "(no metrics in window)"
+    priority = {name: i for i, name in enumerate(service_order)}
+    ordered = sorted(summary, key=lambda s: (priority.get(s["service_name"], len(priority)), not s["anomalies"], s["metric_name"]))
+    rows = []
+    for s in ordered:
+        line = availability_row(s)
+        rows.append(summary_row(s) + (f"\n{line}" if line else ""))
+    return _fit_rows(SUMMARY_HEADER, rows, budget, "series")
+
+
+def fit_sections(template: str, budget: int, service_order: List[str], dependencies: List[Dict[str, Any]],
+                 upstream_dependencies: List[Dict[str, Any]], runbooks: List[str], metrics: List[Dict[str, Any]],
+                 **fixed: str) -> Tuple[str, Dict[str, int]]:
+    """
+    Render `template` ({dependencies}, {dependents}, {runbooks}, {metrics} plus the
+    `fixed` fields) within `budget` tokens. Returns the text and the estimated tokens
+    per section ("instructions" is the template text itself).
+    """
+    skeleton = template.format(dependencies="", dependents="", runbooks="", metrics="", **fixed)
+    report = {"instructions": estimate_tokens(skeleton)}
+    remaining = max(budget - report["instructions"], 0)
+
+    renderers = {
+        "dependencies": lambda b: dependency_table(dependencies, b),
+        "dependents": lambda b: dependency_table(upstream_dependencies or [], b),
+        "runbooks": lambda b: runbook_list(rank_runbooks(runbooks, service_order), b),
+        "metrics": lambda b: metrics_table(metrics, service_order, b),
+    }
+    sections = {}
+    shares_left = sum(share for _, share in SECTION_SHARES)
+    for name, share in SECTION_SHARES:
+        allowance = int(remaining * share / shares_left)
+        sections[name] = renderers[name](allowance)
+        report[name] = estimate_tokens(sections[name])
+        remaining = max(remaining - report[name], 0)
+        shares_left -= share
+
+    text = template.format(**sections, **fixed)
+    report["total"] = estimate_tokens(text)
+    return text, report
+
+
+def _first_sentence(text: str) -> str:
+    text = " ".join(text.split())
+    first = _SENTENCE_END.split(text, maxsplit=1)[0]
+    return first if len(first) <= SUMMARY_TURN_CHARS else first[:SUMMARY_TURN_CHARS].rstrip() + " …"
+
+
+def compress_history(messages: List[Dict[str, str]], budget: int) -> Tuple[Optional[str], List[Dict[str, str]], Dict[str, int]]:
+    """
+    Keep the most recent turns verbatim within `budget` tokens (the latest message
+    always, even if alone it's over budget) and condense everything older into a
+    short extractive summary, one line per turn, oldest lines dropped first.
+    Returns (summary or None, recent messages, token report).
+    """
+    recent = []
+    used = 0
+    for message in reversed(messages):
+        cost = estimate_tokens(message["content"]) + 4  # role markers
+        if recent and used + cost > budget:
+            break
+        recent.append(message)
+        used += cost
+    recent.reverse()
+    older = messages[:len(messages) - len(recent)]
+    report = {"history": used, "history_turns": len(recent)}
+    if not older:
+        return None, recent, report
+
+    summary = _summarize(older, [], max(budget - used, budget // 4))
+    report["history_summary"] = estimate_tokens(summary)
+    report["summarized_turns"] = len(older)
+    return summary, recent, report
+
+
+def fold_history(summary: Optional[str], turns: List[Dict[str, str]], budget: int) -> Tuple[Optional[str], List[Dict[str, str]]]:
+    """
+    Session variant of compress_history. History only changes shape when the
+    verbatim turns go over `budget`: then the oldest are folded into the summary
+    until half the budget is left. Between folds the summary and the earlier turns
+    stay byte-identical, so the prompt prefix the model has cached stays valid.
+    """
+    costs = [estimate_tokens(m["content"]) + 4 for m in turns]
+    if sum(costs) <= budget:
+        return summary, turns
+
+    keep = 0
+    kept = 0
+    for cost in reversed(costs):
+        if keep and kept + cost > budget // 2:
+            break
+        keep += 1
+        kept += cost
+    previous = summary.split("\n")[1:] if summary else []
+    return _summarize(turns[:len(turns) - keep], previous, budget // 4), turns[len(turns) - keep:]
+
+
+def _summarize(messages: List[Dict[str, str]], previous: List[str], budget: int) -> str:
+    # One line per turn, oldest lines dropped first
+    lines = previous + [f"{m['role']}: {_first_sentence(m['content'])}" for m in messages]
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > budget:
+        lines.pop(0)
+    return "Earlier in this conversation (condensed):\n" + "\n".join(lines)
@@ -0,0 +1,152 @@
+import inspect
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Generic, List, Optional, TypeVar
+from src.backend.services.telemetry import span
+
+# Lazily constructed service singletons. Importing a service module no longer
+# opens drivers, clients or databases (or imports their client libraries): the
+# instance is built on first use, by a request or by the background warm-up in
+# main.py's lifespan. A backend that is down therefore fails the requests that
+# need it, with a 503, instead of the import of the whole app.
+
+T = TypeVar("T")
+
+# Registration order; shutdown runs in reverse
+PROVIDERS: Dict[str, "Provider"] = {}
+
+# Instances a forked child inherited from its parent, see _after_fork_in_child
+_INHERITED: List[Any] = []
+
+
+class DependencyUnavailable(RuntimeError):
+    def __init__(self, name: str, error: str):
+        super().__init__(f"{name} unavailable: {error}")
+        self.name = name
+        self.error = error
+
+
+class Provider(Generic[T]):
+    """
+    Builds one service instance on first `get()`, thread-safe. A failed build is
+    retried on the next call. `check` is the readiness probe (it should raise
+    when the backend can't serve); `close` may be a coroutine function. A provider
+    is also a FastAPI dependency: `Depends(rag_provider)`.
+    """
+    def __init__(self, name: str, factory: Callable[[], T], close: Callable[[T], Any] = None,
+                 check: Callable[[T], Any] = None, required: bool = True):
+        self.name = name
+        self.required = required
+        self._factory = factory
+        self._close = close
+        self._check = check
+        self._instance: Optional[T] = None
+        self._lock = threading.Lock()
+        self.init_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        PROVIDERS[name] = self
+
+    @property
+    def initialized(self) -> bool:
+        return self._instance is not None
+
+    def get(self) -> T:
+        instance = self._instance
+        if instance is not None:
+            return instance
+        with self._lock:
+            if self._instance is None:
+                started = time.perf_counter()
+                try:
+                    with span(f"startup.{self.name}"):
+                        self._instance = self._factory()
+                except Exception as e:
+                    self.error = f"{type(e).__name__}: {e}"
+                    raise DependencyUnavailable(self.name, self.error) from e
+                self.init_seconds = time.perf_counter() - started
+                self.error = None
+            return self._instance
+
+    def __call__(self) -> T:
+        return self.get()
+
+    def override(self, instance: T):
+        """Use `instance` instead of building one (benchmarks, tests)."""
+        with self._lock:
+            self._instance = instance
+
+    @property
+    def proxy(self) -> "LazyProxy":
+        return LazyProxy(self)
+
+    def check(self):
+        """Readiness probe: builds the instance if needed, then runs `check`. Raises if not ready."""
+        instance = self.get()
+        if self._check is not None:
+            self._check(instance)
+
+    async def shutdown(self):
+        """Close the instance if one was built; never builds one just to close it."""
+        with self._lock:
+            instance, self._instance = self._instance, None
+        if instance is not None and self._close is not None:
+            result = self._close(instance)
+            if inspect.isawaitable(result):
+                await result
+
+    def status(self) -> dict:
+        return {
+            "initialized": self.initialized,
+            "required": self.required,
+            "init_seconds": self.init_seconds,
+            "error": self.error,
+        }
+
+
+class LazyProxy:
+    """
+    Module-level stand-in for a provider's instance, so existing call sites
+    (`rag_service.query_runbooks(...)`) keep working: attribute reads and writes
+    go to the instance, which is built on first access.
+    """
+    __slots__ = ("_provider",)
+
+    def __init__(self, provider: Provider):
+        object.__setattr__(self, "_provider", provider)
+
+    def __getattr__(self, name: str):
+        return getattr(self._provider.get(), name)
+
+    def __setattr__(self, name: str, value):
+        setattr(self._provider.get(), name, value)
+
+    def __repr__(self) -> str:
+        state = "initialized" if self._provider.initialized else "not initialized"
+        return f"<lazy {self._provider.name} ({state})>"
+
+
+async def shutdown_all():
+    for provider in reversed(list(PROVIDERS.values())):
+        await provider.shutdown()
+
+
+def _after_fork_in_child():
+    """
+    A forked worker (gunicorn --preload, multiprocessing) inherits whatever the
+    parent had built: driver sockets, open SQLite files, the Chroma client and
+    its threads. None of these may be used from two processes, so the child
+    forgets them and builds its own on first use. They are kept referenced
+    rather than closed, closing would tear down state the parent still uses.
+    """
+    for provider in PROVIDERS.values():
+        # The parent may have held the lock while forking
+        provider._lock = threading.Lock()
+        if provider._instance is not None:
+            _INHERITED.append(provider._instance)
+            provider._instance = None
+            provider.init_seconds = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
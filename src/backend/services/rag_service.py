@@ -1,23 +1,377 @@
-import chromadb
+import asyncio
+import itertools
+import json
+import threading
+import time
 from src.backend.config import settings
+from src.backend.services.runbook_cache import RunbookCache
+from src.backend.services import hybrid_search, runbook_ingest
+from src.backend.services.telemetry import span
+from src.backend.services.providers import Provider
+from src.backend.services.shared_cache import shared_cache
+
+RESULT_FIELDS = ("ids", "documents", "metadatas", "distances")
+
+# Page size when reading all metadata to build the service -> ids index
+INDEX_PAGE_SIZE = 5000
+
+
+def runbook_query(service_name: str) -> str:
+    """Runbook retrieval query for a service; the routers, batch jobs and cache warm-up must agree on it."""
+    return f"{service_name} latency error failure"
+
+
+def search_scope(service_name: str, dependencies: list[dict], upstream_dependencies: list[dict]) -> list[str]:
+    """Services whose runbooks are searched: the target, then its highest-impact graph neighbours."""
+    neighbours = sorted(dependencies + upstream_dependencies, key=lambda d: -d.get("impact", 0.0))
+    scope = [service_name]
+    for n in neighbours:
+        if len(scope) > settings.HYBRID_MAX_NEIGHBOURS:
+            break
+        if n["name"] not in scope:
+            scope.append(n["name"])
+    return scope
+
+
+def metadata_filter(services: list[str] = None, types: list[str] = None):
+    """Chroma `where` clause on the runbook `service` / `type` metadata, or None for no filter."""
+    clauses = []
+    if services:
+        clauses.append({"service": {"$in": list(services)}})
+    if types:
+        clauses.append({"type": {"$in": list(types)}})
+    return clauses[0] if len(clauses) == 1 else ({"$and": clauses} if clauses else None)
+
 
 class RAGService:
     def __init__(self):
+        # chromadb (and through it onnxruntime) is imported on first use, not with the app
+        import chromadb
         self.client = chromadb.PersistentClient(path=settings.CHROMADB_PATH)
         # Assumes collection 'runbooks' is already created by generate_data.py
         try:
             self.collection = self.client.get_collection("runbooks")
         except:
             self.collection = None # Handle case where collection doesn't exist yet
+        self.cache = RunbookCache(settings.RUNBOOK_CACHE_MAX_ENTRIES, shared=shared_cache, ttl_seconds=settings.SHARED_CACHE_TTL_SECONDS)
+        self._version_lock = threading.Lock()
+        self._count = None
+        self._checked_at = 0.0
+        # service -> [(id, type)] for the current collection version, built in the background
+        self._index = None
+        self._index_building = False
+
+    def collection_version(self) -> int:
+        """
+        Version the cached results are keyed on. invalidate() bumps it for writes made
+        in this process; adds and deletes made elsewhere (generate_data.py, another
+        worker) show up as a change in the document count or in the ingest counter
+        runbook_ingest writes to the collection metadata, checked at most every
+        RUNBOOK_CACHE_CHECK_SECONDS. The same pair is the scope results are shared
+        between workers under.
+        """
+        now = time.monotonic()
+        if now - self._checked_at >= settings.RUNBOOK_CACHE_CHECK_SECONDS:
+            # The collection object caches its metadata, re-read it
+            metadata = self.client.get_collection(self.collection.name).metadata or {}
+            count = (self.collection.count(), metadata.get(runbook_ingest.VERSION_KEY))
+            with self._version_lock:
+                self._checked_at = now
+                if count != self._count:
+                    version = self.cache.version if self._count is None else self.cache.version + 1
+                    self.cache.set_version(version, scope=f"{self.collection.name}:{count[0]}:{count[1]}")
+                    self._count = count
+        return self.cache.version
+
+    def ping(self):
+        if self.collection is None:
+            raise RuntimeError("collection 'runbooks' does not exist, run generate_data.py or ingest_runbooks.py")
+        self.collection.count()
+
+    def invalidate(self):
+        """Call after adding, updating or deleting runbooks in this process."""
+        with self._version_lock:
+            self._checked_at = 0.0
+            self.cache.set_version(self.cache.version + 1)
+        # Other workers' copies of the results too
+        self.cache.clear()
+
+    def ingest(self, root: str, prune: bool = True, dry_run: bool = False) -> runbook_ingest.IngestReport:
+        """Incrementally sync the runbook files under `root` into the collection (see runbook_ingest)."""
+        if self.collection is None:
+            self.collection = self.client.get_or_create_collection("runbooks")
+        with span("rag.ingest") as s:
+            report = runbook_ingest.ingest_directory(
+                self.collection, root,
+                chunk_chars=settings.RUNBOOK_CHUNK_CHARS,
+                batch_size=settings.RUNBOOK_EMBED_BATCH,
+                workers=settings.RUNBOOK_INGEST_WORKERS,
+                prune=prune,
+                dry_run=dry_run,
+                page_size=INDEX_PAGE_SIZE,
+            )
+            s.set(rows=report.added + report.updated + report.deleted)
+        if report.changed and not dry_run:
+            self.invalidate()
+        return report
+
+    def _embed_queries(self, query_texts: list[str]):
+        embeddings = self.cache.get_embeddings(query_texts)
+        missing = [t for t in dict.fromkeys(query_texts) if t not in embeddings]
+        if missing:
+            with span("rag.embed") as s:
+                # The embedding function Chroma itself resolves for query_texts (collection or persisted config)
+                computed = dict(zip(missing, self.collection._embed(input=missing, is_query=True)))
+                s.set(rows=len(missing))
+            self.cache.set_embeddings(computed)
+            embeddings.update(computed)
+        return [embeddings[t] for t in query_texts]
+
+    def _retrieve(self, query_texts: list[str], n_results: int, where: dict = None, batch_size: int = 64) -> list[dict]:
+        """Top-k per query as {ids, documents, metadatas, distances}; only cache misses are embedded and searched."""
+        version = self.collection_version()
+        where_key = json.dumps(where, sort_keys=True) if where else None
+        keys = [(text, n_results, where_key) for text in query_texts]
+        hits = [self.cache.get_result(key) for key in keys]
+        missing = [i for i, hit in enumerate(hits) if hit is None]
+
+        for start in range(0, len(missing), batch_size):
+            chunk = missing[start:start + batch_size]
+            embeddings = self._embed_queries([query_texts[i] for i in chunk])
+            with span("rag.search") as s:
+                results = self.collection.query(query_embeddings=embeddings, n_results=n_results, where=where)
+                s.set(rows=len(chunk))
+            for j, i in enumerate(chunk):
+                hits[i] = {field: results[field][j] if results.get(field) else [] for field in RESULT_FIELDS}
+                self.cache.set_result(keys[i], hits[i], version)
+        return hits
 
     def query_runbooks(self, query_text: str, n_results: int = 3):
         if not self.collection:
              return []
         
-        results = self.collection.query(
-            query_texts=[query_text],
-            n_results=n_results
-        )
-        return results
+        with span("rag.query") as s:
+            hit = self._retrieve([query_text], n_results)[0]
+            s.set(rows=len(hit['documents']), bytes=sum(len(d) for d in hit['documents']))
+        # Same shape as collection.query() for a single query
+        return {field: [values] for field, values in hit.items()}
+
+    async def query_runbooks_async(self, query_text: str, n_results: int = 3):
+        # Chroma (embedding + ANN search) is blocking, run it in the default thread pool
+        return await asyncio.to_thread(self.query_runbooks, query_text, n_results)
+
+    def query_runbooks_batch(self, query_texts: list[str], n_results: int = 3, batch_size: int = 64) -> list[list[str]]:
+        """One embedding + ANN call per `batch_size` uncached queries instead of one per query. Returns documents per query."""
+        if not self.collection:
+            return [[] for _ in query_texts]
+
+        with span("rag.query_batch") as s:
+            documents = [hit['documents'] for hit in self._retrieve(query_texts, n_results, batch_size=batch_size)]
+            s.set(rows=sum(len(docs) for docs in documents), bytes=sum(len(d) for docs in documents for d in docs))
+        return documents
+
+    async def query_runbooks_batch_async(self, query_texts: list[str], n_results: int = 3):
+        return await asyncio.to_thread(self.query_runbooks_batch, query_texts, n_results)
+
+    def hybrid_search(self, query_text: str, services: list[str] = None, types: list[str] = None, n_results: int = 3) -> list[dict]:
+        """
+        Runbooks for `services` (target first, then graph neighbours in impact order)
+        and failure `types`, ranked by reciprocal-rank fusion of vector distance, BM25
+        and graph proximity. If the filter matches nothing, `types` is dropped first,
+        then the filter altogether. Returns [{id, text, metadata, score}], best first.
+        """
+        if not self.collection:
+            return []
+
+        version = self.collection_version()
+        where = metadata_filter(services, types)
+        key = ("hybrid", query_text, n_results, json.dumps(where, sort_keys=True))
+        cached = self.cache.get_result(key)
+        if cached is not None:
+            return cached
+
+        with span("rag.hybrid") as s:
+            embedding = self._embed_queries([query_text])[0]
+            attempts = [(services, types)] if services or types else []
+            if services and types:
+                attempts.append((services, None))
+            hits = []
+            for services_filter, types_filter in attempts:
+                hits = self._fused_hits(query_text, embedding, services_filter, types_filter, n_results)
+                if hits:
+                    break
+            if not hits:
+                # No filter, or nothing matched it: plain semantic search over the collection
+                hits = self._vector_hits(embedding, n_results)
+            s.set(rows=len(hits), bytes=sum(len(h["text"]) for h in hits))
+        self.cache.set_result(key, hits, version)
+        return hits
+
+    async def hybrid_search_async(self, query_text: str, services: list[str] = None, types: list[str] = None, n_results: int = 3) -> list[dict]:
+        return await asyncio.to_thread(self.hybrid_search, query_text, services, types, n_results)
+
+    def hybrid_search_batch(self, searches: list[tuple], n_results: int = 3, batch_size: int = 64) -> list[list[dict]]:
+        """
+        hybrid_search for each (query_text, services, types) in `searches`. The uncached
+        query embeddings are computed `batch_size` at a time up front; each search then
+        runs (and is cached) exactly as a single hybrid_search call would be.
+        """
+        if not self.collection:
+            return [[] for _ in searches]
+
+        texts = list(dict.fromkeys(query_text for query_text, _, _ in searches))
+        for start in range(0, len(texts), batch_size):
+            self._embed_queries(texts[start:start + batch_size])
+        return [self.hybrid_search(query_text, services, types, n_results) for query_text, services, types in searches]
+
+    async def hybrid_search_batch_async(self, searches: list[tuple], n_results: int = 3) -> list[list[dict]]:
+        return await asyncio.to_thread(self.hybrid_search_batch, searches, n_results)
+
+    def _vector_hits(self, embedding, n_results: int) -> list[dict]:
+        results = self.collection.query(query_embeddings=[embedding], n_results=n_results)
+        return [
+            {"id": doc_id, "text": text, "metadata": metadata or {}, "score": None}
+            for doc_id, text, metadata in zip(results["ids"][0], results["documents"][0], results["metadatas"][0])
+        ]
+
+    def _build_index(self, version: int):
+        index = {}
+        try:
+            for start in itertools.count(0, INDEX_PAGE_SIZE):
+                page = self.collection.get(include=["metadatas"], limit=INDEX_PAGE_SIZE, offset=start)
+                for doc_id, metadata in zip(page["ids"], page["metadatas"]):
+                    metadata = metadata or {}
+                    index.setdefault(metadata.get("service"), []).append((doc_id, metadata.get("type")))
+                if len(page["ids"]) < INDEX_PAGE_SIZE:
+                    break
+            self._index = (version, index)
+        finally:
+            self._index_building = False
+
+    def _candidate_ids(self, services: list[str], types: list[str]):
+        """
+        Ids matching the service/type filter from the in-memory metadata index. A
+        `where` on metadata scans Chroma's metadata table on every query, fetching by
+        id doesn't. None while the index for this collection version isn't built yet.
+        """
+        index = self._index
+        if index is None or index[0] != self.cache.version:
+            with self._version_lock:
+                if not self._index_building:
+                    self._index_building = True
+                    threading.Thread(target=self._build_index, args=(self.cache.version,), name="runbook-index", daemon=True).start()
+            return None
+        wanted = set(types) if types else None
+        return [doc_id for service in services for doc_id, rb_type in index[1].get(service, ()) if wanted is None or rb_type in wanted]
+
+    def _fused_hits(self, query_text: str, embedding, services: list[str], types: list[str], n_results: int) -> list[dict]:
+        where = metadata_filter(services, types)
+        include = ["documents", "metadatas", "embeddings"]
+        candidate_ids = self._candidate_ids(services, types) if services else None
+        if candidate_ids is not None and len(candidate_ids) <= settings.HYBRID_POOL_LIMIT:
+            if not candidate_ids:
+                return []
+            pool = self.collection.get(ids=candidate_ids, include=include)
+            complete = True
+        else:
+            pool = self.collection.get(where=where, limit=settings.HYBRID_POOL_LIMIT, include=include)
+            complete = len(pool["ids"]) < settings.HYBRID_POOL_LIMIT
+        ids = pool["ids"]
+        if not ids:
+            return []
+        documents = [d or "" for d in pool["documents"]]
+        metadatas = [m or {} for m in pool["metadatas"]]
+
+        if complete:
+            # The whole filtered pool is in hand: exact distances, no ANN call
+            space = (self.collection.configuration.get("hnsw") or {}).get("space", "l2")
+            distances = hybrid_search.vector_distances(embedding, pool["embeddings"], space)
+            vector_rank = hybrid_search.ranks(ids, distances, higher_is_better=False)
+        else:
+            # Pool was cut at the limit; let the index find the nearest ones among all matches
+            results = self.collection.query(
+                query_embeddings=[embedding], n_results=settings.HYBRID_CANDIDATES, where=where, include=[]
+            )
+            vector_rank = {doc_id: rank for rank, doc_id in enumerate(results["ids"][0], start=1)}
+
+        keyword_rank = hybrid_search.ranks(ids, hybrid_search.bm25_scores(query_text, documents), min_score=0.0)
+        rankings = [vector_rank, keyword_rank]
+        if services:
+            # Graph proximity: the target's own runbooks, then neighbours in the order given
+            position = {name: i for i, name in enumerate(services)}
+            rankings.append({doc_id: position.get(m.get("service"), len(services)) + 1 for doc_id, m in zip(ids, metadatas)})
+
+        fused = hybrid_search.reciprocal_rank_fusion(rankings)
+        index = {doc_id: i for i, doc_id in enumerate(ids)}
+        best = sorted(fused, key=lambda doc_id: (-fused[doc_id], index[doc_id]))[:n_results]
+        return [
+            {"id": doc_id, "text": documents[index[doc_id]], "metadata": metadatas[index[doc_id]], "score": fused[doc_id]}
+            for doc_id in best
+        ]
+
+    def warm_cache(self, service_names: list[str], scopes: dict = None, n_results: int = 3) -> int:
+        """
+        Precompute query embeddings and top-k results for these services, e.g. at startup
+        or after an ingest. With `scopes` (service -> search_scope()) the hybrid results
+        the routers ask for are computed as well.
+        """
+        if not self.collection or not service_names:
+            return 0
+        with span("rag.warm") as s:
+            version = self.collection_version()
+            if self._index is None or self._index[0] != version:
+                self._build_index(version)
+            # One batched embedding call for all services; the hybrid searches below reuse the embeddings
+            self.query_runbooks_batch([runbook_query(name) for name in service_names], n_results)
+            for name in service_names:
+                if scopes and name in scopes:
+                    self.hybrid_search(runbook_query(name), scopes[name], n_results=n_results)
+            s.set(rows=len(service_names))
+        return len(service_names)
+
+    def list_documents(self, limit: int = 100, cursor: str = None, where: dict = None, include_text: bool = True):
+        """
+        Keyset page over the collection. Every chunk carries an integer `seq` metadata
+        field assigned once on first insert (never changed on update), so Chroma's
+        storage order is `seq` order and "seq > cursor" resumes exactly where the last
+        page ended. Collections ingested without `seq` fall back to offset cursors.
+        """
+        if not self.collection:
+            return [], None
+
+        with span("rag.list") as s:
+            documents, next_cursor = self._list_page(limit, cursor, where, include_text)
+            s.set(rows=len(documents), bytes=sum(len(d["text"] or "") for d in documents))
+        return documents, next_cursor
+
+    def _list_page(self, limit, cursor, where, include_text):
+        include = ["metadatas"] + (["documents"] if include_text else [])
+        if cursor and cursor.startswith("o"):
+            offset = int(cursor[1:])
+            data = self.collection.get(where=where, limit=limit + 1, offset=offset, include=include)
+            next_cursor = f"o{offset + limit}" if len(data["ids"]) > limit else None
+        else:
+            clauses = [where] if where else []
+            if cursor:
+                clauses.append({"seq": {"$gt": int(cursor[1:])}})
+            data = self.collection.get(
+                where=clauses[0] if len(clauses) == 1 else ({"$and": clauses} if clauses else None),
+                limit=limit + 1,
+                include=include
+            )
+            next_cursor = None
+            if len(data["ids"]) > limit:
+                last = data["metadatas"][limit - 1] or {}
+                next_cursor = f"s{last['seq']}" if "seq" in last else (None if cursor else f"o{limit}")
+
+        documents = []
+        for i, doc_id in enumerate(data["ids"][:limit]):
+            documents.append({
+                "id": doc_id,
+                "text": data["documents"][i] if include_text and data["documents"] else None,
+                "metadata": data["metadatas"][i] or {},
+            })
+        return documents, next_cursor
 
-rag_service = RAGService()
+rag_provider = Provider("chroma", RAGService, check=RAGService.ping)
+rag_service = rag_provider.proxy
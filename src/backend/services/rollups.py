@@ -0,0 +1,365 @@
+import json
+import math
+import time
+from datetime import datetime
+from src.backend.services.sqlite_pool import in_placeholders
+
+# Rollup resolutions (name -> bucket width in seconds), finest first
+RESOLUTIONS = {"1m": 60, "1h": 3600, "1d": 86400}
+
+# A window is answered by the coarsest resolution that still gives at least
+# this many buckets per series (24h -> 1h buckets, 3h -> 1m buckets)
+MIN_POINTS = 12
+
+SKETCH_RELATIVE_ACCURACY = 0.01
+
+
+def rollup_table(resolution: str) -> str:
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Unknown rollup resolution: {resolution}")
+    return f"metrics_rollup_{resolution}"
+
+
+class QuantileSketch:
+    """
+    Log-bucketed quantile sketch (DDSketch style). Every value lands in a bucket
+    whose bounds are within SKETCH_RELATIVE_ACCURACY of each other, so quantiles
+    come back with bounded relative error and two sketches merge by adding counts.
+    """
+    _gamma = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+    _log_gamma = math.log(_gamma)
+    # Values at or below this are counted in the zero bucket (error rates are mostly 0)
+    _min_value = 1e-9
+
+    def __init__(self, buckets: dict = None, zero_count: int = 0):
+        self.buckets = buckets or {}
+        self.zero_count = zero_count
+
+    @property
+    def count(self) -> int:
+        return self.zero_count + sum(self.buckets.values())
+
+    def add(self, value: float, count: int = 1):
+        if value <= self._min_value:
+            self.zero_count += count
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + count
+
+    def merge(self, other: "QuantileSketch"):
+        self.zero_count += other.zero_count
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+
+    def quantile(self, q: float):
+        total = self.count
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                # Midpoint (in relative terms) of the bucket (gamma^(k-1), gamma^k]
+                return 2 * self._gamma ** key / (self._gamma + 1)
+        return 2 * self._gamma ** max(self.buckets) / (self._gamma + 1)
+
+    def to_json(self) -> str:
+        return json.dumps({"z": self.zero_count, "b": self.buckets}, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, data: str) -> "QuantileSketch":
+        raw = json.loads(data)
+        return cls({int(k): v for k, v in raw["b"].items()}, raw["z"])
+
+
+def sketch_arrays(sketches: list[str]):
+    """
+    Read many sketches at once as numpy arrays: (zero count per sketch, bucket
+    entries per sketch, flat bucket keys, flat bucket counts), entries in each
+    sketch's stored order. Relies on the compact JSON every writer here produces
+    (to_json, sketch_merge, apply_arrays), which reduces to one comma-separated
+    number stream: z, then key, count per bucket. Parsing that in C is several
+    times faster than json.loads per sketch.
+    """
+    import numpy as np
+    if not sketches:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, np.zeros(0)
+    # Two colons belong to "z" and "b", every other one to a bucket entry
+    entries = np.array([s.count(":") - 2 for s in sketches], dtype=np.int64)
+    text = (",".join(sketches).replace('{"z":', "").replace(',"b":{}}', "").replace(',"b":{', ",")
+            .replace("}}", "").replace('":', ",").replace('"', ""))
+    numbers = np.fromstring(text, dtype=np.float64, sep=",")
+    starts = np.r_[0, np.cumsum(1 + 2 * entries)[:-1]]
+    is_zero = np.zeros(len(numbers), dtype=bool)
+    is_zero[starts] = True
+    pairs = numbers[~is_zero].reshape(-1, 2)
+    return numbers[starts].astype(np.int64), entries, pairs[:, 0].astype(np.int64), pairs[:, 1]
+
+
+# Reused by _merge_sketch_json: json.loads/dumps build a decoder/encoder on every call
+_decode_sketch = json.JSONDecoder().raw_decode
+_encode_sketch = json.JSONEncoder(separators=(",", ":")).encode
+
+
+def _merge_sketch_json(existing: str, incoming: str) -> str:
+    # Registered as a SQL function so upserts can merge sketches in place
+    # Called once per touched bucket per batch, so it works on the JSON form directly:
+    # bucket keys stay strings instead of round-tripping through int
+    if existing is None:
+        return incoming
+    merged, other = _decode_sketch(existing)[0], _decode_sketch(incoming)[0]
+    buckets = merged["b"]
+    get = buckets.get
+    buckets.update({key: get(key, 0) + count for key, count in other["b"].items()})
+    merged["z"] += other["z"]
+    return _encode_sketch(merged)
+
+
+def ensure_rollup_tables(conn):
+    for resolution in RESOLUTIONS:
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {rollup_table(resolution)} (
+                service_name TEXT NOT NULL,
+                metric_name TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                sum REAL NOT NULL,
+                sum_sq REAL NOT NULL,
+                min REAL NOT NULL,
+                max REAL NOT NULL,
+                sketch TEXT NOT NULL,
+                PRIMARY KEY (service_name, metric_name, bucket)
+            ) WITHOUT ROWID
+        """)
+
+
+def to_epoch(ts) -> float:
+    """Accepts epoch seconds, datetimes, or the datetime strings sqlite3 stores for them."""
+    if isinstance(ts, (int, float)):
+        return float(ts)
+    if isinstance(ts, datetime):
+        return ts.timestamp()
+    return datetime.fromisoformat(str(ts)).timestamp()
+
+
+class _Partial:
+    __slots__ = ("count", "sum", "sum_sq", "min", "max", "sketch")
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.sum_sq = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sketch = QuantileSketch()
+
+    def add(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.sum_sq += value * value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.sketch.add(value)
+
+    def merge(self, other: "_Partial"):
+        self.count += other.count
+        self.sum += other.sum
+        self.sum_sq += other.sum_sq
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+
+
+# Upsert of one rollup row; merging into an existing bucket keeps it exact for count/sum/min/max
+_UPSERT_SQL = """
+    INSERT INTO {table}
+        (service_name, metric_name, bucket, count, sum, sum_sq, min, max, sketch)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (service_name, metric_name, bucket) DO UPDATE SET
+        count = count + excluded.count,
+        sum = sum + excluded.sum,
+        sum_sq = sum_sq + excluded.sum_sq,
+        min = MIN(min, excluded.min),
+        max = MAX(max, excluded.max),
+        sketch = sketch_merge(sketch, excluded.sketch)
+"""
+
+
+def apply_points(conn, points):
+    """
+    Incrementally fold raw points (ts, service_name, metric_name, value) into every
+    rollup table. Points are pre-aggregated to 1m buckets in memory, the coarser
+    resolutions are built from those, and each bucket is upserted exactly once.
+    The rollups are additive: pass only points that were newly stored (see
+    metrics_schema.insert_points), a point folded in twice is counted twice.
+    The caller owns the transaction.
+    """
+    minute = RESOLUTIONS["1m"]
+    partials = {}
+    for ts, service_name, metric_name, value in points:
+        bucket = int(to_epoch(ts) // minute) * minute
+        key = (service_name, metric_name, bucket)
+        partial = partials.get(key)
+        if partial is None:
+            partial = partials[key] = _Partial()
+        partial.add(float(value))
+
+    if not partials:
+        return 0
+
+    conn.create_function("sketch_merge", 2, _merge_sketch_json, deterministic=True)
+    for resolution, width in RESOLUTIONS.items():
+        if width == minute:
+            level = partials
+        else:
+            level = {}
+            for (service_name, metric_name, bucket), partial in partials.items():
+                key = (service_name, metric_name, bucket // width * width)
+                target = level.get(key)
+                if target is None:
+                    target = level[key] = _Partial()
+                target.merge(partial)
+
+        conn.executemany(_UPSERT_SQL.format(table=rollup_table(resolution)), [
+            (s, m, b, p.count, p.sum, p.sum_sq, p.min, p.max, p.sketch.to_json())
+            for (s, m, b), p in level.items()
+        ])
+    return len(partials)
+
+
+def apply_arrays(conn, series, series_index, ts, values):
+    """
+    Vectorized apply_points for large batches (the metrics ingest writer). `series`
+    lists (service_name, metric_name); `series_index`, `ts` (epoch seconds) and
+    `values` are parallel numpy arrays. Writes the same rows as apply_points, but
+    the per-point work (bucketing, sums, sketch keys) is done in numpy, so the
+    Python cost scales with the number of buckets touched instead of points.
+    The caller owns the transaction.
+    """
+    import numpy as np
+    if not len(values):
+        return 0
+
+    # Sorted by (series, ts), points are also sorted by (series, bucket) at every width
+    if not (np.all(series_index[1:] >= series_index[:-1])
+            and np.all((ts[1:] >= ts[:-1]) | (series_index[1:] != series_index[:-1]))):
+        order = np.lexsort((ts, series_index))
+        series_index, ts, values = series_index[order], ts[order], values[order]
+    zero = values <= QuantileSketch._min_value
+    sketch_keys = np.ceil(np.log(np.where(zero, 1.0, values)) / QuantileSketch._log_gamma).astype(np.int64)
+    nonzero_keys = sketch_keys[~zero]
+    key_min = int(nonzero_keys.min()) if len(nonzero_keys) else 0
+    key_span = int(nonzero_keys.max()) - key_min + 1 if len(nonzero_keys) else 1
+    series_change = np.r_[True, series_index[1:] != series_index[:-1]]
+    service_names = np.array([service for service, _ in series], dtype=object)
+    metric_names = np.array([metric for _, metric in series], dtype=object)
+    conn.create_function("sketch_merge", 2, _merge_sketch_json, deterministic=True)
+    written = 0
+    for resolution, width in RESOLUTIONS.items():
+        buckets = ts // width * width
+        starts = np.flatnonzero(series_change | np.r_[True, buckets[1:] != buckets[:-1]])
+        counts = np.diff(np.r_[starts, len(values)])
+
+        # Sketch buckets: count per (row, key) over the non-zero values, from one combined code
+        group = np.repeat(np.arange(len(starts)), counts)[~zero]
+        pairs, pair_counts = np.unique(group * key_span + (nonzero_keys - key_min), return_counts=True)
+        pair_groups = pairs // key_span
+        # Sketch JSON is written straight from the pairs (same layout as QuantileSketch.to_json); few
+        # (key, count) combinations repeat a lot, so each distinct one is formatted once
+        combos, combo_index = np.unique((pairs % key_span + key_min) * 2 ** 32 + pair_counts, return_inverse=True)
+        formatted = np.array([f'"{c >> 32}":{c & 0xFFFFFFFF}' for c in combos.tolist()] or [""], dtype=object)
+        entries = formatted[combo_index].tolist()
+        entry_bounds = np.searchsorted(pair_groups, np.arange(len(starts) + 1)).tolist()
+
+        sketches = [
+            '{"z":%d,"b":{%s}}' % (zero_count, ",".join(entries[first:last]))
+            for zero_count, first, last in zip(np.add.reduceat(zero, starts, dtype=np.int64).tolist(), entry_bounds, entry_bounds[1:])
+        ]
+        row_series = series_index[starts]
+        conn.executemany(_UPSERT_SQL.format(table=rollup_table(resolution)), zip(
+            service_names[row_series].tolist(), metric_names[row_series].tolist(), buckets[starts].tolist(), counts.tolist(),
+            np.add.reduceat(values, starts).tolist(), np.add.reduceat(values * values, starts).tolist(),
+            np.minimum.reduceat(values, starts).tolist(), np.maximum.reduceat(values, starts).tolist(), sketches,
+        ))
+        written += len(starts)
+    return written
+
+
+def rebuild(conn, raw_rows, chunk_size: int = 50000):
+    """Drop all rollups and rebuild them from an iterable of raw rows."""
+    ensure_rollup_tables(conn)
+    for resolution in RESOLUTIONS:
+        conn.execute(f"DELETE FROM {rollup_table(resolution)}")
+    chunk = []
+    for row in raw_rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            apply_points(conn, chunk)
+            chunk = []
+    apply_points(conn, chunk)
+
+
+def pick_resolution(window_seconds: float, min_points: int = MIN_POINTS) -> str:
+    """Coarsest resolution that still yields at least `min_points` buckets over the window."""
+    chosen = "1m"
+    for resolution, width in RESOLUTIONS.items():
+        if window_seconds / width >= min_points:
+            chosen = resolution
+    return chosen
+
+
+def fetch_rollup_rows(conn, service_names: list[str], start: float, end: float = None,
+                      metric_name: str = None, resolution: str = None):
+    """
+    Stored rollup rows for the window as (resolution, rows), each row a tuple
+    (bucket, service_name, metric_name, count, sum, sum_sq, min, max, sketch JSON),
+    ordered by bucket.
+    """
+    end = end if end is not None else time.time()
+    resolution = resolution or pick_resolution(end - start)
+    if not service_names:
+        return resolution, []
+    width = RESOLUTIONS[resolution]
+
+    placeholders, params = in_placeholders(service_names)
+    query = f"""
+        SELECT bucket, service_name, metric_name, count, sum, sum_sq, min, max, sketch
+        FROM {rollup_table(resolution)}
+        WHERE service_name IN ({placeholders})
+        AND bucket >= ? AND bucket < ?
+    """
+    params += [int(start // width) * width, end]
+    if metric_name:
+        query += " AND metric_name = ?"
+        params.append(metric_name)
+    query += " ORDER BY bucket ASC"
+    return resolution, conn.execute(query, params).fetchall()
+
+
+def query_rollups(conn, service_names: list[str], start: float, end: float = None,
+                  metric_name: str = None, resolution: str = None):
+    resolution, fetched = fetch_rollup_rows(conn, service_names, start, end, metric_name, resolution)
+    rows = []
+    for bucket, service_name, metric, count, total, sum_sq, lo, hi, sketch in fetched:
+        sketch = QuantileSketch.from_json(sketch)
+        avg = total / count
+        rows.append({
+            "timestamp": datetime.fromtimestamp(bucket).isoformat(sep=" "),
+            "bucket": bucket,
+            "resolution": resolution,
+            "service_name": service_name,
+            "metric_name": metric,
+            "count": count,
+            "avg": avg,
+            "stddev": math.sqrt(max(0.0, sum_sq / count - avg * avg)),
+            "min": lo,
+            "max": hi,
+            "p50": sketch.quantile(0.50),
+            "p95": sketch.quantile(0.95),
+            "p99": sketch.quantile(0.99),
+        })
+    return rows
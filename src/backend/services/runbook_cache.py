@@ -0,0 +1,151 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from src.backend.services.telemetry import record_cache
+
+# Shared cache namespaces (multi-worker serving)
+SHARED_RESULTS = "runbook_results"
+SHARED_EMBEDDINGS = "runbook_embeddings"
+
+
+def _digest(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, separators=(",", ":")).encode()).hexdigest()
+
+
+class RunbookCache:
+    """
+    Retrieval cache for runbook queries. Two LRU maps:
+      - query text -> query embedding. Queries are templated per service, so the
+        embedding model (the main CPU cost outside the LLM) runs once per service.
+        Embeddings don't depend on the collection contents and survive version bumps.
+      - (query text, n_results, where) -> top-k hit, valid for one collection version.
+
+    With a shared cache both maps are backed by it, so a query embedded or
+    searched by one worker is a hit in all of them. Shared results are keyed on
+    `scope`, a fingerprint of the collection contents every worker computes the
+    same way (the local `version` counter differs per process).
+    """
+    def __init__(self, max_entries: int, shared: Callable[[], Optional[Any]] = lambda: None, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._shared = shared
+        self.version = 0
+        self.scope = ""
+        self._embeddings: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._results: "OrderedDict[Tuple, Dict[str, list]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.embedding_hits = 0
+        self.embedding_misses = 0
+        self.shared_hits = 0
+        self.shared_embedding_hits = 0
+
+    def _put(self, entries: OrderedDict, key, value):
+        # Caller holds the lock
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def set_version(self, version: int, scope: str = None):
+        """Results from an older collection version are dropped."""
+        with self._lock:
+            if version != self.version:
+                self.version = version
+                self._results.clear()
+            if scope is not None:
+                self.scope = scope
+
+    def get_result(self, key: Tuple) -> Optional[Dict[str, list]]:
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None:
+                self._results.move_to_end(key)
+            version, scope = self.version, self.scope
+        if result is None:
+            shared = self._shared()
+            result = shared.get(SHARED_RESULTS, _digest(scope, key)) if shared else None
+            if result is not None:
+                with self._lock:
+                    self.shared_hits += 1
+                    if version == self.version:
+                        self._put(self._results, key, result)
+        with self._lock:
+            if result is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        record_cache("runbook_results", result is not None)
+        return result
+
+    def set_result(self, key: Tuple, result: Dict[str, list], version: int):
+        with self._lock:
+            # A concurrent version bump makes this result stale before it is stored
+            if version != self.version:
+                return
+            self._put(self._results, key, result)
+            scope = self.scope
+        shared = self._shared()
+        if shared:
+            shared.set(SHARED_RESULTS, _digest(scope, key), result, ttl=self.ttl_seconds, tag=scope)
+
+    def get_embeddings(self, texts: List[str]) -> Dict[str, List[float]]:
+        with self._lock:
+            found = {t: self._embeddings[t] for t in texts if t in self._embeddings}
+            for t in found:
+                self._embeddings.move_to_end(t)
+        missing = [t for t in dict.fromkeys(texts) if t not in found]
+        shared = self._shared() if missing else None
+        if shared:
+            by_digest = shared.get_many(SHARED_EMBEDDINGS, {_digest(t): t for t in missing})
+            from_shared = {t: by_digest[_digest(t)] for t in missing if _digest(t) in by_digest}
+            with self._lock:
+                self.shared_embedding_hits += len(from_shared)
+                for text, embedding in from_shared.items():
+                    self._put(self._embeddings, text, embedding)
+            found.update(from_shared)
+        hits = sum(1 for t in texts if t in found)
+        with self._lock:
+            self.embedding_hits += hits
+            self.embedding_misses += len(texts) - hits
+        record_cache("runbook_embedding", True, hits)
+        record_cache("runbook_embedding", False, len(texts) - hits)
+        return found
+
+    def set_embeddings(self, embeddings: Dict[str, Any]):
+        with self._lock:
+            for text, embedding in embeddings.items():
+                self._put(self._embeddings, text, embedding)
+        shared = self._shared()
+        if shared:
+            # Embedding functions return numpy arrays, stored as plain float lists
+            shared.set_many(SHARED_EMBEDDINGS, {
+                _digest(text): [float(x) for x in embedding] for text, embedding in embeddings.items()
+            }, ttl=self.ttl_seconds)
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+        shared = self._shared()
+        if shared:
+            shared.delete(SHARED_RESULTS)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "version": self.version,
+                "results": len(self._results),
+                "embeddings": len(self._embeddings),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "embedding_hits": self.embedding_hits,
+                "embedding_misses": self.embedding_misses,
+                "shared_hits": self.shared_hits,
+                "shared_embedding_hits": self.shared_embedding_hits,
+            }
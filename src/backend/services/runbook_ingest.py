@@ -0,0 +1,314 @@
+import hashlib
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+from src.backend.services.hybrid_search import infer_failure_types
+from src.backend.services.telemetry import span
+
+# Incremental ingestion of a directory of Markdown/text runbooks into the
+# `runbooks` collection. Chunk ids are content-addressed (source path + chunk
+# hash), so re-ingesting only embeds chunks whose text is new; chunks that merely
+# moved within a file get a metadata update, and chunks or files that are gone
+# are deleted. Runbooks added by generate_data.py carry no `origin` and are never
+# touched.
+
+RUNBOOK_EXTENSIONS = (".md", ".markdown", ".txt")
+
+# Marks chunks owned by the ingester
+ORIGIN = "ingest"
+
+# Bump when the chunking rules change, so every file is re-chunked once
+CHUNKER_VERSION = 1
+
+# Collection metadata keys: next free `seq`, and a counter other processes watch
+NEXT_SEQ_KEY = "next_seq"
+VERSION_KEY = "ingest_version"
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+@dataclass
+class Chunk:
+    id: str
+    text: str
+    metadata: dict
+
+
+@dataclass
+class IngestReport:
+    files: int = 0
+    unchanged_files: int = 0
+    chunks: int = 0
+    added: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+    deleted_files: List[str] = field(default_factory=list)
+    dry_run: bool = False
+    seconds: float = 0.0
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.updated or self.deleted)
+
+
+def discover(root: str) -> Iterator[Tuple[str, str]]:
+    """(relative path with forward slashes, absolute path) of every runbook file, in a stable order."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for name in sorted(filenames):
+            if name.lower().endswith(RUNBOOK_EXTENSIONS) and not name.startswith("."):
+                path = os.path.join(dirpath, name)
+                yield os.path.relpath(path, root).replace(os.sep, "/"), path
+
+
+def file_hash(raw: bytes, chunk_chars: int) -> str:
+    # Chunking parameters are part of the hash: changing them re-chunks every file
+    return hashlib.sha256(f"{CHUNKER_VERSION}:{chunk_chars}\n".encode() + raw).hexdigest()
+
+
+def split_front_matter(text: str) -> Tuple[Dict[str, str], str]:
+    """Flat `key: value` front matter between `---` lines; no YAML dependency for two fields."""
+    if not text.startswith("---\n"):
+        return {}, text
+    end = text.find("\n---", 4)
+    if end < 0:
+        return {}, text
+    fields = {}
+    for line in text[4:end].splitlines():
+        key, sep, value = line.partition(":")
+        if sep and key.strip():
+            fields[key.strip().lower()] = value.strip().strip("'\"")
+    return fields, text[end + 4:].lstrip("\n")
+
+
+def document_metadata(source: str, fields: Dict[str, str], title: Optional[str]) -> dict:
+    """
+    `service` and `type` for every chunk of a file: front matter first, otherwise
+    the top-level directory (runbooks/<service>/...) and a failure type named in
+    the file name or title. Keys without a value are left out (Chroma has no null).
+    """
+    metadata = {}
+    parts = source.split("/")
+    service = fields.get("service") or (parts[0] if len(parts) > 1 else None)
+    if service:
+        metadata["service"] = service
+    rb_type = fields.get("type")
+    if not rb_type:
+        stem = os.path.splitext(parts[-1])[0].replace("_", " ").replace("-", " ")
+        types = infer_failure_types(f"{stem} {title or ''}")
+        rb_type = types[0] if types and len(types) == 1 else None
+    if rb_type:
+        metadata["type"] = rb_type
+    return metadata
+
+
+def _sections(body: str, markdown: bool) -> Iterator[Tuple[str, str]]:
+    """(heading path, section text) pairs; plain text is one untitled section."""
+    if not markdown:
+        yield "", body
+        return
+    path: List[Tuple[int, str]] = []
+    lines: List[str] = []
+    in_fence = False
+    for line in body.splitlines():
+        if line.lstrip().startswith("```"):
+            in_fence = not in_fence
+        match = None if in_fence else _HEADING.match(line)
+        if match:
+            yield " > ".join(h for _, h in path), "\n".join(lines)
+            level = len(match.group(1))
+            path = [(l, h) for l, h in path if l < level] + [(level, match.group(2))]
+            lines = []
+        else:
+            lines.append(line)
+    yield " > ".join(h for _, h in path), "\n".join(lines)
+
+
+def _pack(paragraphs: List[str], max_chars: int) -> Iterator[str]:
+    """Consecutive paragraphs joined up to `max_chars`; a longer paragraph is split on whitespace."""
+    current = ""
+    for paragraph in paragraphs:
+        while len(paragraph) > max_chars:
+            cut = paragraph.rfind(" ", 0, max_chars)
+            cut = cut if cut > max_chars // 2 else max_chars
+            if current:
+                yield current
+                current = ""
+            yield paragraph[:cut].rstrip()
+            paragraph = paragraph[cut:].lstrip()
+        if current and len(current) + 2 + len(paragraph) > max_chars:
+            yield current
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        yield current
+
+
+def chunk_document(source: str, text: str, max_chars: int) -> Tuple[Dict[str, str], List[Tuple[str, str]]]:
+    """
+    Front matter plus (heading path, chunk text) in document order. Markdown is split
+    at headings, then sections are packed paragraph-wise up to `max_chars`. Each
+    chunk starts with its heading path so it still makes sense retrieved on its own.
+    """
+    fields, body = split_front_matter(text.replace("\r\n", "\n"))
+    markdown = not source.lower().endswith(".txt")
+    chunks = []
+    for heading, section in _sections(body, markdown):
+        paragraphs = [p.strip() for p in _PARAGRAPH_BREAK.split(section) if p.strip()]
+        budget = max(max_chars - len(heading) - 2, max_chars // 2)
+        for packed in _pack(paragraphs, budget):
+            chunks.append((heading, f"{heading}\n\n{packed}" if heading else packed))
+    return fields, chunks
+
+
+def build_chunks(source: str, raw: bytes, chunk_chars: int) -> List[Chunk]:
+    """Chunks of one file with content-addressed ids (`<source>#<hash>`, `-n` suffix for repeats)."""
+    digest = file_hash(raw, chunk_chars)
+    fields, sections = chunk_document(source, raw.decode("utf-8", errors="replace"), chunk_chars)
+    title = sections[0][0].split(" > ")[0] if sections and sections[0][0] else None
+    base = document_metadata(source, fields, title)
+    chunks = []
+    seen: Dict[str, int] = {}
+    for position, (heading, text) in enumerate(sections):
+        content_hash = hashlib.sha256(text.encode()).hexdigest()[:16]
+        seen[content_hash] = seen.get(content_hash, 0) + 1
+        suffix = f"-{seen[content_hash]}" if seen[content_hash] > 1 else ""
+        metadata = {**base, "origin": ORIGIN, "source": source, "file_hash": digest, "chunk": position}
+        if heading:
+            metadata["heading"] = heading
+        chunks.append(Chunk(f"{source}#{content_hash}{suffix}", text, metadata))
+    return chunks
+
+
+def _existing_chunks(collection, page_size: int) -> Dict[str, Dict[str, dict]]:
+    """source -> {id: metadata} for every chunk the ingester owns."""
+    existing: Dict[str, Dict[str, dict]] = {}
+    offset = 0
+    while True:
+        page = collection.get(where={"origin": ORIGIN}, include=["metadatas"], limit=page_size, offset=offset)
+        for doc_id, metadata in zip(page["ids"], page["metadatas"]):
+            existing.setdefault(metadata.get("source"), {})[doc_id] = metadata
+        if len(page["ids"]) < page_size:
+            return existing
+        offset += page_size
+
+
+def _next_seq(collection, page_size: int) -> int:
+    """
+    First unused `seq` (see RAGService.list_documents). Kept in the collection
+    metadata; a collection that predates it (generate_data.py) is scanned once.
+    """
+    stored = (collection.metadata or {}).get(NEXT_SEQ_KEY)
+    if stored is not None:
+        return int(stored)
+    highest = -1
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        highest = max([highest] + [m["seq"] for m in page["metadatas"] if m and "seq" in m])
+        if len(page["ids"]) < page_size:
+            return highest + 1
+        offset += page_size
+
+
+def _batches(items: List, size: int) -> Iterator[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def ingest_directory(collection, root: str, chunk_chars: int = 1500, batch_size: int = 64, workers: int = 1,
+                     prune: bool = True, dry_run: bool = False, page_size: int = 5000) -> IngestReport:
+    """
+    Bring the collection in line with the runbooks under `root`.
+
+    Files whose hash matches the stored `file_hash` are skipped without being
+    chunked. For the rest, only chunks with new text are embedded, `batch_size`
+    per call on up to `workers` threads (the ONNX embedding model releases the
+    GIL); a single writer upserts the results. Chunks that only moved keep their
+    embedding and `seq` and get a metadata update. With `prune`, chunks of files no
+    longer under `root` are deleted. New chunks are written before stale ones are
+    deleted, so a file never disappears from search halfway through.
+    """
+    started = time.perf_counter()
+    report = IngestReport(dry_run=dry_run)
+    existing = _existing_chunks(collection, page_size)
+
+    new_chunks: List[Chunk] = []
+    updates: List[Chunk] = []
+    stale_ids: List[str] = []
+    seen_sources = set()
+    with span("ingest.scan") as s:
+        for source, path in discover(root):
+            report.files += 1
+            seen_sources.add(source)
+            with open(path, "rb") as f:
+                raw = f.read()
+            stored = existing.get(source, {})
+            digest = file_hash(raw, chunk_chars)
+            if stored and all(m.get("file_hash") == digest for m in stored.values()):
+                report.unchanged_files += 1
+                report.unchanged += len(stored)
+                report.chunks += len(stored)
+                continue
+            chunks = build_chunks(source, raw, chunk_chars)
+            report.chunks += len(chunks)
+            for chunk in chunks:
+                previous = stored.get(chunk.id)
+                if previous is None:
+                    new_chunks.append(chunk)
+                    continue
+                # Same text: keep the embedding and the seq, refresh position/service/type
+                chunk.metadata["seq"] = previous["seq"]
+                if chunk.metadata != previous:
+                    updates.append(chunk)
+                else:
+                    report.unchanged += 1
+            current_ids = {c.id for c in chunks}
+            stale_ids.extend(doc_id for doc_id in stored if doc_id not in current_ids)
+        if prune:
+            for source, stored in existing.items():
+                if source not in seen_sources:
+                    report.deleted_files.append(source)
+                    stale_ids.extend(stored)
+        s.set(rows=report.files)
+
+    report.added, report.updated, report.deleted = len(new_chunks), len(updates), len(stale_ids)
+    if dry_run or not report.changed:
+        report.seconds = time.perf_counter() - started
+        return report
+
+    seq = _next_seq(collection, page_size)
+    for chunk in new_chunks:
+        chunk.metadata["seq"] = seq
+        seq += 1
+
+    def embed(batch: List[Chunk]):
+        with span("ingest.embed") as s:
+            embeddings = collection._embed(input=[c.text for c in batch])
+            s.set(rows=len(batch), bytes=sum(len(c.text) for c in batch))
+        return batch, embeddings
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        # map() yields in submission order, so the writer below is the only thread touching Chroma writes
+        for batch, embeddings in pool.map(embed, _batches(new_chunks, batch_size)):
+            with span("ingest.upsert") as s:
+                collection.upsert(ids=[c.id for c in batch], documents=[c.text for c in batch],
+                                  metadatas=[c.metadata for c in batch], embeddings=embeddings)
+                s.set(rows=len(batch))
+    for batch in _batches(updates, page_size):
+        collection.update(ids=[c.id for c in batch], metadatas=[c.metadata for c in batch])
+    for batch in _batches(stale_ids, page_size):
+        collection.delete(ids=batch)
+
+    # Other processes (API workers) key their runbook cache on this; updates don't change the count
+    metadata = {k: v for k, v in (collection.metadata or {}).items() if not k.startswith("hnsw:")}
+    metadata[NEXT_SEQ_KEY] = seq
+    metadata[VERSION_KEY] = int(metadata.get(VERSION_KEY, 0)) + 1
+    collection.modify(metadata=metadata)
+    report.seconds = time.perf_counter() - started
+    return report
@@ -0,0 +1,301 @@
+import fcntl
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from src.backend.config import settings
+from src.backend.services.providers import Provider, DependencyUnavailable
+from src.backend.services.sqlite_pool import SQLitePool, DEFAULT_PRAGMAS, in_placeholders
+from src.backend.services.telemetry import record_cache
+
+logger = logging.getLogger(__name__)
+
+# Cross-process cache for multi-worker serving. Each worker keeps its own clients
+# and in-memory caches, but what should exist once per host (the topology
+# snapshot, runbook retrieval results, LLM responses, chat sessions, batch job
+# status) is also kept in one SQLite file (WAL, so lookups from every worker run
+# in parallel). Values are JSON. Every write bumps the entry's version, which is
+# how workers notice that another one replaced something.
+#
+# A cache never fails a request: a lookup that hits a locked or broken file is a
+# miss, a write that does is skipped.
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS shared_cache (
+        namespace TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value TEXT NOT NULL,
+        tag TEXT,
+        version INTEGER NOT NULL,
+        updated_at REAL NOT NULL,
+        expires_at REAL,
+        PRIMARY KEY (namespace, key)
+    ) WITHOUT ROWID
+    """,
+    # Pruning: expired entries first, then the ones closest to expiring
+    "CREATE INDEX IF NOT EXISTS idx_shared_cache_expires ON shared_cache (expires_at)",
+]
+
+_UPSERT_SQL = """
+    INSERT INTO shared_cache (namespace, key, value, tag, version, updated_at, expires_at)
+    VALUES (?, ?, ?, ?, 1, ?, ?)
+    ON CONFLICT (namespace, key) DO UPDATE SET
+        value = excluded.value, tag = excluded.tag, version = shared_cache.version + 1,
+        updated_at = excluded.updated_at, expires_at = excluded.expires_at
+    RETURNING version
+"""
+
+# Expired entries are deleted (and the entry cap enforced) once every this many writes
+PRUNE_EVERY_WRITES = 1000
+
+
+def _create_schema(conn):
+    for statement in _SCHEMA:
+        conn.execute(statement)
+    conn.commit()
+
+
+class SharedCache:
+    """
+    Namespaced key -> JSON value store in a SQLite file shared by the worker
+    processes on one host. Entries may expire (`ttl`) and carry a `tag` for
+    bulk invalidation; at most `max_entries` are kept.
+    """
+    def __init__(self, path: str, max_entries: int, pragmas: Optional[dict] = None):
+        self.path = path
+        self.max_entries = max_entries
+        # Small pool: every call is one short statement
+        self._pool = SQLitePool(path, max_size=4, pragmas=pragmas, on_connect=_create_schema)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _failed(self, operation: str, error: Exception):
+        with self._lock:
+            self.errors += 1
+        logger.warning("Shared cache %s failed, treated as a miss: %s", operation, error)
+
+    def _record(self, namespace: str, hit: bool, count: int = 1):
+        with self._lock:
+            if hit:
+                self.hits += count
+            else:
+                self.misses += count
+        record_cache(f"shared_{namespace}", hit, count)
+
+    def close(self):
+        self._pool.close()
+
+    def ping(self):
+        with self._pool.connection() as conn:
+            conn.execute("SELECT 1 FROM shared_cache LIMIT 1").fetchall()
+
+    def get_entry(self, namespace: str, key: str) -> Optional[Tuple[Any, int, float]]:
+        """(value, version, updated_at), or None if missing or expired."""
+        try:
+            with self._pool.connection() as conn:
+                row = conn.execute(
+                    "SELECT value, version, updated_at FROM shared_cache "
+                    "WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                    (namespace, key, time.time()),
+                ).fetchone()
+        except sqlite3.Error as e:
+            self._failed("get", e)
+            return None
+        self._record(namespace, row is not None)
+        return (json.loads(row[0]), row[1], row[2]) if row else None
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        entry = self.get_entry(namespace, key)
+        return entry[0] if entry else None
+
+    def version(self, namespace: str, key: str) -> Optional[Tuple[int, float]]:
+        """(version, updated_at) without reading the value; None if missing or expired."""
+        try:
+            with self._pool.connection() as conn:
+                return conn.execute(
+                    "SELECT version, updated_at FROM shared_cache "
+                    "WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                    (namespace, key, time.time()),
+                ).fetchone()
+        except sqlite3.Error as e:
+            self._failed("version", e)
+            return None
+
+    def get_many(self, namespace: str, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        found = {}
+        try:
+            with self._pool.connection() as conn:
+                now = time.time()
+                # Chunked below SQLite's default limit of 999 parameters
+                for start in range(0, len(keys), 500):
+                    placeholders, params = in_placeholders(keys[start:start + 500])
+                    rows = conn.execute(
+                        f"SELECT key, value FROM shared_cache WHERE namespace = ? AND key IN ({placeholders}) "
+                        "AND (expires_at IS NULL OR expires_at > ?)",
+                        [namespace, *params, now],
+                    ).fetchall()
+                    found.update((key, json.loads(value)) for key, value in rows)
+        except sqlite3.Error as e:
+            self._failed("get_many", e)
+            return {}
+        self._record(namespace, True, len(found))
+        self._record(namespace, False, len(keys) - len(found))
+        return found
+
+    def items(self, namespace: str, tag: str = None) -> List[Tuple[str, Any]]:
+        """Every live entry of a namespace (with `tag`, if given)."""
+        sql = "SELECT key, value FROM shared_cache WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?)"
+        params = [namespace, time.time()]
+        if tag is not None:
+            sql += " AND tag = ?"
+            params.append(tag)
+        try:
+            with self._pool.connection() as conn:
+                return [(key, json.loads(value)) for key, value in conn.execute(sql, params)]
+        except sqlite3.Error as e:
+            self._failed("items", e)
+            return []
+
+    def set(self, namespace: str, key: str, value: Any, ttl: float = None, tag: str = None) -> Optional[int]:
+        """Store `value`; returns the entry's new version, or None if the write was skipped."""
+        return self.set_many(namespace, {key: value}, ttl=ttl, tag=tag).get(key)
+
+    def set_many(self, namespace: str, values: Dict[str, Any], ttl: float = None, tag: str = None) -> Dict[str, int]:
+        if not values:
+            return {}
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        versions = {}
+        try:
+            with self._pool.connection() as conn, conn:
+                for key, value in values.items():
+                    row = conn.execute(_UPSERT_SQL, (
+                        namespace, key, json.dumps(value, separators=(",", ":")), tag, now, expires_at,
+                    )).fetchone()
+                    versions[key] = row[0]
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            # TypeError / ValueError: value isn't JSON-serializable
+            self._failed("set", e)
+            return {}
+        with self._lock:
+            self._writes += len(values)
+            prune = self._writes >= PRUNE_EVERY_WRITES
+            if prune:
+                self._writes = 0
+        if prune:
+            self.prune()
+        return versions
+
+    def touch(self, namespace: str, key: str, ttl: float):
+        """Push back the expiry of an entry that is still in use."""
+        try:
+            with self._pool.connection() as conn, conn:
+                conn.execute("UPDATE shared_cache SET expires_at = ? WHERE namespace = ? AND key = ?",
+                             (time.time() + ttl, namespace, key))
+        except sqlite3.Error as e:
+            self._failed("touch", e)
+
+    def delete(self, namespace: str, key: str = None, tag: str = None) -> int:
+        """Delete one key, every entry with `tag`, or (neither given) the whole namespace."""
+        sql, params = "DELETE FROM shared_cache WHERE namespace = ?", [namespace]
+        if key is not None:
+            sql, params = sql + " AND key = ?", params + [key]
+        if tag is not None:
+            sql, params = sql + " AND tag = ?", params + [tag]
+        try:
+            with self._pool.connection() as conn, conn:
+                return conn.execute(sql, params).rowcount
+        except sqlite3.Error as e:
+            self._failed("delete", e)
+            return 0
+
+    def prune(self) -> int:
+        now = time.time()
+        try:
+            with self._pool.connection() as conn, conn:
+                removed = conn.execute("DELETE FROM shared_cache WHERE expires_at <= ?", (now,)).rowcount
+                excess = conn.execute("SELECT COUNT(*) FROM shared_cache").fetchone()[0] - self.max_entries
+                if excess > 0:
+                    # Soonest to expire go first; entries without an expiry are kept
+                    removed += conn.execute(
+                        "DELETE FROM shared_cache WHERE (namespace, key) IN (SELECT namespace, key FROM shared_cache "
+                        "WHERE expires_at IS NOT NULL ORDER BY expires_at LIMIT ?)", (excess,)
+                    ).rowcount
+        except sqlite3.Error as e:
+            self._failed("prune", e)
+            return 0
+        return removed
+
+    def stats(self) -> dict:
+        try:
+            with self._pool.connection() as conn:
+                namespaces = dict(conn.execute("SELECT namespace, COUNT(*) FROM shared_cache GROUP BY namespace"))
+        except sqlite3.Error as e:
+            self._failed("stats", e)
+            namespaces = {}
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+                "entries": namespaces,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "errors": self.errors,
+            }
+
+
+@contextmanager
+def host_lock(path: str):
+    """
+    Exclusive lock on `path` for work only one process on the host may do at a
+    time (runbook ingest, metrics retention), whatever the number of workers.
+    Raises BlockingIOError right away if another process holds it. Released on
+    exit, or by the kernel if the process dies.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        yield
+    finally:
+        os.close(fd)
+
+
+def _create_shared_cache() -> SharedCache:
+    return SharedCache(
+        settings.SHARED_CACHE_PATH,
+        max_entries=settings.SHARED_CACHE_MAX_ENTRIES,
+        # A lookup stuck behind another worker's write is better served as a miss than late
+        pragmas={**DEFAULT_PRAGMAS, "cache_size": -16 * 1024, "busy_timeout": 2000},
+    )
+
+
+# Only registered (and probed by /ready) when SHARED_CACHE_PATH is set
+shared_cache_provider = (
+    Provider("shared_cache", _create_shared_cache, close=SharedCache.close, check=SharedCache.ping, required=False)
+    if settings.SHARED_CACHE_PATH else None
+)
+
+
+def shared_cache() -> Optional[SharedCache]:
+    """The cross-process cache, or None when running single-process or when its file can't be opened."""
+    if shared_cache_provider is None:
+        return None
+    try:
+        return shared_cache_provider.get()
+    except DependencyUnavailable as e:
+        logger.warning("%s, caching in this worker only", e)
+        return None
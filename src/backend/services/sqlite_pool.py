@@ -0,0 +1,140 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Applied to every pooled connection. journal_mode is persistent in the file,
+# the rest are per connection.
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",            # readers don't block the writer (and vice versa)
+    "synchronous": "NORMAL",          # safe with WAL, fsync only at checkpoints
+    "mmap_size": 256 * 1024 * 1024,   # read pages straight from the page cache
+    "cache_size": -64 * 1024,         # negative = KiB, so 64 MiB per connection
+    "temp_store": "MEMORY",           # sorts and temp b-trees for ORDER BY / GROUP BY
+    "busy_timeout": 10000,
+}
+
+# sqlite3 caches prepared statements per connection, keyed by SQL text
+STATEMENT_CACHE_SIZE = 256
+
+
+def in_placeholders(values: Sequence) -> Tuple[str, List]:
+    """
+    Placeholders and parameters for `col IN (...)`. The list is padded to the
+    next power of two by repeating the last value (IN ignores duplicates), so
+    lists of 5, 6, 7 or 8 names all share one SQL text and one prepared statement.
+    """
+    values = list(values)
+    if not values:
+        raise ValueError("IN list must not be empty")
+    size = 1
+    while size < len(values):
+        size *= 2
+    params = values + [values[-1]] * (size - len(values))
+    return ", ".join("?" * size), params
+
+
+class SQLitePool:
+    """
+    Thread-safe pool of sqlite3 connections to one database file. Connections
+    are opened lazily up to `max_size`, configured once with the pragmas, and
+    handed out LIFO so the warmest page cache gets reused. Callers that find the
+    pool exhausted wait up to `timeout` seconds for a connection to come back.
+    """
+    def __init__(self, db_path: str, max_size: int = 8, pragmas: Optional[Dict[str, object]] = None,
+                 on_connect: Optional[Callable[[sqlite3.Connection], None]] = None, timeout: float = 30.0):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self.timeout = timeout
+        self._on_connect = on_connect
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._init_lock = threading.Lock()
+        self._created = 0
+        self._initialized = False
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.pragmas.get("busy_timeout", 10000) / 1000,
+            check_same_thread=False,  # handed between worker threads, never shared concurrently
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        try:
+            for name, value in self.pragmas.items():
+                conn.execute(f"PRAGMA {name} = {value}")
+            # One-time setup (e.g. schema check) runs on the first connection, others wait for it
+            if not self._initialized:
+                with self._init_lock:
+                    if not self._initialized:
+                        if self._on_connect is not None:
+                            self._on_connect(conn)
+                        self._initialized = True
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            grow = self._created < self.max_size
+            if grow:
+                self._created += 1
+        if grow:
+            try:
+                return self._open()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No SQLite connection available after {self.timeout}s (pool size {self.max_size})")
+
+    def _release(self, conn: sqlite3.Connection, broken: bool = False):
+        if not broken and conn.in_transaction:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                broken = True
+        if broken:
+            conn.close()
+            with self._lock:
+                self._created -= 1
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection; any transaction left open is rolled back on return."""
+        conn = self._acquire()
+        try:
+            yield conn
+        except (sqlite3.InterfaceError, sqlite3.ProgrammingError):
+            self._release(conn, broken=True)
+            raise
+        except BaseException:
+            self._release(conn)
+            raise
+        else:
+            self._release(conn)
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": self._created, "idle": self._idle.qsize(), "max_size": self.max_size}
@@ -1,10 +1,75 @@
-import sqlite3
-import pandas as pd
+import asyncio
+import base64
+import heapq
+import itertools
+import time
 from src.backend.config import settings
+from src.backend.services import metrics_schema, rollups, metric_stats
+from src.backend.services.sqlite_pool import SQLitePool, DEFAULT_PRAGMAS, in_placeholders
+from src.backend.services.telemetry import span
+from src.backend.services.providers import Provider
+
+METRIC_FIELDS = ("timestamp", "service_name", "metric_name", "value")
+
+# Up to this many (service, metric) series a filtered page is served by primary key seeks
+MAX_SEEK_SERIES = 64
+
+# Metric stats windows of at least this many hours are merged from 1h rollups, shorter ones from 1m
+STATS_HOURLY_FROM_HOURS = 3
+
+
+def _encode_cursor(key) -> str:
+    return base64.urlsafe_b64encode(":".join(str(int(k)) for k in key).encode()).decode()
+
+
+def _decode_cursor(cursor: str):
+    try:
+        ts, service_id, metric_id = (int(k) for k in base64.urlsafe_b64decode(cursor.encode()).decode().split(":"))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return ts, service_id, metric_id
+
+
+def _ids_for(names_by_id: dict, names: list[str] = None):
+    if not names:
+        return None
+    wanted = set(names)
+    return [i for i, name in names_by_id.items() if name in wanted]
+
 
 class SQLiteService:
     def __init__(self):
         self.db_path = settings.SQLITE_DB_PATH
+        # Connections are reused across requests (and worker threads), the schema is checked once
+        self.pool = SQLitePool(
+            self.db_path,
+            max_size=settings.SQLITE_POOL_SIZE,
+            pragmas={
+                **DEFAULT_PRAGMAS,
+                "mmap_size": settings.SQLITE_MMAP_SIZE_MB * 1024 * 1024,
+                "cache_size": -settings.SQLITE_CACHE_SIZE_MB * 1024,
+            },
+            on_connect=metrics_schema.ensure_schema,
+        )
+
+    def _connect(self):
+        return self.pool.connection()
+
+    def close(self):
+        self.pool.close()
+
+    def ping(self):
+        with self._connect() as conn:
+            conn.execute("SELECT 1").fetchone()
+
+    def _records(self, query: str, params: list):
+        # Plain dicts straight from the cursor, no DataFrame round trip
+        with span("sqlite.query") as s, self._connect() as conn:
+            cursor = conn.execute(query, params)
+            columns = [c[0] for c in cursor.description]
+            records = [dict(zip(columns, row)) for row in cursor]
+            s.set(rows=len(records))
+            return records
 
     def get_metrics(self, service_name: str, metric_name: str = None, hours: int = 24):
         return self.get_multi_service_metrics([service_name], metric_name, hours)
@@ -13,25 +78,247 @@ class SQLiteService:
         if not service_names:
             return []
             
-        conn = sqlite3.connect(self.db_path)
-        
-        # Format list for SQL IN clause
-        services_str = "', '".join(service_names)
+        # Bound placeholders for the SQL IN clause (padded so similar list sizes share one statement)
+        placeholders, params = in_placeholders(service_names)
         
+        # CROSS JOIN pins the join order so every (service_id, metric_id) pair is an
+        # equality seek into the primary key, followed by a ts range scan
         query = f"""
-            SELECT timestamp, service_name, metric_name, value 
-            FROM metrics 
-            WHERE service_name IN ('{services_str}')
-            AND timestamp >= datetime('now', '-{hours} hours')
+            SELECT datetime(p.ts, 'unixepoch', 'localtime') AS timestamp,
+                   s.name AS service_name, m.name AS metric_name, p.value AS value
+            FROM services s
+            CROSS JOIN metric_names m
+            CROSS JOIN metric_points p
+            WHERE s.name IN ({placeholders})
+            AND p.service_id = s.id AND p.metric_id = m.id
+            AND p.ts >= ?
         """
+        params.append(int(time.time() - hours * 3600))
         if metric_name:
-            query += f" AND metric_name = '{metric_name}'"
+            query += " AND m.name = ?"
+            params.append(metric_name)
         
         # Order by timestamp to make it easier to read
-        query += " ORDER BY timestamp ASC"
+        query += " ORDER BY p.ts ASC"
             
-        df = pd.read_sql_query(query, conn)
-        conn.close()
-        return df.to_dict(orient="records")
+        return self._records(query, params)
+
+    def _metric_page(self, limit: int, cursor: str = None, services: list[str] = None, metrics: list[str] = None,
+                     start: float = None, end: float = None):
+        """
+        One page of raw points, newest first, in (ts, service_id, metric_id) order.
+        Pages are keyset-based: the cursor is the key of the last row returned, so
+        page N costs the same as page 1 (no OFFSET scan).
+        """
+        after = _decode_cursor(cursor) if cursor else None
+        with span("sqlite.metric_page") as s, self._connect() as conn:
+            service_names = dict(conn.execute("SELECT id, name FROM services"))
+            metric_names = dict(conn.execute("SELECT id, name FROM metric_names"))
+            service_ids = _ids_for(service_names, services)
+            metric_ids = _ids_for(metric_names, metrics)
+            if service_ids == [] or metric_ids == []:
+                return [], None, service_names, metric_names
+
+            if service_ids is not None and len(service_ids) * len(metric_ids or metric_names) <= MAX_SEEK_SERIES:
+                rows = self._series_page(conn, limit + 1, after, service_ids, metric_ids or list(metric_names), start, end)
+            else:
+                rows = self._index_page(conn, limit + 1, after, service_ids, metric_ids, start, end)
+            s.set(rows=len(rows))
+
+        next_cursor = _encode_cursor(rows[limit - 1][:3]) if len(rows) > limit else None
+        return rows[:limit], next_cursor, service_names, metric_names
+
+    def _index_page(self, conn, limit, after, service_ids, metric_ids, start, end):
+        # Backward walk of idx_metric_points_ts, whose key is exactly (ts, service_id, metric_id).
+        # The unary + keeps the id filters off the primary key (a seek there means sorting every
+        # matching row); unlike INDEXED BY it is only a hint, a missing index costs speed, not the query
+        where, params = [], []
+        for column, ids in (("service_id", service_ids), ("metric_id", metric_ids)):
+            if ids is not None:
+                placeholders, values = in_placeholders(ids)
+                where.append(f"+{column} IN ({placeholders})")
+                params += values
+        if start is not None:
+            where.append("ts >= ?")
+            params.append(start)
+        if end is not None:
+            where.append("ts < ?")
+            params.append(end)
+        if after is not None:
+            where.append("(ts, service_id, metric_id) < (?, ?, ?)")
+            params += list(after)
+        query = f"""
+            SELECT ts, service_id, metric_id, value
+            FROM metric_points
+            {"WHERE " + " AND ".join(where) if where else ""}
+            ORDER BY ts DESC, service_id DESC, metric_id DESC
+            LIMIT ?
+        """
+        return conn.execute(query, params + [limit]).fetchall()
+
+    def _series_page(self, conn, limit, after, service_ids, metric_ids, start, end):
+        # Few series: one primary key range seek per (service, metric), merged newest first
+        query = """
+            SELECT ts, service_id, metric_id, value
+            FROM metric_points
+            WHERE service_id = ? AND metric_id = ? AND ts >= ? AND ts <= ?
+            ORDER BY ts DESC
+            LIMIT ?
+        """
+        lower = start if start is not None else -2 ** 62
+        upper = end - 1 if end is not None else 2 ** 62
+        series = []
+        for service_id in service_ids:
+            for metric_id in metric_ids:
+                bound = upper
+                if after is not None:
+                    # Same ts as the cursor row is only allowed for series that sort before it
+                    bound = min(bound, after[0] if (service_id, metric_id) < tuple(after[1:]) else after[0] - 1)
+                series.append(conn.execute(query, [service_id, metric_id, lower, bound, limit]).fetchall())
+        merged = heapq.merge(*series, key=lambda row: (row[0], row[1], row[2]), reverse=True)
+        return list(itertools.islice(merged, limit))
+
+    def get_metrics_page(self, limit: int = 100, cursor: str = None, services: list[str] = None, metrics: list[str] = None,
+                         start: float = None, end: float = None, fields: list[str] = None):
+        """Row format page: {"metrics": [{timestamp, service_name, metric_name, value}], "next_cursor"}."""
+        rows, next_cursor, service_names, metric_names = self._metric_page(limit, cursor, services, metrics, start, end)
+        fields = fields or METRIC_FIELDS
+        records = []
+        for ts, service_id, metric_id, value in rows:
+            record = {
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)),
+                "service_name": service_names[service_id],
+                "metric_name": metric_names[metric_id],
+                "value": value,
+            }
+            records.append({f: record[f] for f in fields})
+        return {"metrics": records, "next_cursor": next_cursor}
+
+    def get_metrics_page_columnar(self, limit: int = 100, cursor: str = None, services: list[str] = None, metrics: list[str] = None,
+                                  start: float = None, end: float = None, fields: list[str] = None):
+        """
+        Same rows as get_metrics_page, as parallel arrays: epoch-second timestamps,
+        values, and service/metric codes indexing into the `services`/`metrics` name lists.
+        """
+        import numpy as np
+        rows, next_cursor, service_names, metric_names = self._metric_page(limit, cursor, services, metrics, start, end)
+        fields = fields or METRIC_FIELDS
+        if not rows:
+            ts = service_ids = metric_ids = values = ()
+        else:
+            ts, service_ids, metric_ids, values = zip(*rows)
+
+        columns = {}
+        if "timestamp" in fields:
+            columns["timestamps"] = list(ts)
+        if "value" in fields:
+            columns["values"] = list(values)
+        # Dense codes over the ids actually present in this page
+        for field, ids, names, codes_key, names_key in (
+            ("service_name", service_ids, service_names, "service_codes", "services"),
+            ("metric_name", metric_ids, metric_names, "metric_codes", "metrics"),
+        ):
+            if field in fields:
+                unique, codes = np.unique(np.array(ids, dtype=np.int64), return_inverse=True)
+                columns[codes_key] = codes.tolist()
+                columns[names_key] = [names[i] for i in unique.tolist()]
+        columns["next_cursor"] = next_cursor
+        return columns
+
+    def get_latest_metrics(self, limit: int = 100):
+        return self.get_metrics_page(limit)["metrics"]
+
+    def get_metric_rollups(self, service_names: list[str], metric_name: str = None, hours: int = 24, resolution: str = None):
+        """
+        Pre-aggregated buckets (count/avg/min/max/p50/p95/p99) for the window.
+        When no resolution is given the coarsest one that can answer the window is used,
+        so a 24h request reads ~24 rows per metric instead of every raw point.
+        """
+        if not service_names:
+            return []
+
+        with span("sqlite.rollups") as s, self._connect() as conn:
+            result = rollups.query_rollups(
+                conn, service_names, start=time.time() - hours * 3600,
+                metric_name=metric_name, resolution=resolution
+            )
+            s.set(rows=len(result))
+            return result
+
+    async def get_metric_rollups_async(self, service_names: list[str], metric_name: str = None, hours: int = 24, resolution: str = None):
+        # sqlite3 is blocking, each call borrows a pooled connection inside the worker thread
+        return await asyncio.to_thread(self.get_metric_rollups, service_names, metric_name, hours, resolution)
+
+    def get_metric_frame(self, service_names: list[str], metric_name: str = None, hours: int = 24):
+        """Raw points for the window as a DataFrame (ts as epoch seconds), ready for vectorized stats."""
+        # Deferred like in metric_stats, pandas is only needed for the stats requests
+        import pandas as pd
+        if not service_names:
+            return pd.DataFrame(columns=["ts", "service_name", "metric_name", "value"])
+
+        placeholders, params = in_placeholders(service_names)
+        params.append(int(time.time() - hours * 3600))
+        query = f"""
+            SELECT p.ts AS ts, s.name AS service_name, m.name AS metric_name, p.value AS value
+            FROM services s
+            CROSS JOIN metric_names m
+            CROSS JOIN metric_points p
+            WHERE s.name IN ({placeholders})
+            AND p.service_id = s.id AND p.metric_id = m.id
+            AND p.ts >= ?
+        """
+        if metric_name:
+            query += " AND m.name = ?"
+            params.append(metric_name)
+
+        with span("sqlite.metric_frame") as s, self._connect() as conn:
+            frame = pd.read_sql_query(query, conn, params=params)
+            s.set(rows=len(frame), bytes=int(frame.memory_usage(index=False).sum()))
+            return frame
+
+    def get_metric_stats(self, service_names: list[str], hours: int = 24):
+        """
+        Per service/metric percentiles, availability, peak split and trend, merged from the
+        rollups (a few rows per series whatever the point rate), plus anomaly windows over
+        the raw points of the last METRICS_ANOMALY_HOURS of the window.
+        """
+        if not service_names:
+            return []
+
+        # Hourly buckets keep the rows per series small; the peak split needs the hour of day of
+        # each bucket, so daily ones are never used
+        resolution = "1h" if hours >= STATS_HOURLY_FROM_HOURS else "1m"
+        with span("sqlite.rollups") as s, self._connect() as conn:
+            _, rows = rollups.fetch_rollup_rows(conn, service_names, time.time() - hours * 3600, resolution=resolution)
+            s.set(rows=len(rows))
+
+        anomaly_hours = min(hours, settings.METRICS_ANOMALY_HOURS)
+        frame = self.get_metric_frame(service_names, hours=anomaly_hours) if rows and anomaly_hours > 0 else None
+        with span("metrics.stats") as s:
+            summary = metric_stats.summarize(rows, frame)
+            s.set(rows=len(summary))
+        return summary
+
+    async def get_metric_stats_async(self, service_names: list[str], hours: int = 24):
+        return await asyncio.to_thread(self.get_metric_stats, service_names, hours)
+
+    def insert_metrics(self, points: list[tuple]):
+        """
+        Insert raw (ts, service_name, metric_name, value) points and fold them into the
+        rollups. Points already stored are skipped; returns how many were new.
+        """
+        if not points:
+            return 0
+
+        with span("sqlite.insert") as s, self._connect() as conn, conn:
+            inserted = metrics_schema.insert_points(conn, points)
+            rollups.apply_points(conn, inserted)
+            s.set(rows=len(inserted))
+        return len(inserted)
+
+    def rebuild_rollups(self):
+        with self._connect() as conn, conn:
+            rollups.rebuild(conn, metrics_schema.iter_points(conn).fetchall())
 
-sqlite_service = SQLiteService()
+sqlite_provider = Provider("sqlite", SQLiteService, close=SQLiteService.close, check=SQLiteService.ping)
+sqlite_service = sqlite_provider.proxy
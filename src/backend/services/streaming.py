@@ -0,0 +1,60 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+# Streamed responses are newline-delimited JSON, one event per line:
+#   {"type": "context", ...}   retrieval context, sent before the first token
+#   {"type": "token", "content": "..."}
+#   {"type": "error", "detail": "..."}
+#   {"type": "done"}
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# How often a stream checks whether its client is still there, also while no token arrives (prefill)
+DISCONNECT_POLL_SECONDS = 0.25
+
+
+def ndjson_event(event_type: str, **fields) -> str:
+    return json.dumps({"type": event_type, **fields}, default=str) + "\n"
+
+
+async def _wait_for_disconnect(request: Request):
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+
+def stream_tokens(request: Request, context: Dict[str, Any], tokens: AsyncIterator[str]) -> StreamingResponse:
+    """
+    Wrap an LLM token iterator into an NDJSON response. The context event goes out
+    first so the client can render dependencies/runbooks while the model is still
+    prefilling. If the client goes away the token iterator is closed, which closes
+    the upstream Ollama request and stops generation. Disconnects are watched by a
+    separate task, so one during a long prefill cancels the wait for the first token.
+    """
+    async def events():
+        watcher = asyncio.create_task(_wait_for_disconnect(request))
+        try:
+            yield ndjson_event("context", **context)
+            while True:
+                next_token = asyncio.ensure_future(tokens.__anext__())
+                await asyncio.wait((next_token, watcher), return_when=asyncio.FIRST_COMPLETED)
+                if not next_token.done():
+                    # Client is gone: cancel the pending read, then let the finally close the iterator
+                    next_token.cancel()
+                    await asyncio.gather(next_token, return_exceptions=True)
+                    break
+                try:
+                    token = next_token.result()
+                except StopAsyncIteration:
+                    yield ndjson_event("done")
+                    break
+                yield ndjson_event("token", content=token)
+        except Exception as e:
+            yield ndjson_event("error", detail=str(e))
+        finally:
+            watcher.cancel()
+            await tokens.aclose()
+
+    # Disable proxy buffering so tokens reach the browser as they are produced
+    return StreamingResponse(events(), media_type=NDJSON_MEDIA_TYPE, headers={"X-Accel-Buffering": "no", "Cache-Control": "no-cache"})
@@ -0,0 +1,259 @@
+import bisect
+import contextvars
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from starlette.datastructures import MutableHeaders
+from src.backend.config import settings
+
+# Stage latency histograms and counters, exposed in the Prometheus text format
+# on GET /metrics. Spans are optionally mirrored to OpenTelemetry when the API
+# package is installed and OTEL_ENABLED is set. With TELEMETRY_ENABLED off,
+# span() hands out one shared no-op object.
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Span attributes that are accumulated as counters, with their Prometheus names
+COUNTED_ATTRIBUTES = {
+    "rows": "slo_stage_rows_total",
+    "bytes": "slo_stage_bytes_total",
+    "prompt_tokens": "slo_llm_prompt_tokens_total",
+    "completion_tokens": "slo_llm_completion_tokens_total",
+}
+
+# (stage, seconds) pairs for the current request, reported in the Server-Timing header
+_request_stages: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar("request_stages", default=None)
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], _Histogram] = {}
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._help: Dict[str, str] = {}
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram()
+            histogram.observe(value)
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def describe(self, name: str, text: str):
+        self._help[name] = text
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self) -> str:
+        """Prometheus text exposition format 0.0.4."""
+        with self._lock:
+            histograms = sorted((k, (list(h.counts), h.sum, h.count)) for k, h in self._histograms.items())
+            counters = sorted(self._counters.items())
+
+        lines = []
+        seen = set()
+        for (name, labels), (counts, total, count) in histograms:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {self._help.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {total}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        for (name, labels), value in counters:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {self._help.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels) -> str:
+    if not labels:
+        return ""
+    escaped = (f'{k}="{_escape(v)}"' for k, v in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = Registry()
+registry.describe("slo_stage_duration_seconds", "Time spent per pipeline stage")
+registry.describe("slo_stage_rows_total", "Rows/documents/records handled per stage")
+registry.describe("slo_stage_bytes_total", "Bytes handled per stage")
+registry.describe("slo_llm_prompt_tokens_total", "Prompt tokens evaluated by the LLM")
+registry.describe("slo_llm_completion_tokens_total", "Completion tokens generated by the LLM")
+registry.describe("slo_cache_requests_total", "Cache lookups by cache and result")
+registry.describe("slo_http_request_duration_seconds", "HTTP request latency by route")
+registry.describe("slo_prompt_tokens_estimated_total", "Estimated prompt tokens per section, before the LLM call")
+registry.describe("slo_prompts_built_total", "Prompts built, by prompt kind")
+
+
+def _otel_tracer():
+    if not settings.OTEL_ENABLED:
+        return None
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        return None
+    return trace.get_tracer("src.backend")
+
+
+class Span:
+    __slots__ = ("stage", "attributes", "_start", "_otel")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.attributes = {}
+        self._otel = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+        return self
+
+    def __enter__(self):
+        if _tracer is not None:
+            self._otel = _tracer.start_as_current_span(self.stage)
+            self._otel.__enter__()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._start
+        status = "error" if exc_type is not None else "ok"
+        registry.observe("slo_stage_duration_seconds", elapsed, stage=self.stage, status=status)
+        for key, value in self.attributes.items():
+            metric = COUNTED_ATTRIBUTES.get(key)
+            if metric is not None and value:
+                registry.inc(metric, value, stage=self.stage)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages.append((self.stage, elapsed))
+        if self._otel is not None:
+            from opentelemetry import trace
+            current = trace.get_current_span()
+            for key, value in self.attributes.items():
+                current.set_attribute(f"slo.{key}", value)
+            self._otel.__exit__(exc_type, exc, tb)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attributes):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+_tracer = _otel_tracer() if settings.TELEMETRY_ENABLED else None
+
+
+def span(stage: str):
+    """Time a stage: `with span("rag.query") as s: ...; s.set(rows=n, bytes=b)`."""
+    if not settings.TELEMETRY_ENABLED:
+        return _NOOP
+    return Span(stage)
+
+
+def record_cache(cache: str, hit: bool, count: int = 1):
+    if settings.TELEMETRY_ENABLED and count:
+        registry.inc("slo_cache_requests_total", count, cache=cache, result="hit" if hit else "miss")
+
+
+def record_prompt(prompt: str, report: Dict[str, int]):
+    """Prompt builder report: estimated tokens per section (`total` included); divide by prompts built for the mean."""
+    if not settings.TELEMETRY_ENABLED:
+        return
+    registry.inc("slo_prompts_built_total", prompt=prompt)
+    for section, tokens in report.items():
+        if not section.endswith("turns"):
+            registry.inc("slo_prompt_tokens_estimated_total", tokens, prompt=prompt, section=section)
+
+
+def start_request() -> contextvars.Token:
+    return _request_stages.set([])
+
+
+def finish_request(token: contextvars.Token) -> List[Tuple[str, float]]:
+    stages = _request_stages.get() or []
+    _request_stages.reset(token)
+    return stages
+
+
+def server_timing(stages: List[Tuple[str, float]]) -> str:
+    """Server-Timing header value; repeated stages are summed."""
+    totals: Dict[str, float] = {}
+    for stage, seconds in stages:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ", ".join(f"{stage.replace('.', '_')};dur={seconds * 1000:.1f}" for stage, seconds in totals.items())
+
+
+class TelemetryMiddleware:
+    """
+    Pure ASGI middleware (doesn't buffer streaming responses): per-route latency
+    histogram, and a Server-Timing header with the stages the request went through.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.TELEMETRY_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        token = start_request()
+        status = {"code": 500}
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                stages = _request_stages.get()
+                if stages:
+                    MutableHeaders(scope=message).append("Server-Timing", server_timing(stages))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            registry.observe("slo_http_request_duration_seconds", time.perf_counter() - started,
+                             method=scope["method"], route=route, status=str(status["code"]))
+            finish_request(token)
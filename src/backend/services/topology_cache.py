@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import threading
+import time
+from array import array
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from src.backend.config import settings
+from src.backend.services.graph_backend import graph_service
+from src.backend.services.shared_cache import shared_cache
+
+logger = logging.getLogger(__name__)
+
+# Shared cache entry holding the published topology
+SHARED_NAMESPACE = "topology"
+SHARED_KEY = "snapshot"
+
+
+class TopologySnapshot:
+    """
+    Immutable, read-only copy of the Service/DEPENDS_ON graph. Edges are kept as
+    CSR adjacency arrays (offsets + neighbour indexes) in both directions, so
+    fan-out and fan-in lookups are a dict lookup plus a slice.
+    """
+    def __init__(self, nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]], version: int):
+        self.version = version
+        self.loaded_at = time.time()
+
+        self.names = [n["name"] for n in nodes]
+        self.types = [n.get("type") for n in nodes]
+        self.tiers = [n.get("tier") for n in nodes]
+        self.index = {name: i for i, name in enumerate(self.names)}
+
+        # Criticality is stored as a small code into this vocabulary
+        self.criticalities = sorted({e.get("criticality") or "" for e in edges})
+        crit_code = {c: i for i, c in enumerate(self.criticalities)}
+
+        pairs = [
+            (self.index[e["source"]], self.index[e["target"]], crit_code[e.get("criticality") or ""])
+            for e in edges
+            if e["source"] in self.index and e["target"] in self.index
+        ]
+        self.edge_count = len(pairs)
+        self.out_offsets, self.out_targets, self.out_crit = self._csr(pairs, 0, 1)
+        self.in_offsets, self.in_sources, self.in_crit = self._csr(pairs, 1, 0)
+
+    def _csr(self, pairs: List[Tuple[int, int, int]], key: int, value: int):
+        counts = [0] * (len(self.names) + 1)
+        for pair in pairs:
+            counts[pair[key] + 1] += 1
+        for i in range(1, len(counts)):
+            counts[i] += counts[i - 1]
+        offsets = array("i", counts)
+
+        cursor = list(counts[:-1])
+        neighbours = array("i", [0] * len(pairs))
+        crits = array("B", [0] * len(pairs))
+        for pair in pairs:
+            slot = cursor[pair[key]]
+            neighbours[slot] = pair[value]
+            crits[slot] = pair[2]
+            cursor[pair[key]] += 1
+        return offsets, neighbours, crits
+
+    def _node(self, i: int) -> Dict[str, Any]:
+        return {"name": self.names[i], "type": self.types[i], "tier": self.tiers[i]}
+
+    def _neighbours(self, i: int, offsets, neighbours, crits) -> List[Dict[str, Any]]:
+        return [
+            {**self._node(neighbours[j]), "criticality": self.criticalities[crits[j]] or None}
+            for j in range(offsets[i], offsets[i + 1])
+        ]
+
+    def get_service_details(self, service_name: str) -> Optional[Dict[str, Any]]:
+        i = self.index.get(service_name)
+        return self._node(i) if i is not None else None
+
+    def get_dependencies(self, service_name: str) -> List[Dict[str, Any]]:
+        """Fan-out: services this service calls."""
+        i = self.index.get(service_name)
+        if i is None:
+            return []
+        return self._neighbours(i, self.out_offsets, self.out_targets, self.out_crit)
+
+    def get_upstream_dependencies(self, service_name: str) -> List[Dict[str, Any]]:
+        """Fan-in: services that call this service."""
+        i = self.index.get(service_name)
+        if i is None:
+            return []
+        return self._neighbours(i, self.in_offsets, self.in_sources, self.in_crit)
+
+    def get_graph(self, exclude: Tuple[str, ...] = ()) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        excluded = {self.index[name] for name in exclude if name in self.index}
+        nodes = [self._node(i) for i in range(len(self.names)) if i not in excluded]
+        edges = []
+        for i in range(len(self.names)):
+            if i in excluded:
+                continue
+            for j in range(self.out_offsets[i], self.out_offsets[i + 1]):
+                target = self.out_targets[j]
+                if target in excluded:
+                    continue
+                edges.append({
+                    "source": self.names[i],
+                    "target": self.names[target],
+                    "criticality": self.criticalities[self.out_crit[j]] or None,
+                })
+        return nodes, edges
+
+
+class TopologyCache:
+    """
+    Holds the current TopologySnapshot. The graph backend stays the source of
+    truth: the snapshot is reloaded every `refresh_seconds` by a background
+    thread, or right away when `invalidate()` is called. Readers never block on a refresh,
+    they keep using the previous snapshot until the new one is swapped in.
+
+    With a shared cache (multi-worker serving) every load is published there and
+    its version becomes the snapshot version. The thread then checks every
+    `sync_seconds` for a snapshot another worker published and adopts it, and
+    only goes to the backend when the published one is `refresh_seconds` old.
+    """
+    def __init__(self, loader: Callable[[], Tuple[list, list]], refresh_seconds: float,
+                 shared: Callable[[], Optional[Any]] = lambda: None, sync_seconds: float = 5.0):
+        self._loader = loader
+        self._shared = shared
+        self.refresh_seconds = refresh_seconds
+        self.sync_seconds = sync_seconds
+        self._snapshot: Optional[TopologySnapshot] = None
+        self._version = 0
+        self._refresh_lock = threading.Lock()
+        self._changed = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def refresh(self) -> TopologySnapshot:
+        with self._refresh_lock:
+            nodes, edges = self._loader()
+            shared = self._shared()
+            version = shared.set(SHARED_NAMESPACE, SHARED_KEY, {"nodes": nodes, "edges": edges}) if shared else None
+            self._version = version or self._version + 1
+            snapshot = TopologySnapshot(nodes, edges, self._version)
+            self._snapshot = snapshot
+        logger.info("Topology snapshot v%d loaded: %d services, %d dependencies",
+                    snapshot.version, len(snapshot.names), snapshot.edge_count)
+        return snapshot
+
+    def sync(self) -> Optional[float]:
+        """
+        Adopt a newer snapshot from the shared cache, if another worker published
+        one. Returns when the shared snapshot was loaded, None if there is none.
+        """
+        shared = self._shared()
+        current = shared.version(SHARED_NAMESPACE, SHARED_KEY) if shared else None
+        if current is None:
+            return None
+        version, published_at = current
+        if self._snapshot is not None and version == self._snapshot.version:
+            return published_at
+        entry = shared.get_entry(SHARED_NAMESPACE, SHARED_KEY)
+        if entry is None:
+            return None
+        value, version, published_at = entry
+        with self._refresh_lock:
+            snapshot = TopologySnapshot(value["nodes"], value["edges"], version)
+            self._snapshot, self._version = snapshot, version
+        logger.info("Topology snapshot v%d adopted from the shared cache", version)
+        return published_at
+
+    def snapshot(self) -> TopologySnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            published_at = self.sync()
+            snapshot = self._snapshot
+            if snapshot is None or time.time() - published_at >= self.refresh_seconds:
+                snapshot = self.refresh()
+        return snapshot
+
+    async def snapshot_async(self) -> TopologySnapshot:
+        # Only the very first load touches the graph backend, keep that off the event loop
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = await asyncio.to_thread(self.snapshot)
+        return snapshot
+
+    def invalidate(self):
+        """Change signal: ask the background thread to reload now."""
+        self._changed.set()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="topology-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._changed.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        shared = self._shared() is not None
+        interval = min(self.sync_seconds, self.refresh_seconds) if shared else self.refresh_seconds
+        while not self._stopped.is_set():
+            forced = self._changed.wait(timeout=interval)
+            self._changed.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                if forced or not shared:
+                    self.refresh()
+                    continue
+                # Whichever worker finds the shared snapshot stale first reloads it for all of them
+                published_at = self.sync()
+                if published_at is None or time.time() - published_at >= self.refresh_seconds:
+                    self.refresh()
+            except Exception as e:
+                # Keep serving the last good snapshot
+                logger.warning("Topology refresh failed, keeping snapshot: %s", e)
+
+
+# Resolved per call, so importing this module doesn't create the backend (or the Neo4j driver)
+topology_cache = TopologyCache(
+    lambda: graph_service.get_topology(), settings.TOPOLOGY_REFRESH_SECONDS,
+    shared=shared_cache, sync_seconds=settings.TOPOLOGY_SYNC_SECONDS,
+)
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import axios from 'axios'
 import './App.css'
 import ForceGraph2D from 'react-force-graph-2d'
@@ -6,6 +6,7 @@ import VectorView from './VectorView';
 import MetricsView from './MetricsView';
 import GraphRawView from './GraphRawView';
 import ChatWindow from './ChatWindow';
+import { streamNdjson } from './streamNdjson';
 
 function App() {
   const [activeTab, setActiveTab] = useState('dashboard');
@@ -14,6 +15,7 @@ function App() {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
   const [showChat, setShowChat] = useState(false);
+  const streamController = useRef(null);
 
   // Dummy graph data for visualization until we fetch real graph
   // eslint-disable-next-line no-unused-vars
@@ -33,16 +35,33 @@ function App() {
 
   const fetchRecommendation = async () => {
     if (!serviceName) return;
+    streamController.current?.abort();
+    const controller = new AbortController();
+    streamController.current = controller;
+
     setLoading(true);
     setError(null);
     setRecommendation(null);
     setShowChat(false);
 
     try {
-      const response = await axios.get(`http://localhost:8000/api/v1/recommend/${serviceName}`);
-      setRecommendation(response.data);
-      setShowChat(true); // Switch to chat view on success
+      // Tokens are streamed as they are generated; the context event arrives first
+      await streamNdjson(
+        `http://localhost:8000/api/v1/recommend/${serviceName}/stream`,
+        { signal: controller.signal },
+        (event) => {
+          if (event.type === 'context') {
+            setRecommendation({ ...event, reasoning: '' });
+            setShowChat(true); // Switch to chat view as soon as context is available
+          } else if (event.type === 'token') {
+            setRecommendation(prev => ({ ...prev, reasoning: prev.reasoning + event.content }));
+          } else if (event.type === 'error') {
+            setRecommendation(prev => ({ ...prev, reasoning: `${prev?.reasoning ?? ''}\n\nError: ${event.detail}` }));
+          }
+        }
+      );
     } catch (err) {
+      if (err.name === 'AbortError') return;
       console.error(err);
       setError("Failed to fetch recommendation. Service might not exist or backend is down.");
     } finally {
@@ -50,6 +69,12 @@ function App() {
     }
   };
 
+  const handleBack = () => {
+    // Leaving the chat cancels a recommendation that is still streaming
+    streamController.current?.abort();
+    setShowChat(false);
+  };
+
   const renderDashboard = () => (
     <div className="main-content">
       <div className="left-panel">
@@ -78,7 +103,8 @@ function App() {
           <ChatWindow
             serviceName={serviceName}
             initialRecommendation={recommendation?.reasoning}
-            onBack={() => setShowChat(false)}
+            streaming={loading}
+            onBack={handleBack}
           />
         )}
       </div>
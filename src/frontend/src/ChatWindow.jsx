@@ -1,12 +1,16 @@
 import { useState, useEffect, useRef } from 'react';
-import axios from 'axios';
 import ReactMarkdown from 'react-markdown';
+import { streamNdjson } from './streamNdjson';
 
-function ChatWindow({ serviceName, initialRecommendation, onBack }) {
+function ChatWindow({ serviceName, initialRecommendation, streaming, onBack }) {
     const [messages, setMessages] = useState([]);
     const [input, setInput] = useState('');
     const [loading, setLoading] = useState(false);
     const messagesEndRef = useRef(null);
+    const streamController = useRef(null);
+
+    // Cancel an in-flight answer when the chat is closed
+    useEffect(() => () => streamController.current?.abort(), []);
 
     useEffect(() => {
         // Initialize with the recommendation
@@ -33,17 +37,33 @@ function ChatWindow({ serviceName, initialRecommendation, onBack }) {
         setInput('');
         setLoading(true);
 
+        const controller = new AbortController();
+        streamController.current = controller;
+
         try {
             // Build context from history + new message
             const history = [...messages, userMessage];
 
-            const response = await axios.post('http://localhost:8000/api/v1/chat', {
-                service_name: serviceName,
-                messages: history.map(m => ({ role: m.role, content: m.content }))
+            // Append an empty assistant message and grow it as tokens arrive
+            setMessages(prev => [...prev, { role: 'assistant', content: '' }]);
+            const appendToLast = (text) => setMessages(prev => {
+                const last = prev[prev.length - 1];
+                return [...prev.slice(0, -1), { ...last, content: last.content + text }];
             });
 
-            setMessages(prev => [...prev, { role: 'assistant', content: response.data.content }]);
+            await streamNdjson('http://localhost:8000/api/v1/chat/stream', {
+                method: 'POST',
+                signal: controller.signal,
+                body: {
+                    service_name: serviceName,
+                    messages: history.map(m => ({ role: m.role, content: m.content }))
+                }
+            }, (event) => {
+                if (event.type === 'token') appendToLast(event.content);
+                else if (event.type === 'error') appendToLast(`\n\nError: ${event.detail}`);
+            });
         } catch (err) {
+            if (err.name === 'AbortError') return;
             console.error(err);
             setMessages(prev => [...prev, { role: 'assistant', content: "Error: Failed to get response. Please try again." }]);
         } finally {
@@ -83,9 +103,9 @@ function ChatWindow({ serviceName, initialRecommendation, onBack }) {
                     onChange={(e) => setInput(e.target.value)}
                     onKeyDown={handleKeyPress}
                     placeholder="Ask a follow-up question..."
-                    disabled={loading}
+                    disabled={loading || streaming}
                 />
-                <button onClick={handleSend} disabled={loading || !input.trim()}>
+                <button onClick={handleSend} disabled={loading || streaming || !input.trim()}>
                     Send
                 </button>
             </div>
@@ -0,0 +1,32 @@
+// Reads a newline-delimited JSON stream (see backend services/streaming.py)
+// and calls onEvent for every parsed event. Pass an AbortSignal to cancel;
+// aborting closes the connection and the backend stops generating.
+export async function streamNdjson(url, { method = 'GET', body, signal } = {}, onEvent) {
+  const response = await fetch(url, {
+    method,
+    signal,
+    headers: body ? { 'Content-Type': 'application/json' } : undefined,
+    body: body ? JSON.stringify(body) : undefined,
+  });
+  if (!response.ok) {
+    throw new Error(`Request failed with status ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let newline;
+    while ((newline = buffer.indexOf('\n')) >= 0) {
+      const line = buffer.slice(0, newline).trim();
+      buffer = buffer.slice(newline + 1);
+      if (line) onEvent(JSON.parse(line));
+    }
+  }
+  if (buffer.trim()) onEvent(JSON.parse(buffer));
+}